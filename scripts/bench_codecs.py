@@ -0,0 +1,112 @@
+"""Сравнение кодеков файлов данных (infra.codecs).
+
+Для каждого кодека на синтетических данных (users.json, портфель с
+кошельками) замеряется (rates.json всегда пишется в JSON и не
+сравнивается):
+    - save: сериализация + atomic_write (durability "none", чтобы
+      измерялся формат, а не диск)
+    - load: чтение файла + разбор в неизменяемый снимок (как
+      DatabaseManager.load)
+    - размер файла
+
+Запуск:
+    python scripts/bench_codecs.py [--users N] [--repeat N]
+    make bench-codecs
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from valutatrade_hub.infra import codecs  # noqa: E402
+from valutatrade_hub.infra.fileio import atomic_write  # noqa: E402
+
+CURRENCIES = ["USD", "EUR", "GBP", "RUB", "CNY", "JPY", "BTC", "ETH", "SOL"]
+
+
+def build_dataset(users: int) -> dict[str, Any]:
+    """Синтетические файлы данных.
+
+    Args:
+        users: Количество пользователей в users.json.
+
+    Returns:
+        Словарь {имя_файла: данные}.
+    """
+    rnd = random.Random(42)
+    user_records = [
+        {
+            "user_id": i,
+            "username": f"user{i:06d}",
+            "hashed_password": f"{rnd.getrandbits(256):064x}",
+            "salt": f"{rnd.getrandbits(64):016x}",
+            "registration_date": "2025-01-01T12:00:00",
+        }
+        for i in range(1, users + 1)
+    ]
+    portfolio = {
+        "user_id": 1,
+        "version": 1000,
+        "wallets": {
+            code: {"currency_code": code, "balance": rnd.uniform(0, 1e6)}
+            for code in CURRENCIES
+        },
+    }
+    return {"users.json": user_records, "portfolio.json": portfolio}
+
+
+def measure(func: Callable[[], Any], repeat: int) -> float:
+    """Медианное время вызова в миллисекундах."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def bench(dataset: dict[str, Any], repeat: int, directory: Path) -> None:
+    """Замерить и напечатать таблицу по всем кодекам."""
+    print(f"{'file':<16}{'codec':<9}{'size KB':>10}{'save ms':>10}{'load ms':>10}")
+    for filename, data in dataset.items():
+        for codec in codecs.CODECS.values():
+            path = directory / f"{codec.name}-{filename}"
+
+            def save(codec: codecs.Codec = codec, path: Path = path) -> None:
+                atomic_write(path, codec.encode(data), durability="none")
+
+            # Кодек известен: pickle читается без проверки "data_codec_trusted"
+            def load(codec: codecs.Codec = codec, path: Path = path) -> Any:
+                return codec.decode_frozen(path.read_bytes())
+
+            save_ms = measure(save, repeat)
+            load_ms = measure(load, repeat)
+            size_kb = path.stat().st_size / 1024
+            print(
+                f"{filename:<16}{codec.name:<9}"
+                f"{size_kb:>10.1f}{save_ms:>10.2f}{load_ms:>10.2f}"
+            )
+
+
+def main() -> None:
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+
+    dataset = build_dataset(args.users)
+    with tempfile.TemporaryDirectory() as tmp:
+        bench(dataset, args.repeat, Path(tmp))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Общие фикстуры тестов.
+
+Каждый тест работает со своей директорией данных во временной папке:
+настройки указывают на нее, а DatabaseManager создается заново, поэтому
+тесты не трогают data/ проекта и не делят кеш между собой. Логи тестов
+пишутся во временную директорию, а не в logs/ проекта.
+"""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub import logging_config
+from valutatrade_hub.infra.database import DatabaseManager, get_db
+from valutatrade_hub.infra.settings import get_settings
+from valutatrade_hub.parser_service.config import ParserConfig
+
+
+@pytest.fixture(scope="session", autouse=True)
+def logs_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Временная директория логов на всю сессию тестов."""
+    path = tmp_path_factory.mktemp("logs")
+    logging_config.setup_logging(logs_dir=path)
+    logging_config.setup_action_logger(logs_dir=path)
+    return path
+
+
+@pytest.fixture
+def data_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """Временная директория данных и новый DatabaseManager."""
+    settings = get_settings()
+    monkeypatch.setitem(settings._settings, "data_dir", str(tmp_path))
+    monkeypatch.setattr(DatabaseManager, "_instance", None)
+    monkeypatch.setattr(DatabaseManager, "_initialized", False)
+
+    yield tmp_path
+
+    db = get_db()
+    db.close_wal()
+    db.set_backend(None)
+
+
+@pytest.fixture
+def settings_override(monkeypatch: pytest.MonkeyPatch):
+    """Изменить настройки на время теста: settings_override(key=value)."""
+    settings = get_settings()
+
+    def override(**values: object) -> None:
+        for key, value in values.items():
+            monkeypatch.setitem(settings._settings, key, value)
+
+    return override
+
+
+@pytest.fixture
+def parser_config(tmp_path: Path) -> ParserConfig:
+    """Конфигурация Parser Service с файлами во временной директории."""
+    return ParserConfig(
+        RATES_FILE_PATH=str(tmp_path / "rates.json"),
+        HISTORY_FILE_PATH=str(tmp_path / "exchange_rates.json"),
+        HISTORY_LOG_PATH=str(tmp_path / "exchange_rates.jsonl"),
+        HISTORY_DIR_PATH=str(tmp_path / "history"),
+    )
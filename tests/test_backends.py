@@ -0,0 +1,252 @@
+"""Тесты бэкендов хранения: одинаковое поведение JSON и SQLite, импорт JSON."""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core.exceptions import (
+    ConcurrentModificationError,
+    UserAlreadyExistsError,
+)
+from valutatrade_hub.infra.backends import (
+    JsonBackend,
+    SqliteBackend,
+    migrate_portfolios_to_shards,
+)
+from valutatrade_hub.infra.database import DatabaseManager, get_db
+
+
+def _user(user_id: int, username: str) -> dict:
+    return {
+        "user_id": user_id,
+        "username": username,
+        "hashed_password": "hash",
+        "salt": "salt",
+        "registration_date": "2025-10-09T12:00:00",
+    }
+
+
+def _portfolio(user_id: int, version: int = 0, usd: float = 0.0) -> dict:
+    return {
+        "user_id": user_id,
+        "version": version,
+        "wallets": {"USD": {"balance": usd}},
+    }
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend(request, data_dir: Path):
+    """Оба бэкенда поверх пустой временной директории данных."""
+    db = get_db()
+    if request.param == "json":
+        instance = JsonBackend(db)
+    else:
+        instance = SqliteBackend(data_dir / "valutatrade.db", db)
+    yield instance
+    instance.close()
+
+
+def test_register_and_lookup(backend):
+    assert backend.next_user_id() == 1
+    user_id = backend.register_user(_user(1, "alice"), _portfolio(1))
+
+    assert user_id == 1
+    assert backend.get_user_by_username("alice")["user_id"] == 1
+    assert backend.get_user_by_id(1)["username"] == "alice"
+    assert backend.get_user_by_username("bob") is None
+    assert backend.get_portfolio(1)["wallets"] == {"USD": {"balance": 0.0}}
+    assert backend.next_user_id() == 2
+
+
+def test_register_taken_user_id_gets_next(backend):
+    backend.register_user(_user(1, "alice"), _portfolio(1))
+
+    user_id = backend.register_user(_user(1, "bob"), _portfolio(1))
+
+    assert user_id == 2
+    assert backend.get_portfolio(2)["user_id"] == 2
+
+
+def test_duplicate_username_rejected(backend):
+    backend.add_user(_user(1, "alice"))
+
+    with pytest.raises(UserAlreadyExistsError):
+        backend.add_user(_user(2, "alice"))
+    with pytest.raises(UserAlreadyExistsError):
+        backend.register_user(_user(3, "alice"), _portfolio(3))
+
+
+def test_save_portfolio_checks_version(backend):
+    backend.register_user(_user(1, "alice"), _portfolio(1))
+
+    backend.save_portfolio(_portfolio(1, version=1, usd=50.0), expected_version=0)
+    with pytest.raises(ConcurrentModificationError):
+        backend.save_portfolio(_portfolio(1, version=1, usd=70.0), expected_version=0)
+
+    portfolio = backend.get_portfolio(1)
+    assert portfolio["version"] == 1
+    assert portfolio["wallets"]["USD"]["balance"] == 50.0
+
+
+def test_json_indexes_follow_external_changes(data_dir: Path):
+    db = get_db()
+    backend = JsonBackend(db)
+    backend.register_user(_user(1, "alice"), _portfolio(1))
+    alice = backend.get_user_by_username("alice")
+    assert backend.get_user_by_id(1) is alice
+
+    # Другой процесс переписал users.json (атомарная замена файла)
+    replacement = data_dir / "users.json.new"
+    replacement.write_text(json.dumps([_user(1, "alice"), _user(7, "bob")]))
+    replacement.replace(data_dir / "users.json")
+
+    assert backend.get_user_by_username("bob")["user_id"] == 7
+    assert backend.get_user_by_id(7)["username"] == "bob"
+    assert backend.next_user_id() == 8
+    with pytest.raises(UserAlreadyExistsError):
+        backend.add_user(_user(8, "bob"))
+
+
+def test_json_indexes_shared_between_instances(data_dir: Path):
+    db = get_db()
+    first = JsonBackend(db)
+    second = JsonBackend(db)
+    first.register_user(_user(1, "alice"), _portfolio(1))
+    assert second.get_user_by_username("alice") is not None
+
+    second.register_user(_user(2, "bob"), _portfolio(2))
+
+    assert first.get_user_by_id(2)["username"] == "bob"
+    assert first.next_user_id() == 3
+    assert second.get_user_by_username("carol") is None
+
+
+def test_json_lookups_use_warm_index_before_load(
+    data_dir: Path, settings_override, monkeypatch
+):
+    settings_override(warm_cache_min_bytes=0)
+    JsonBackend(get_db()).register_user(_user(1, "alice"), _portfolio(1))
+
+    # Новый процесс: список пользователей еще не загружен в память
+    monkeypatch.setattr(DatabaseManager, "_instance", None)
+    monkeypatch.setattr(DatabaseManager, "_initialized", False)
+    db = DatabaseManager()
+    backend = JsonBackend(db)
+
+    assert backend.get_user_by_username("alice")["user_id"] == 1
+    assert backend.get_user_by_id(2) is None
+    assert backend.next_user_id() == 2
+    assert db.cache_stats()["entries"] == 0
+    # Запись загружает список и переключает поиск на индексы в памяти
+    backend.add_user(_user(2, "bob"))
+    assert backend.get_user_by_username("bob")["user_id"] == 2
+
+
+def _seed_json(data_dir: Path) -> None:
+    db = get_db()
+    json_backend = JsonBackend(db)
+    json_backend.register_user(_user(1, "alice"), _portfolio(1, usd=10.0))
+    json_backend.register_user(_user(2, "bob"), _portfolio(2, usd=20.0))
+
+
+def test_sqlite_imports_json_once(data_dir: Path):
+    _seed_json(data_dir)
+    path = data_dir / "valutatrade.db"
+
+    backend = SqliteBackend(path, get_db())
+    assert backend.get_user_by_username("bob")["user_id"] == 2
+    assert backend.get_portfolio(1)["wallets"]["USD"]["balance"] == 10.0
+    backend.close()
+
+    # Повторное открытие не импортирует данные второй раз
+    backend = SqliteBackend(path, get_db())
+    assert backend.next_user_id() == 3
+    backend.close()
+
+
+def test_sqlite_retries_import_without_marker(data_dir: Path):
+    path = data_dir / "valutatrade.db"
+    # База создана, но импорт не был завершен (нет отметки в meta)
+    SqliteBackend(path).close()
+    _seed_json(data_dir)
+
+    backend = SqliteBackend(path, get_db())
+
+    assert backend.get_user_by_username("alice") is not None
+    assert backend.get_portfolio(2)["wallets"]["USD"]["balance"] == 20.0
+    backend.close()
+    with sqlite3.connect(path) as conn:
+        keys = [row[0] for row in conn.execute("SELECT key FROM meta")]
+    assert keys == ["json_import"]
+
+
+def test_sqlite_failed_import_leaves_no_marker(data_dir: Path, monkeypatch):
+    _seed_json(data_dir)
+    path = data_dir / "valutatrade.db"
+
+    def broken_write(self, record):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(SqliteBackend, "_write_portfolio", broken_write)
+        with pytest.raises(OSError):
+            SqliteBackend(path, get_db())
+
+    backend = SqliteBackend(path, get_db())
+    assert backend.get_portfolio(1) is not None
+    assert backend.next_user_id() == 3
+    backend.close()
+
+
+# =============================================================================
+# Перенос portfolios.json в шарды
+# =============================================================================
+
+
+def _seed_legacy_portfolios(data_dir: Path) -> None:
+    (data_dir / "portfolios.json").write_text(
+        json.dumps([_portfolio(1, usd=10.0), _portfolio(2, version=3, usd=20.0)])
+    )
+
+
+def test_migration_moves_portfolios_to_shards(data_dir: Path):
+    _seed_legacy_portfolios(data_dir)
+
+    assert migrate_portfolios_to_shards(get_db()) == 2
+
+    assert not (data_dir / "portfolios.json").exists()
+    assert (data_dir / "portfolios.json.migrated").exists()
+    shard = json.loads((data_dir / "portfolios" / "2.json").read_text())
+    assert shard == _portfolio(2, version=3, usd=20.0)
+
+    # Повторный вызов ничего не делает
+    assert migrate_portfolios_to_shards(get_db()) == 0
+    backend = JsonBackend(get_db())
+    assert backend.get_portfolio(1)["wallets"]["USD"]["balance"] == 10.0
+
+
+def test_concurrent_migrations_run_once(data_dir: Path):
+    _seed_legacy_portfolios(data_dir)
+    db = get_db()
+    barrier = threading.Barrier(4)
+    results: list[int] = []
+    errors: list[Exception] = []
+
+    def migrate() -> None:
+        barrier.wait()
+        try:
+            results.append(migrate_portfolios_to_shards(db))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=migrate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(results) == [0, 0, 0, 2]
@@ -0,0 +1,162 @@
+"""Тесты LRU кеша (infra.cache) и кеша снимков DatabaseManager."""
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core.exceptions import DataNotFoundError
+from valutatrade_hub.infra.cache import CACHE_MISS, LRUCache
+from valutatrade_hub.infra.database import get_db
+
+
+def test_get_returns_value_for_matching_tag():
+    cache = LRUCache()
+    cache.put("users.json", "v1", None, cost=10)
+
+    # None — настоящее значение, а не промах
+    assert cache.get("users.json", "v1") is None
+    assert cache.get("rates.json", "v1") is CACHE_MISS
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_stale_tag_is_a_miss_and_drops_entry():
+    cache = LRUCache()
+    cache.put("users.json", "v1", [1], cost=10)
+
+    assert cache.get("users.json", "v2") is CACHE_MISS
+    assert "users.json" not in cache
+    assert cache.nbytes == 0
+
+
+def test_evicts_least_recently_used_first():
+    cache = LRUCache(max_bytes=30)
+    for key in ("a", "b", "c"):
+        cache.put(key, 0, key, cost=10)
+    cache.get("a", 0)  # "a" становится самой свежей
+
+    cache.put("d", 0, "d", cost=10)
+
+    assert "b" not in cache
+    assert {"a", "c", "d"} == {k for k in "abcd" if k in cache}
+    assert cache.evictions == 1
+    assert cache.nbytes == 30
+
+
+def test_budget_accounting_on_replace_and_pop():
+    cache = LRUCache(max_bytes=100)
+    cache.put("a", 0, "a", cost=40)
+    cache.put("a", 1, "a2", cost=25)
+    cache.put("b", 0, "b", cost=30)
+
+    assert cache.nbytes == 55
+    cache.pop("a")
+    cache.pop("missing")
+    assert cache.nbytes == 30
+    assert len(cache) == 1
+    cache.clear()
+    assert cache.nbytes == 0 and len(cache) == 0
+
+
+def test_entry_larger_than_budget_is_not_cached():
+    cache = LRUCache(max_bytes=50)
+    cache.put("small", 0, "s", cost=20)
+
+    cache.put("huge", 0, "h", cost=51)
+    # Замена существующей записи слишком дорогим значением удаляет ее
+    cache.put("small", 1, "s", cost=60)
+
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+    assert cache.evictions == 0
+
+
+def test_shrinking_budget_evicts_immediately():
+    cache = LRUCache()
+    for key in ("a", "b", "c"):
+        cache.put(key, 0, key, cost=10)
+
+    cache.set_max_bytes(15)
+
+    assert [k for k in "abc" if k in cache] == ["c"]
+    assert cache.stats() == {
+        "entries": 1,
+        "bytes": 10,
+        "max_bytes": 15,
+        "hits": 0,
+        "misses": 0,
+        "evictions": 2,
+    }
+
+
+def test_database_cache_respects_budget(data_dir: Path):
+    db = get_db()
+    db.save("a.json", {"payload": "x" * 100})
+    db.save("b.json", {"payload": "y" * 100})
+    size = db.get_file_path("a.json").stat().st_size
+
+    db.set_cache_limit(size + 10)
+
+    stats = db.cache_stats()
+    assert stats["entries"] == 1
+    assert stats["bytes"] <= size + 10
+    # Вытесненный файл читается с диска
+    assert db.load("a.json")["payload"] == "x" * 100
+
+
+def _overwrite_in_place(path: Path, old: str, new: str, keep_mtime: bool = False):
+    """Заменить текст в файле в обход DatabaseManager (тот же inode и размер)."""
+    stat = path.stat()
+    path.write_text(path.read_text().replace(old, new))
+    if keep_mtime:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def test_database_cache_reuses_snapshot(data_dir: Path):
+    db = get_db()
+    db.save("users.json", [{"user_id": 1}])
+
+    first = db.load("users.json")
+
+    assert db.load("users.json") is first
+    assert db.load("users.json", use_cache=False) is not first
+
+
+def test_database_cache_sees_external_changes(data_dir: Path):
+    db = get_db()
+    db.save("users.json", {"name": "alice"})
+    path = db.get_file_path("users.json")
+    db.load("users.json")
+
+    # Тот же размер и inode, но другой mtime
+    _overwrite_in_place(path, "alice", "bobby")
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10**9))
+    assert db.load("users.json")["name"] == "bobby"
+
+    # Атомарная замена: новый inode
+    replacement = path.with_name("users.json.new")
+    replacement.write_text(json.dumps({"name": "carol"}))
+    os.replace(replacement, path)
+    assert db.load("users.json")["name"] == "carol"
+
+    path.unlink()
+    with pytest.raises(DataNotFoundError):
+        db.load("users.json")
+    assert db.cache_stats()["entries"] == 0
+
+
+def test_database_cache_checks_generation(data_dir: Path):
+    db = get_db()
+    db.save("users.json", {"name": "alice"})
+    db.load("users.json")
+
+    # Сигнатура файла не изменилась, но запись отмечена в поколении
+    _overwrite_in_place(db.get_file_path("users.json"), "alice", "bobby", True)
+    lock = db.file_lock("users.json")
+    assert db.load("users.json")["name"] == "alice"
+    with lock.write_locked():
+        lock.bump_generation()
+
+    assert db.load("users.json")["name"] == "bobby"
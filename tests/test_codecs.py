@@ -0,0 +1,68 @@
+"""Тесты кодеков файлов данных: чтение pickle только из доверенной настройки."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core import utils
+from valutatrade_hub.core.exceptions import StorageError
+from valutatrade_hub.infra import codecs
+from valutatrade_hub.infra.database import get_db
+from valutatrade_hub.parser_service import storage
+
+DATA = {"pairs": {"BTC_USD": {"rate": 59337.21}}}
+
+
+@pytest.mark.parametrize("name", ["json", "marshal"])
+def test_safe_codecs_always_readable(name):
+    payload = codecs.encode(DATA, codec=name)
+
+    assert codecs.decode(payload) == DATA
+
+
+def test_pickle_rejected_unless_selected(settings_override):
+    settings_override(data_codec="json", data_codec_trusted=[])
+    payload = codecs.encode(DATA, codec="pickle")
+
+    with pytest.raises(StorageError):
+        codecs.decode(payload)
+    with pytest.raises(StorageError):
+        codecs.decode_frozen(payload)
+
+
+def test_pickle_readable_when_selected(settings_override):
+    settings_override(data_codec="pickle")
+
+    assert codecs.decode(codecs.encode(DATA)) == DATA
+
+
+def test_pickle_readable_when_trusted(settings_override):
+    payload = codecs.encode(DATA, codec="pickle")
+    settings_override(data_codec="json", data_codec_trusted=["pickle"])
+
+    assert codecs.decode_frozen(payload)["pairs"]["BTC_USD"]["rate"] == 59337.21
+
+
+def test_rates_cache_is_always_json(settings_override, parser_config):
+    settings_override(data_codec="marshal")
+    path = Path(parser_config.RATES_FILE_PATH)
+
+    storage.write_rates_cache(DATA, parser_config)
+    assert json.loads(path.read_bytes()) == DATA
+
+    # Файл, записанный раньше двоичным кодеком, читается и переписывается
+    path.write_bytes(codecs.encode(DATA))
+    assert storage.read_rates_cache(parser_config)["pairs"] == DATA["pairs"]
+    storage.update_rates_cache({"EUR_USD": 1.2}, "test", config=parser_config)
+    assert set(json.loads(path.read_bytes())["pairs"]) == {"BTC_USD", "EUR_USD"}
+
+
+def test_save_json_ignores_data_codec(data_dir: Path, settings_override):
+    settings_override(data_codec="marshal")
+
+    utils.save_json("rates.json", DATA)
+    get_db().save("users.json", [])
+
+    assert json.loads((data_dir / "rates.json").read_bytes()) == DATA
+    assert (data_dir / "users.json").read_bytes().startswith(codecs.MAGIC_PREFIX)
@@ -0,0 +1,99 @@
+"""Тесты сравнения с обменом версии портфеля и повтора при конфликте."""
+
+import threading
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.core.exceptions import ConcurrentModificationError
+from valutatrade_hub.decorators import retry_on_conflict
+
+
+def test_retry_repeats_until_success():
+    calls = []
+
+    @retry_on_conflict(max_attempts=5, base_delay=0)
+    def operation() -> str:
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConcurrentModificationError(1, len(calls), len(calls) + 1)
+        return "done"
+
+    assert operation() == "done"
+    assert len(calls) == 3
+
+
+def test_retry_gives_up_after_max_attempts():
+    calls = []
+
+    @retry_on_conflict(max_attempts=3, base_delay=0)
+    def operation() -> None:
+        calls.append(1)
+        raise ConcurrentModificationError(1, 0, 1)
+
+    with pytest.raises(ConcurrentModificationError):
+        operation()
+    assert len(calls) == 3
+
+
+def test_retry_does_not_catch_other_errors():
+    calls = []
+
+    @retry_on_conflict(base_delay=0)
+    def operation() -> None:
+        calls.append(1)
+        raise ValueError("bad amount")
+
+    with pytest.raises(ValueError):
+        operation()
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("wal", [False, True])
+def test_concurrent_deposits_are_not_lost(data_dir: Path, settings_override, wal):
+    settings_override(portfolio_wal=wal)
+    user = usecases.register_user("alice", "pass1234")
+    threads_count, deposits = 4, 25
+
+    def work() -> None:
+        for _ in range(deposits):
+            usecases.deposit(user, "USD", 1)
+
+    threads = [threading.Thread(target=work) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    balance = usecases.get_balance(user, "USD")
+    assert balance["balance"] == threads_count * deposits
+
+
+def test_portfolio_version_follows_saves(data_dir: Path):
+    user = usecases.register_user("alice", "pass1234")
+    stale = usecases.get_portfolio(user)
+    version = stale.version
+
+    usecases.deposit(user, "USD", 5)
+
+    assert usecases.get_portfolio(user).version == version + 1
+    # Портфель, прочитанный до записи, сохранить нельзя
+    stale.add_currency("EUR", 1.0)
+    with pytest.raises(ConcurrentModificationError):
+        usecases._save_portfolio(stale)
+    assert stale.version == version
+
+
+def test_model_setters_validate():
+    user = usecases.User(1, "alice", "pass1234")
+    portfolio = usecases.Portfolio(user, version=3)
+
+    user.user_id = 7
+    portfolio.version += 1
+
+    assert portfolio.user_id == 7 and portfolio.version == 4
+    with pytest.raises(ValueError):
+        user.user_id = 0
+    with pytest.raises(ValueError):
+        usecases.Portfolio(user, version=-1)
@@ -0,0 +1,54 @@
+"""Тесты атомарной записи файлов данных."""
+
+import os
+import stat
+from pathlib import Path
+
+from valutatrade_hub.infra.fileio import atomic_write
+
+
+def _mode(path: Path) -> int:
+    return stat.S_IMODE(path.stat().st_mode)
+
+
+def test_atomic_write_replaces_content(tmp_path: Path):
+    path = tmp_path / "data" / "users.json"
+
+    atomic_write(path, "[]", durability="none")
+    atomic_write(path, b"[1]", durability="fsync_dir")
+
+    assert path.read_bytes() == b"[1]"
+    assert [p.name for p in path.parent.iterdir()] == ["users.json"]
+
+
+def test_atomic_write_keeps_existing_mode(tmp_path: Path):
+    path = tmp_path / "rates.json"
+    path.write_text("{}")
+    path.chmod(0o640)
+
+    atomic_write(path, "{}", durability="none")
+
+    assert _mode(path) == 0o640
+
+
+def test_atomic_write_new_file_uses_umask(tmp_path: Path):
+    umask = os.umask(0)
+    os.umask(umask)
+    path = tmp_path / "users.json"
+
+    atomic_write(path, "[]", durability="none")
+
+    # Как у файла, созданного open(), а не 0600 от mkstemp
+    assert _mode(path) == 0o666 & ~umask
+
+
+def test_atomic_write_uses_current_umask(tmp_path: Path):
+    path = tmp_path / "portfolio.json"
+    previous = os.umask(0o027)
+    try:
+        atomic_write(path, "{}", durability="none")
+    finally:
+        os.umask(previous)
+
+    # umask, измененный после импорта модуля, тоже учитывается
+    assert _mode(path) == 0o640
@@ -0,0 +1,165 @@
+"""Тесты межпроцессных блокировок файлов данных и счетчика поколений."""
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core.exceptions import ConcurrentModificationError
+from valutatrade_hub.infra.backends import JsonBackend
+from valutatrade_hub.infra.database import get_db
+from valutatrade_hub.infra.locks import RWLock, get_file_lock
+
+USER = {
+    "user_id": 1,
+    "username": "alice",
+    "hashed_password": "hash",
+    "salt": "salt",
+    "registration_date": "2025-10-09T12:00:00",
+}
+
+
+def test_lock_files_live_in_lock_dir(data_dir: Path):
+    db = get_db()
+    JsonBackend(db).register_user(USER, {"user_id": 1, "version": 0, "wallets": {}})
+
+    lock_files = sorted(
+        path.relative_to(data_dir).as_posix() for path in data_dir.rglob("*.lock")
+    )
+
+    assert lock_files
+    assert all(name.startswith(".locks/") for name in lock_files)
+    assert ".locks/portfolios/1.json.lock" in lock_files
+
+
+def test_generation_bumped_only_by_successful_write(data_dir: Path):
+    db = get_db()
+    backend = JsonBackend(db)
+    backend.register_user(USER, {"user_id": 1, "version": 0, "wallets": {}})
+    lock = db.file_lock("portfolios/1.json")
+    generation = lock.generation()
+
+    # Захват без записи и отклоненное сравнение с обменом
+    with lock.write_locked():
+        pass
+    with pytest.raises(ConcurrentModificationError):
+        backend.save_portfolio(
+            {"user_id": 1, "version": 4, "wallets": {}}, expected_version=3
+        )
+    assert lock.generation() == generation
+
+    backend.save_portfolio({"user_id": 1, "version": 1, "wallets": {}}, 0)
+    assert lock.generation() == generation + 1
+
+
+def test_bump_generation_requires_write_lock(data_dir: Path):
+    with pytest.raises(RuntimeError):
+        get_db().file_lock("users.json").bump_generation()
+
+
+# =============================================================================
+# RWLock
+# =============================================================================
+
+
+def _wait_until(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+def test_rwlock_is_reentrant():
+    lock = RWLock()
+
+    with lock.write_locked():
+        with lock.write_locked(), lock.read_locked():
+            assert lock.holds_write() and lock.holds_read()
+        assert lock.holds_write() and not lock.holds_read()
+    with lock.read_locked(), lock.read_locked():
+        assert lock.holds_read()
+
+    assert not lock.holds_read() and not lock.holds_write()
+
+
+def test_rwlock_rejects_upgrade_and_unbalanced_release():
+    lock = RWLock()
+
+    with lock.read_locked():
+        with pytest.raises(RuntimeError):
+            lock.acquire_write()
+    with pytest.raises(RuntimeError):
+        lock.release_read()
+    with pytest.raises(RuntimeError):
+        lock.release_write()
+
+
+def test_rwlock_readers_share_lock():
+    lock = RWLock()
+    barrier = threading.Barrier(3, timeout=2)
+
+    def read() -> None:
+        with lock.read_locked():
+            # Все три читателя одновременно внутри блокировки
+            barrier.wait()
+
+    threads = [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not barrier.broken
+
+
+def test_rwlock_waiting_writer_blocks_new_readers():
+    lock = RWLock()
+    order: list[str] = []
+
+    def write() -> None:
+        with lock.write_locked():
+            order.append("write")
+
+    def read() -> None:
+        with lock.read_locked():
+            order.append("read")
+
+    lock.acquire_read()
+    writer = threading.Thread(target=write)
+    writer.start()
+    _wait_until(lambda: lock._writers_waiting == 1)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    reader.join(0.05)
+    assert reader.is_alive()
+
+    lock.release_read()
+    writer.join()
+    reader.join()
+    assert order == ["write", "read"]
+
+
+def test_file_lock_serializes_writers(data_dir: Path):
+    lock = get_file_lock(data_dir / "counter.json")
+    assert get_file_lock(data_dir / "counter.json") is lock
+    counter = {"value": 0}
+
+    def increment() -> None:
+        for _ in range(20):
+            with lock.write_locked():
+                value = counter["value"]
+                time.sleep(0)
+                counter["value"] = value + 1
+                lock.bump_generation()
+
+    generation = lock.generation()
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter["value"] == 80
+    assert lock.generation() == generation + 80
@@ -0,0 +1,322 @@
+"""Тесты книги курсов: матрица кросс-курсов, маршруты и фоновое обновление."""
+
+import os
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from valutatrade_hub.core import ratebook
+from valutatrade_hub.core.exceptions import CurrencyNotFoundError
+from valutatrade_hub.core.ratebook import RateBook
+from valutatrade_hub.infra.ratesformat import normalize_rates_data
+from valutatrade_hub.parser_service import config as parser_config_module
+
+UPDATED_AT = "2025-10-10T12:00:00Z"
+
+
+def _book(**rates: float) -> RateBook:
+    return RateBook(
+        {
+            "pairs": {
+                pair: {"rate": rate, "updated_at": UPDATED_AT, "source": "test"}
+                for pair, rate in rates.items()
+            },
+            "last_refresh": UPDATED_AT,
+        }
+    )
+
+
+@pytest.fixture
+def book() -> RateBook:
+    # ETH котируется только к BTC: курс к USD — через треугольник
+    return _book(BTC_USD=60000.0, EUR_USD=1.2, ETH_BTC=0.05)
+
+
+def test_matrix_rows_are_prices_in_row_currency(book):
+    n = len(book.codes)
+    usd, btc = book.position("USD"), book.position("BTC")
+
+    # matrix[i * n + j] — цена валюты j в валюте i
+    assert book.matrix[usd * n + btc] == 60000.0
+    assert book.matrix[btc * n + usd] == pytest.approx(1 / 60000.0)
+    assert all(book.matrix[i * n + i] == 1.0 for i in range(n))
+
+
+def test_cross_rate_orientation(book):
+    # Сколько единиц to_code стоит одна единица from_code
+    assert book.cross_rate("BTC", "USD") == 60000.0
+    assert book.cross_rate("USD", "BTC") == pytest.approx(1 / 60000.0)
+    assert book.cross_rate("BTC", "EUR") == pytest.approx(50000.0)
+    assert book.cross_rate("ETH", "USD") == pytest.approx(3000.0)
+    assert book.cross_rate("ETH", "EUR") == pytest.approx(2500.0)
+
+
+def test_quotes_match_cross_rates(book):
+    quotes = book.quotes("EUR")
+
+    assert quotes["EUR"] == 1.0
+    for code in book.codes:
+        assert quotes[code] == pytest.approx(book.cross_rate(code, "EUR"))
+
+
+def test_rates_are_relative_to_base(book):
+    assert book.base_currency == "USD"
+    assert book.rate("USD") == 1.0
+    assert book.rate("ETH") == pytest.approx(3000.0)
+    assert book.quotes("USD") == pytest.approx(dict(book.rates))
+
+
+def test_route_goes_through_quoted_pairs(book):
+    assert book.route("ETH", "USD") == ("ETH", "BTC", "USD")
+    assert book.route("USD", "USD") == ("USD",)
+
+
+def test_unknown_currency(book):
+    with pytest.raises(CurrencyNotFoundError):
+        book.cross_rate("BTC", "XYZ")
+    with pytest.raises(CurrencyNotFoundError):
+        book.quotes("XYZ")
+
+
+def test_missing_file_uses_default_rates():
+    book = RateBook(None)
+
+    assert book.is_missing and book.is_default
+    assert book.updated_at is None
+    assert book.is_stale()
+
+
+def test_legacy_format_is_normalized_to_pairs():
+    legacy = {
+        "rates": {"USD": 1.0, "EUR": 1.08, "BTC": 95000},
+        "base_currency": "USD",
+        "updated_at": UPDATED_AT,
+    }
+
+    normalized = normalize_rates_data(legacy, source="legacy")
+
+    assert normalized == {
+        "pairs": {
+            "EUR_USD": {"rate": 1.08, "updated_at": UPDATED_AT, "source": "legacy"},
+            "BTC_USD": {"rate": 95000.0, "updated_at": UPDATED_AT, "source": "legacy"},
+        },
+        "last_refresh": UPDATED_AT,
+    }
+    assert RateBook(legacy).cross_rate("BTC", "EUR") == pytest.approx(95000 / 1.08)
+
+
+def test_pairs_format_is_copied():
+    data = {"pairs": {"EUR_USD": {"rate": 1.2}}, "last_refresh": UPDATED_AT}
+
+    normalized = normalize_rates_data(data)
+    normalized["pairs"]["EUR_USD"]["rate"] = 0.0
+
+    assert data["pairs"]["EUR_USD"]["rate"] == 1.2
+    assert normalize_rates_data({}) == {"pairs": {}, "last_refresh": None}
+
+
+def test_is_stale_uses_ttl(settings_override, monkeypatch):
+    book = _book(BTC_USD=60000.0)
+    refreshed = ratebook.parse_timestamp(UPDATED_AT)
+    monkeypatch.setattr(ratebook.time, "time", lambda: refreshed + 100.0)
+
+    assert book.age_seconds() == 100.0
+    assert book.is_stale(ttl_seconds=50)
+    assert not book.is_stale(ttl_seconds=100)
+    settings_override(rates_ttl_seconds=99)
+    assert book.is_stale()
+    settings_override(rates_ttl_seconds=3600)
+    assert not book.is_stale()
+
+
+def _dated_book(pairs: dict[str, tuple[float, str]]) -> RateBook:
+    return RateBook(
+        {
+            "pairs": {
+                pair: {"rate": rate, "updated_at": updated_at, "source": "test"}
+                for pair, (rate, updated_at) in pairs.items()
+            },
+            "last_refresh": UPDATED_AT,
+        }
+    )
+
+
+def test_multi_hop_triangulation():
+    # SOL → ETH → BTC → USD: три пересчета
+    book = _book(BTC_USD=60000.0, ETH_BTC=0.05, SOL_ETH=0.04, EUR_USD=1.2)
+
+    assert book.route("SOL", "USD") == ("SOL", "ETH", "BTC", "USD")
+    assert book.rate("SOL") == pytest.approx(120.0)
+    assert book.cross_rate("SOL", "EUR") == pytest.approx(100.0)
+    assert book.route("SOL", "EUR") == ("SOL", "ETH", "BTC", "USD", "EUR")
+
+
+def test_equal_length_paths_prefer_fresher_quotes():
+    # ETH → USD через BTC (свежие пары) или через EUR (одна пара старая)
+    book = _dated_book(
+        {
+            "ETH_BTC": (0.05, "2025-10-10T12:00:00Z"),
+            "BTC_USD": (60000.0, "2025-10-10T12:00:00Z"),
+            "ETH_EUR": (2000.0, "2025-10-10T12:00:00Z"),
+            "EUR_USD": (1.2, "2025-10-01T12:00:00Z"),
+        }
+    )
+
+    assert book.route("ETH", "USD") == ("ETH", "BTC", "USD")
+    assert book.rate("ETH") == pytest.approx(3000.0)
+
+
+def test_direct_quote_beats_fresher_triangle():
+    book = _dated_book(
+        {
+            "ETH_USD": (2900.0, "2025-10-01T12:00:00Z"),
+            "ETH_BTC": (0.05, "2025-10-10T12:00:00Z"),
+            "BTC_USD": (60000.0, "2025-10-10T12:00:00Z"),
+        }
+    )
+
+    assert book.route("ETH", "USD") == ("ETH", "USD")
+    assert book.rate("ETH") == 2900.0
+
+
+def test_reverse_pair_uses_fresher_quote():
+    book = _dated_book(
+        {
+            "BTC_USD": (60000.0, "2025-10-01T12:00:00Z"),
+            "USD_BTC": (1 / 50000.0, "2025-10-10T12:00:00Z"),
+        }
+    )
+
+    assert book.rate("BTC") == pytest.approx(50000.0)
+
+
+@pytest.mark.parametrize("pair", [{}, {"rate": None}, {"rate": "n/a"}])
+def test_malformed_pairs_are_skipped(pair, caplog):
+    book = RateBook(
+        {
+            "pairs": {
+                "BTC_USD": pair,
+                "EUR_USD": {"rate": 1.2, "updated_at": UPDATED_AT},
+            },
+            "last_refresh": UPDATED_AT,
+        }
+    )
+
+    assert "BTC_USD" not in book.pairs
+    assert "BTC" not in book.rates
+    assert book.rate("EUR") == 1.2
+    assert "BTC_USD" in caplog.text
+
+
+def test_only_malformed_pairs_fall_back_to_default_rates():
+    book = RateBook({"pairs": {"BTC_USD": {}}})
+
+    assert book.is_default
+    assert book.rate("BTC") == 95000.0
+
+
+# =============================================================================
+# Stale-while-revalidate
+# =============================================================================
+
+
+@pytest.fixture
+def refresh_state(data_dir, monkeypatch):
+    """Чистое состояние фонового обновления процесса."""
+    monkeypatch.setattr(ratebook, "_refresh_thread", None)
+    monkeypatch.setattr(ratebook, "_refresh_started", None)
+    monkeypatch.setattr(ratebook, "_refresh_join_registered", True)
+    yield
+    ratebook._join_refresh()
+
+
+def test_revalidate_starts_one_refresh(refresh_state, monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def refresh() -> None:
+        calls.append(1)
+        release.wait(5)
+
+    monkeypatch.setattr(ratebook, "_refresh_rates", refresh)
+    stale = _book(BTC_USD=60000.0)
+
+    assert ratebook.revalidate(stale)
+    # Пока обновление идет, новое не запускается
+    assert ratebook.revalidate(stale)
+    release.set()
+    assert ratebook._join_refresh()
+    assert calls == [1]
+
+    # После завершения следующее — не раньше cooldown
+    assert not ratebook.revalidate(stale)
+    assert calls == [1]
+
+
+def test_revalidate_skips_fresh_and_default_books(refresh_state, monkeypatch):
+    calls = []
+    monkeypatch.setattr(ratebook, "_refresh_rates", lambda: calls.append(1))
+    fresh = RateBook(
+        {
+            "pairs": {"BTC_USD": {"rate": 60000.0, "updated_at": UPDATED_AT}},
+            "last_refresh": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+    )
+
+    assert not ratebook.revalidate(RateBook(None))
+    assert not ratebook.revalidate(fresh)
+    assert calls == []
+
+
+def test_join_refresh_is_bounded(refresh_state, settings_override, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(ratebook, "_refresh_rates", lambda: release.wait(5))
+    settings_override(rates_refresh_join_seconds=0.05)
+
+    assert ratebook.revalidate(_book(BTC_USD=60000.0))
+    started = time.monotonic()
+    assert not ratebook._join_refresh()
+    assert time.monotonic() - started < 1
+    release.set()
+
+
+def test_refresh_skipped_while_other_process_refreshes(refresh_state, monkeypatch):
+    monkeypatch.setattr(ratebook, "get_rate_book", pytest.fail)
+
+    # Слот уже захвачен (другое открытие файла — как другой процесс)
+    with ratebook._refresh_slot() as acquired:
+        assert acquired
+        ratebook._refresh_rates()
+
+
+def test_refresh_removes_leftover_temp_files(
+    refresh_state, parser_config, monkeypatch
+):
+    runs = []
+    updater = types.ModuleType("valutatrade_hub.parser_service.updater")
+    updater.RatesUpdater = lambda: types.SimpleNamespace(
+        run_update=lambda: runs.append(1)
+    )
+    monkeypatch.setitem(sys.modules, updater.__name__, updater)
+    monkeypatch.setattr(
+        parser_config_module, "get_parser_config", lambda: parser_config
+    )
+    monkeypatch.setattr(ratebook, "get_rate_book", lambda: _book(BTC_USD=60000.0))
+
+    rates_dir = os.path.dirname(parser_config.RATES_FILE_PATH)
+    old_tmp = os.path.join(rates_dir, ".rates.json.0badc0de.tmp")
+    new_tmp = os.path.join(rates_dir, ".rates.json.0123abcd.tmp")
+    for path in (old_tmp, new_tmp):
+        with open(path, "w") as f:
+            f.write("{")
+    os.utime(old_tmp, (time.time() - 7200, time.time() - 7200))
+
+    ratebook._refresh_rates()
+
+    assert runs == [1]
+    assert not os.path.exists(old_tmp)
+    # Свежий временный файл может принадлежать идущей записи
+    assert os.path.exists(new_tmp)
@@ -0,0 +1,126 @@
+"""Тесты свертки истории в свечи и политики хранения (parser_service.rollup)."""
+
+import json
+import threading
+from datetime import datetime
+
+from valutatrade_hub.parser_service import storage
+from valutatrade_hub.parser_service.rollup import expire_history, rollup_history
+
+NOW = datetime(2025, 3, 1, 12, 0, 0)
+
+
+def _tick(timestamp: str, rate: float, pair: str = "BTC_USD") -> dict:
+    return {"pair": pair, "rate": rate, "source": "test", "timestamp": timestamp}
+
+
+def _candles(interval: str, parser_config) -> list[dict]:
+    return list(storage.iter_candles(interval, config=parser_config))
+
+
+def test_rollup_builds_candles_for_closed_segments(parser_config):
+    storage.add_history_records(
+        [
+            _tick("2025-01-10T10:00:05Z", 100.0),
+            _tick("2025-01-10T10:00:40Z", 110.0),
+            _tick("2025-01-10T10:30:00Z", 90.0),
+            _tick("2025-03-01T11:00:00Z", 120.0),  # текущий сегмент
+        ],
+        parser_config,
+    )
+
+    assert rollup_history(parser_config, now=NOW) == 1
+
+    hourly = _candles("1h", parser_config)
+    assert hourly == [
+        {
+            "pair": "BTC_USD",
+            "start": "2025-01-10T10:00:00Z",
+            "open": 100.0,
+            "high": 110.0,
+            "low": 90.0,
+            "close": 90.0,
+            "count": 3,
+        }
+    ]
+    assert [c["count"] for c in _candles("1m", parser_config)] == [2, 1]
+
+    # Повторный запуск ничего не делает
+    assert rollup_history(parser_config, now=NOW) == 0
+
+
+def test_late_tick_rerolls_segment(parser_config):
+    storage.add_history_records([_tick("2025-01-10T10:00:05Z", 100.0)], parser_config)
+    rollup_history(parser_config, now=NOW)
+
+    # Поздний тик в уже свернутый сегмент
+    storage.add_history_records([_tick("2025-01-10T10:20:00Z", 130.0)], parser_config)
+
+    assert rollup_history(parser_config, now=NOW) == 1
+    (daily,) = _candles("1d", parser_config)
+    assert daily["count"] == 2
+    assert daily["high"] == 130.0
+
+    state = storage.read_rollup_state(parser_config)["segments"]["2025-01-10"]
+    assert state["record_count"] == 2
+    assert sorted(state["intervals"]) == ["1d", "1h", "1m"]
+
+
+def test_expire_keeps_segment_with_unrolled_ticks(parser_config):
+    storage.add_history_records([_tick("2025-01-10T10:00:05Z", 100.0)], parser_config)
+    rollup_history(parser_config, now=NOW)
+    storage.add_history_records([_tick("2025-01-10T11:00:00Z", 101.0)], parser_config)
+
+    # Сегмент старше HISTORY_RAW_RETENTION_DAYS, но поздний тик не свернут
+    assert expire_history(parser_config, now=NOW)["raw_segments"] == 0
+    assert "2025-01-10" in storage.read_history_manifest(parser_config)["segments"]
+
+    rollup_history(parser_config, now=NOW)
+    assert expire_history(parser_config, now=NOW)["raw_segments"] == 1
+    assert storage.read_history_manifest(parser_config)["segments"] == {}
+    assert sum(c["count"] for c in _candles("1d", parser_config)) == 2
+
+
+def test_expire_candles_prunes_rollup_state(parser_config):
+    parser_config.HISTORY_CANDLE_RETENTION_DAYS = {"1m": 10, "1h": 20, "1d": 30}
+    storage.add_history_records([_tick("2025-01-10T10:00:05Z", 100.0)], parser_config)
+    rollup_history(parser_config, now=NOW)
+
+    stats = expire_history(parser_config, now=NOW)
+
+    assert stats["raw_segments"] == 1
+    assert stats["candles_1m"] == stats["candles_1h"] == stats["candles_1d"] == 1
+    assert stats["rollup_state"] == 1
+    state_path = storage._candles_dir(parser_config) / storage.ROLLUP_STATE_NAME
+    assert json.loads(state_path.read_text()) == {"segments": {}}
+
+
+def test_expire_keeps_state_while_candles_remain(parser_config):
+    storage.add_history_records([_tick("2025-01-10T10:00:05Z", 100.0)], parser_config)
+    rollup_history(parser_config, now=NOW)
+
+    stats = expire_history(parser_config, now=NOW)
+
+    # Сырой сегмент удален, свечи 1d хранятся бессрочно
+    assert stats["raw_segments"] == 1
+    assert stats["rollup_state"] == 0
+    assert "2025-01-10" in storage.read_rollup_state(parser_config)["segments"]
+
+
+def test_concurrent_appends_keep_manifest_consistent(parser_config):
+    def append(worker: int) -> None:
+        for i in range(10):
+            storage.add_history_records(
+                [_tick(f"2025-01-10T1{worker}:00:{i:02d}Z", 100.0 + i)],
+                parser_config,
+            )
+
+    threads = [threading.Thread(target=append, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    manifest = storage.read_history_manifest(parser_config)
+    assert manifest["record_count"] == 40
+    assert manifest["segments"]["2025-01-10"]["record_count"] == 40
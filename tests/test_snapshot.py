@@ -0,0 +1,80 @@
+"""Тесты неизменяемых снимков данных (infra.snapshot) и их кеширования."""
+
+import json
+from pathlib import Path
+from types import MappingProxyType
+
+import pytest
+
+from valutatrade_hub.infra.database import get_db
+from valutatrade_hub.infra.snapshot import freeze, json_default, loads_frozen, thaw
+
+DATA = {"user_id": 1, "wallets": {"USD": {"balance": 10.0}}, "tags": ["a", ["b"]]}
+
+
+def test_freeze_is_deeply_immutable():
+    snapshot = freeze(DATA)
+
+    assert type(snapshot) is MappingProxyType
+    assert snapshot["tags"] == ("a", ("b",))
+    with pytest.raises(TypeError):
+        snapshot["user_id"] = 2
+    with pytest.raises(TypeError):
+        snapshot["wallets"]["USD"]["balance"] = 0.0
+    with pytest.raises(AttributeError):
+        snapshot["tags"].append("c")
+
+
+def test_freeze_reuses_frozen_records():
+    record = freeze({"user_id": 1})
+
+    snapshot = freeze([record, {"user_id": 2}])
+
+    assert snapshot[0] is record
+    assert freeze(snapshot[1]) is snapshot[1]
+
+
+def test_thaw_returns_independent_copy():
+    snapshot = freeze(DATA)
+
+    copy = thaw(snapshot)
+    copy["wallets"]["USD"]["balance"] = 0.0
+    copy["tags"][1].append("c")
+
+    assert copy != DATA
+    assert snapshot["wallets"]["USD"]["balance"] == 10.0
+    assert thaw(snapshot) == DATA
+
+
+def test_loads_frozen_matches_freeze():
+    payload = json.dumps(DATA)
+
+    assert loads_frozen(payload) == freeze(DATA)
+    assert json.loads(json.dumps(loads_frozen(payload), default=json_default)) == DATA
+
+
+def test_saved_snapshot_is_isolated_from_caller(data_dir: Path):
+    db = get_db()
+    data = thaw(DATA)
+
+    snapshot = db.save("portfolio.json", data)
+    data["wallets"]["USD"]["balance"] = 99.0
+    data["tags"].append("c")
+
+    assert db.load("portfolio.json") is snapshot
+    assert thaw(snapshot) == DATA
+
+
+def test_failed_transaction_leaves_snapshot_untouched(data_dir: Path):
+    db = get_db()
+    db.save("portfolio.json", DATA)
+    before = db.load("portfolio.json")
+
+    with pytest.raises(RuntimeError):
+        with db.transaction("portfolio.json") as data:
+            data["wallets"]["USD"]["balance"] = 0.0
+            raise RuntimeError("abort")
+
+    assert db.load("portfolio.json") is before
+    assert db.load("portfolio.json", use_cache=False) == before
+    assert before["wallets"]["USD"]["balance"] == 10.0
@@ -0,0 +1,153 @@
+"""Тесты хранилища истории курсов: миграция, сегменты и манифест."""
+
+import dataclasses
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.parser_service import storage
+
+
+def _record(timestamp: str, rate: float, pair: str = "BTC_USD") -> dict:
+    return storage.build_history_record(pair, rate, "test", timestamp=timestamp)
+
+
+TWO_DAYS = (("2025-01-10T10:00:00Z", 100.0), ("2025-01-11T10:00:00Z", 110.0))
+
+
+def _add(config, *records: tuple[str, float], pair: str = "BTC_USD") -> None:
+    storage.add_history_records(
+        [
+            {"pair": pair, "rate": rate, "source": "test", "timestamp": ts}
+            for ts, rate in records
+        ],
+        config=config,
+    )
+
+
+def _rates(config, **filters) -> list[float]:
+    return [r["rate"] for r in storage.iter_history_records(config=config, **filters)]
+
+
+def test_migration_from_legacy_formats(parser_config):
+    legacy = Path(parser_config.HISTORY_FILE_PATH)
+    log = Path(parser_config.HISTORY_LOG_PATH)
+    log_manifest = log.with_name("exchange_rates.manifest.json")
+    legacy.write_text(
+        json.dumps({"history": [_record("2025-01-10T10:00:00Z", 100.0)]})
+    )
+    log.write_text(
+        json.dumps(_record("2025-01-11T10:00:00Z", 110.0))
+        + "\n"
+        + json.dumps(_record("2025-01-11T11:00:00Z", 120.0))
+        + "\n"
+    )
+    log_manifest.write_text("{}")
+
+    assert storage.migrate_exchange_rates_history(parser_config) == 3
+
+    manifest = storage.read_history_manifest(parser_config)
+    assert sorted(manifest["segments"]) == ["2025-01-10", "2025-01-11"]
+    assert manifest["record_count"] == 3
+    assert not legacy.exists() and not log.exists() and not log_manifest.exists()
+    assert log.with_name("exchange_rates.jsonl.migrated").exists()
+    # Повторная миграция ничего не делает
+    assert storage.migrate_exchange_rates_history(parser_config) == 0
+
+
+@pytest.mark.parametrize("compression, suffix", [("gzip", ".gz"), ("lzma", ".xz")])
+def test_compression_keeps_reads_transparent(parser_config, compression, suffix):
+    config = dataclasses.replace(parser_config, HISTORY_COMPRESSION=compression)
+    _add(config, *TWO_DAYS)
+
+    assert storage.compress_history_segments(older_than_days=1, config=config) == 2
+
+    history_dir = Path(config.HISTORY_DIR_PATH)
+    manifest = storage.read_history_manifest(config)
+    for key, entry in manifest["segments"].items():
+        assert entry["compressed"] == compression
+        assert entry["file"] == f"{key}.jsonl{suffix}"
+        assert entry["size"] == (history_dir / entry["file"]).stat().st_size
+        assert not (history_dir / f"{key}.jsonl").exists()
+    assert _rates(config) == [100.0, 110.0]
+    # Повторное сжатие ничего не делает
+    assert storage.compress_history_segments(older_than_days=1, config=config) == 0
+
+
+def test_current_and_recent_segments_are_not_compressed(parser_config):
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    _add(parser_config, ("2025-01-10T10:00:00Z", 100.0), (now, 110.0))
+
+    compressed = storage.compress_history_segments(0, parser_config)
+
+    assert compressed == 1
+
+    segments = storage.read_history_manifest(parser_config)["segments"]
+    assert segments["2025-01-10"]["compressed"] == "gzip"
+    assert segments[now[:10]]["compressed"] is None
+
+
+def test_backfill_decompresses_segment(parser_config):
+    _add(parser_config, ("2025-01-10T10:00:00Z", 100.0))
+    storage.compress_history_segments(older_than_days=1, config=parser_config)
+
+    _add(parser_config, ("2025-01-10T12:00:00Z", 120.0))
+
+    entry = storage.read_history_manifest(parser_config)["segments"]["2025-01-10"]
+    assert entry["compressed"] is None and entry["file"] == "2025-01-10.jsonl"
+    assert entry["record_count"] == 2
+    assert _rates(parser_config) == [100.0, 120.0]
+
+
+def test_manifest_rescans_segment_with_size_mismatch(parser_config):
+    _add(parser_config, ("2025-01-10T10:00:00Z", 100.0))
+    segment = Path(parser_config.HISTORY_DIR_PATH) / "2025-01-10.jsonl"
+    # Дозапись без обновления манифеста (процесс упал между шагами)
+    with open(segment, "a") as f:
+        f.write(json.dumps(_record("2025-01-10T23:00:00Z", 130.0)) + "\n")
+
+    manifest = storage.read_history_manifest(parser_config)
+
+    entry = manifest["segments"]["2025-01-10"]
+    assert entry["record_count"] == 2
+    assert entry["end"] == "2025-01-10T23:00:00Z"
+    assert entry["size"] == segment.stat().st_size
+    assert manifest["record_count"] == 2
+
+
+def test_manifest_is_rebuilt_when_missing(parser_config):
+    _add(parser_config, *TWO_DAYS)
+    history_dir = Path(parser_config.HISTORY_DIR_PATH)
+    (history_dir / storage.HISTORY_MANIFEST_NAME).unlink()
+
+    manifest = storage.read_history_manifest(parser_config)
+
+    assert sorted(manifest["segments"]) == ["2025-01-10", "2025-01-11"]
+    assert manifest["record_count"] == 2
+    assert manifest["last_updated"] == "2025-01-11T10:00:00Z"
+
+
+def test_range_and_pair_filters(parser_config):
+    _add(parser_config, *TWO_DAYS)
+    _add(parser_config, ("2025-01-11T11:00:00Z", 1.1), pair="EUR_USD")
+
+    assert _rates(parser_config, start="2025-01-11T00:00:00Z") == [110.0, 1.1]
+    assert _rates(parser_config, end="2025-01-10T23:59:59Z") == [100.0]
+    assert _rates(parser_config, pairs=["EUR_USD"]) == [1.1]
+
+
+def test_delete_segments_updates_manifest(parser_config):
+    _add(parser_config, *TWO_DAYS)
+
+    keys = ["2025-01-10", "2024-12-31"]
+    deleted = storage.delete_history_segments(keys, parser_config)
+
+    assert deleted == 1
+
+    manifest = storage.read_history_manifest(parser_config)
+    assert list(manifest["segments"]) == ["2025-01-11"]
+    assert manifest["record_count"] == 1
+    assert not (Path(parser_config.HISTORY_DIR_PATH) / "2025-01-10.jsonl").exists()
+    assert _rates(parser_config) == [110.0]
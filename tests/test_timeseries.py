@@ -0,0 +1,166 @@
+"""Тесты колоночного представления истории курсов (PairSeries, RateHistoryIndex)."""
+
+import pytest
+
+from valutatrade_hub.parser_service import storage
+from valutatrade_hub.parser_service.history_query import RateHistoryIndex
+from valutatrade_hub.parser_service.timeseries import (
+    PairSeries,
+    build_series,
+    from_epoch,
+    to_epoch,
+)
+
+
+def _record(timestamp: str, rate: float, **fields) -> dict:
+    return {
+        "id": f"BTC_USD_{timestamp}",
+        "from": "BTC",
+        "to": "USD",
+        "rate": rate,
+        "updated_at": timestamp,
+        **fields,
+    }
+
+
+def test_epoch_round_trip():
+    epoch = to_epoch("2025-10-10T12:00:01Z")
+
+    assert from_epoch(epoch) == "2025-10-10T12:00:01Z"
+    assert to_epoch(epoch) == epoch
+
+
+def test_canonical_records_round_trip():
+    records = [
+        storage.build_history_record(
+            "BTC_USD",
+            59337.21,
+            "CoinGecko",
+            "2025-10-10T12:00:00Z",
+            raw_id="bitcoin",
+            request_ms=124,
+        ),
+        storage.build_history_record(
+            "BTC_USD", 59400.0, "CoinGecko", "2025-10-10T12:05:00Z", status_code=None
+        ),
+    ]
+    series = PairSeries("BTC", "USD")
+
+    series.extend(records)
+
+    assert series.to_records() == records
+    assert list(series.rates) == [59337.21, 59400.0]
+    assert series.timestamps[1] - series.timestamps[0] == 300
+
+
+def test_non_canonical_fields_round_trip():
+    records = [
+        # Целый курс, смещение часового пояса, свой id и лишние ключи
+        _record("2025-10-10T15:00:00+03:00", 59000, id="custom-1", etag='"abc"'),
+        # Значения, не помещающиеся в колонки метаданных
+        _record("2025-10-10T12:01:00Z", 1.5, source=None, request_ms=-5),
+        _record("2025-10-10T12:02:00Z", 2.5, status_code=True, raw_id=42),
+    ]
+    series = PairSeries("BTC", "USD")
+
+    series.extend(records)
+
+    assert series.to_records() == records
+    assert type(series.record_at(0)["rate"]) is int
+
+
+def test_append_rejects_other_pair():
+    with pytest.raises(ValueError):
+        PairSeries("ETH", "USD").append(_record("2025-10-10T12:00:00Z", 1.0))
+
+
+def test_sort_keeps_rows_together():
+    records = [
+        _record("2025-10-10T12:02:00Z", 3.0, source="B", etag="x"),
+        _record("2025-10-10T12:00:00Z", 1.0, source="A"),
+        _record("2025-10-10T12:01:00Z", 2.0),
+    ]
+
+    series = build_series(records)["BTC_USD"]
+
+    assert series.is_sorted()
+    assert series.to_records() == [records[1], records[2], records[0]]
+
+
+def test_history_series_round_trip_through_storage(parser_config):
+    records = [
+        {"pair": "BTC_USD", "rate": 100.0, "source": "test", "timestamp": ts}
+        for ts in ("2025-01-10T10:00:00Z", "2025-01-11T10:00:00Z")
+    ]
+    storage.add_history_records(records, parser_config)
+
+    series = storage.load_history_series(parser_config)
+
+    assert list(series) == ["BTC_USD"]
+    loaded = series["BTC_USD"].to_records()
+    assert [r["updated_at"] for r in loaded] == [r["timestamp"] for r in records]
+    assert all(r["source"] == "test" for r in loaded)
+
+
+def _add_history(config, pair: str, *records: tuple[str, float]) -> None:
+    storage.add_history_records(
+        [
+            {"pair": pair, "rate": rate, "source": "test", "timestamp": ts}
+            for ts, rate in records
+        ],
+        config,
+    )
+
+
+def test_index_range_and_as_of():
+    index = RateHistoryIndex(
+        [
+            _record("2025-10-10T12:00:00Z", 1.0),
+            _record("2025-10-10T12:10:00Z", 3.0),
+            _record("2025-10-10T12:05:00Z", 2.0),
+        ]
+    )
+
+    assert index.as_of("BTC_USD", "2025-10-10T11:59:59Z") is None
+    assert index.as_of("BTC_USD", "2025-10-10T12:05:00Z")["rate"] == 2.0
+    assert index.as_of("BTC_USD", "2025-10-10T12:07:00Z")["rate"] == 2.0
+    rates = [r["rate"] for r in index.range("BTC_USD", "2025-10-10T12:05:00Z")]
+    assert rates == [2.0, 3.0]
+    assert index.as_of("ETH_USD", "2025-10-10T12:07:00Z") is None
+
+
+def test_loaded_index_answers_as_of_at_range_start(parser_config):
+    _add_history(
+        parser_config,
+        "BTC_USD",
+        ("2025-01-08T10:00:00Z", 90.0),
+        ("2025-01-09T10:00:00Z", 100.0),
+        ("2025-01-11T10:00:00Z", 110.0),
+    )
+    _add_history(parser_config, "EUR_USD", ("2025-01-08T12:00:00Z", 1.1))
+    _add_history(parser_config, "ETH_USD", ("2025-01-12T10:00:00Z", 3000.0))
+
+    index = RateHistoryIndex.load(
+        start="2025-01-10T00:00:00Z", end="2025-01-12T00:00:00Z", config=parser_config
+    )
+
+    # Курс, действовавший на начало диапазона, берется из более ранних сегментов
+    assert index.as_of("BTC_USD", "2025-01-10T00:00:00Z")["rate"] == 100.0
+    assert index.as_of("EUR_USD", "2025-01-11T00:00:00Z")["rate"] == 1.1
+    assert index.as_of("ETH_USD", "2025-01-11T00:00:00Z") is None
+    # range() с тем же start лишнюю запись не возвращает
+    assert [r["rate"] for r in index.range("BTC_USD", "2025-01-10T00:00:00Z")] == [
+        110.0
+    ]
+
+
+def test_loaded_index_seeds_only_requested_pairs(parser_config):
+    _add_history(parser_config, "BTC_USD", ("2025-01-09T10:00:00Z", 100.0))
+    _add_history(parser_config, "EUR_USD", ("2025-01-09T12:00:00Z", 1.1))
+
+    index = RateHistoryIndex.load(
+        start="2025-01-10T00:00:00Z", pairs=["EUR_USD"], config=parser_config
+    )
+
+    assert index.pairs() == ["EUR_USD"]
+    assert index.as_of("EUR_USD", "2025-01-10T00:00:00Z")["rate"] == 1.1
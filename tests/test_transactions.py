@@ -0,0 +1,87 @@
+"""Тесты многофайловых транзакций DatabaseManager.save_many()."""
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.infra.database import get_db
+
+FILES = {"users.json": [{"user_id": 1}], "portfolios/1.json": {"user_id": 1}}
+
+
+def _txn_files(data_dir: Path) -> list[str]:
+    txn_dir = data_dir / "txn"
+    return sorted(p.name for p in txn_dir.iterdir()) if txn_dir.is_dir() else []
+
+
+def test_save_many_writes_all_files(data_dir: Path):
+    db = get_db()
+
+    snapshots = db.save_many(FILES)
+
+    assert set(snapshots) == set(FILES)
+    for name, data in FILES.items():
+        assert json.loads((data_dir / name).read_text()) == data
+        assert db.load(name) is snapshots[name]
+    assert _txn_files(data_dir) == []
+
+
+def test_unserializable_data_changes_nothing(data_dir: Path):
+    db = get_db()
+    db.save("users.json", [])
+
+    with pytest.raises(OSError):
+        db.save_many({"users.json": [{"user_id": 1}], "bad.json": {"x": object()}})
+
+    assert db.load("users.json") == ()
+    assert not (data_dir / "bad.json").exists()
+    assert _txn_files(data_dir) == []
+
+
+def test_crash_after_commit_is_recovered(data_dir: Path, monkeypatch):
+    db = get_db()
+    db.save("users.json", [])
+    write_file = db._write_file
+
+    def crash_on_portfolio(name, *args, **kwargs):
+        if name.startswith("portfolios/"):
+            raise OSError("disk full")
+        return write_file(name, *args, **kwargs)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db, "_write_file", crash_on_portfolio)
+        with pytest.raises(OSError):
+            db.save_many(FILES)
+
+    # Журнал зафиксирован, но файлы на место не записаны
+    assert len(_txn_files(data_dir)) == 1
+    assert not (data_dir / "portfolios" / "1.json").exists()
+    assert json.loads((data_dir / "users.json").read_text()) == []
+
+    assert db.recover_transactions() == 1
+
+    for name, data in FILES.items():
+        assert json.loads((data_dir / name).read_text()) == data
+    assert db.load("portfolios/1.json")["user_id"] == 1
+    assert _txn_files(data_dir) == []
+    assert db.recover_transactions() == 0
+
+
+def test_recovery_removes_only_stale_uncommitted_journals(data_dir: Path):
+    db = get_db()
+    txn_dir = data_dir / "txn"
+    txn_dir.mkdir()
+    stale = txn_dir / ".stale.journal.tmp"
+    fresh = txn_dir / ".fresh.journal.tmp"
+    stale.write_bytes(b"partial")
+    fresh.write_bytes(b"partial")
+    old = time.time() - 2 * 3600
+    os.utime(stale, (old, old))
+
+    assert db.recover_transactions() == 0
+
+    assert not stale.exists()
+    assert fresh.exists()
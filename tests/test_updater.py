@@ -0,0 +1,74 @@
+"""Тесты координатора обновления курсов (parser_service.updater)."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("requests")
+
+from valutatrade_hub.core.exceptions import StorageError  # noqa: E402
+from valutatrade_hub.parser_service import updater  # noqa: E402
+from valutatrade_hub.parser_service.api_clients import (  # noqa: E402
+    CoinGeckoClient,
+    ExchangeRateApiClient,
+)
+
+
+class _Crypto(CoinGeckoClient):
+    def __init__(self, rates: dict[str, float], config) -> None:
+        super().__init__(config)
+        self.rates = rates
+
+    def fetch_rates(self) -> dict[str, float]:
+        return self.rates
+
+
+class _Fiat(ExchangeRateApiClient):
+    def __init__(self, rates: dict[str, float], config) -> None:
+        super().__init__(config)
+        self.rates = rates
+
+    def fetch_rates(self) -> dict[str, float]:
+        return self.rates
+
+
+def _cached_pairs(parser_config) -> dict:
+    return json.loads(Path(parser_config.RATES_FILE_PATH).read_text())["pairs"]
+
+
+def test_history_failure_still_updates_cache(data_dir, parser_config, monkeypatch):
+    def broken_history(records, config=None):
+        raise StorageError("disk full")
+
+    monkeypatch.setattr(updater, "add_history_records", broken_history)
+    rates_updater = updater.RatesUpdater(
+        clients=[
+            _Crypto({"BTC_USD": 60000.0}, parser_config),
+            _Fiat({"EUR_USD": 1.2}, parser_config),
+        ],
+        config=parser_config,
+    )
+
+    stats = rates_updater.run_update()
+
+    assert stats["errors"] == 1
+    assert stats["total_count"] == 2
+    assert set(_cached_pairs(parser_config)) == {"BTC_USD", "EUR_USD"}
+
+
+def test_invalid_response_is_not_counted(data_dir, parser_config):
+    rates_updater = updater.RatesUpdater(
+        clients=[
+            _Crypto({"BTC_USD": 60000.0, "BTCUSD": 1.0}, parser_config),
+            _Fiat({"EUR_USD": 1.2}, parser_config),
+        ],
+        config=parser_config,
+    )
+
+    stats = rates_updater.run_update()
+
+    assert stats["crypto_count"] == 0
+    assert stats["fiat_count"] == 1
+    assert stats["failed"] == 1 and stats["success"] == 1
+    assert set(_cached_pairs(parser_config)) == {"EUR_USD"}
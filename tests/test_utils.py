@@ -0,0 +1,79 @@
+"""Тесты пакетной конвертации сумм (core.utils.convert_many)."""
+
+import json
+from array import array
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core import utils
+from valutatrade_hub.core.exceptions import CurrencyNotFoundError, InvalidAmountError
+
+UPDATED_AT = "2025-10-10T12:00:00Z"
+
+
+@pytest.fixture(params=["array", "numpy"])
+def rates(request, data_dir: Path, monkeypatch) -> None:
+    """Курсы в директории данных; convert_many с NumPy и без него."""
+    if request.param == "numpy":
+        monkeypatch.setattr(utils, "np", pytest.importorskip("numpy"))
+    else:
+        monkeypatch.setattr(utils, "np", None)
+    pairs = {"BTC_USD": 60000.0, "EUR_USD": 1.25, "ETH_BTC": 0.05}
+    (data_dir / "rates.json").write_text(
+        json.dumps(
+            {
+                "pairs": {
+                    pair: {"rate": rate, "updated_at": UPDATED_AT, "source": "test"}
+                    for pair, rate in pairs.items()
+                },
+                "last_refresh": UPDATED_AT,
+            }
+        )
+    )
+
+
+def test_single_codes(rates):
+    result = utils.convert_many([1.0, 0.0, 2.5], "BTC", "EUR")
+
+    assert type(result) is array and result.typecode == "d"
+    assert list(result) == pytest.approx([48000.0, 0.0, 120000.0])
+
+
+def test_codes_per_amount(rates):
+    result = utils.convert_many([1.0, 2.0, 10.0], ["BTC", "ETH", "EUR"], "USD")
+
+    assert type(result) is array
+    assert list(result) == pytest.approx([60000.0, 6000.0, 12.5])
+
+
+def test_numpy_input(rates):
+    np = pytest.importorskip("numpy")
+
+    result = utils.convert_many(np.array([1, 2]), "EUR", ["USD", "EUR"])
+
+    assert type(result) is array
+    assert list(result) == pytest.approx([1.25, 2.0])
+
+
+@pytest.mark.parametrize("amounts", [["1.5"], [None], [1.0, "x"]])
+def test_non_numeric_amount_raises_type_error(rates, amounts):
+    with pytest.raises(TypeError):
+        utils.convert_many(amounts, "USD", "EUR")
+
+
+@pytest.mark.parametrize("amount", [-1.0, float("nan")])
+def test_invalid_amount(rates, amount):
+    with pytest.raises(InvalidAmountError):
+        utils.convert_many([1.0, amount], "USD", "EUR")
+
+
+def test_length_mismatch_and_unknown_code(rates):
+    with pytest.raises(ValueError):
+        utils.convert_many([1.0, 2.0], ["USD"], "EUR")
+    with pytest.raises(CurrencyNotFoundError):
+        utils.convert_many([1.0], "XYZ", "EUR")
+
+
+def test_empty_amounts(rates):
+    assert utils.convert_many([], "BTC", "EUR") == array("d")
@@ -0,0 +1,100 @@
+"""Тесты журнала портфелей: воспроизведение записей после сбоя."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core.exceptions import StorageError
+from valutatrade_hub.infra.database import DatabaseManager, get_db
+from valutatrade_hub.infra.wal import WriteAheadLog
+
+
+def _crash(wal: WriteAheadLog) -> None:
+    """Остановить журнал как при сбое процесса: без контрольной точки."""
+    with wal._cond:
+        wal._closed = True
+        wal._cond.notify_all()
+    if wal._flusher is not None:
+        wal._flusher.join()
+    wal._file.close()
+    wal._release_ownership()
+
+
+def _portfolio(user_id: int, version: int, usd: float) -> dict:
+    return {
+        "user_id": user_id,
+        "version": version,
+        "wallets": {"USD": {"balance": usd}},
+    }
+
+
+def test_replay_applies_latest_images(tmp_path: Path):
+    path = tmp_path / "portfolios.wal"
+    wal = WriteAheadLog(path, apply=lambda records: None, checkpoint_ops=1000)
+    for version in range(1, 4):
+        wal.append(1, _portfolio(1, version, 10.0 * version))
+    wal.append(2, _portfolio(2, 1, 5.0))
+    _crash(wal)
+    # Недописанная при сбое строка отбрасывается
+    with open(path, "ab") as f:
+        f.write(b'{"seq": 5, "key": 1, "rec')
+
+    applied: list[dict] = []
+    replayed = WriteAheadLog(path, apply=applied.extend)
+
+    assert sorted(applied, key=lambda r: r["user_id"]) == [
+        _portfolio(1, 3, 30.0),
+        _portfolio(2, 1, 5.0),
+    ]
+    # После контрольной точки журнал пуст
+    assert len(replayed) == 0
+    assert path.read_bytes() == b""
+    replayed.close()
+
+
+def test_append_keeps_snapshot_of_record(tmp_path: Path):
+    wal = WriteAheadLog(tmp_path / "portfolios.wal", apply=lambda records: None)
+    record = _portfolio(1, 1, 10.0)
+
+    wal.append(1, record)
+    record["wallets"]["USD"]["balance"] = 999.0
+
+    assert wal.get(1)["wallets"]["USD"]["balance"] == 10.0
+    wal.close()
+
+
+def test_database_recovers_portfolios_after_crash(
+    data_dir: Path, settings_override, monkeypatch
+):
+    settings_override(portfolio_wal=True, wal_checkpoint_ops=1000)
+    db = get_db()
+    db.save_portfolio(_portfolio(1, 1, 100.0))
+    db.save_portfolio(_portfolio(1, 2, 150.0), expected_version=1)
+    assert not (data_dir / "portfolios" / "1.json").exists()
+    _crash(db._wal)
+
+    # Новый процесс: журнал воспроизводится при первом обращении
+    monkeypatch.setattr(DatabaseManager, "_instance", None)
+    monkeypatch.setattr(DatabaseManager, "_initialized", False)
+    recovered = get_db()
+
+    assert recovered.get_portfolio(1)["wallets"]["USD"]["balance"] == 150.0
+    shard = json.loads((data_dir / "portfolios" / "1.json").read_text())
+    assert shard == _portfolio(1, 2, 150.0)
+
+
+def test_wal_has_single_owner(tmp_path: Path):
+    path = tmp_path / "portfolios.wal"
+    owner = WriteAheadLog(path, apply=lambda records: None)
+    owner.append(1, _portfolio(1, 1, 10.0))
+
+    # Блокировка — на открытие файла, как у другого процесса
+    with pytest.raises(StorageError, match="owned by another process"):
+        WriteAheadLog(path, apply=lambda records: None)
+
+    applied: list[dict] = []
+    owner.close()
+    reopened = WriteAheadLog(path, apply=applied.extend)
+    assert applied == []  # владелец успел выполнить контрольную точку
+    reopened.close()
@@ -0,0 +1,67 @@
+"""Тесты индексов теплого старта (infra.warmcache)."""
+
+from pathlib import Path
+
+from valutatrade_hub.infra.database import DatabaseManager
+
+
+def _user(user_id: int, username: str) -> dict:
+    return {"user_id": user_id, "username": username}
+
+
+def _manager(monkeypatch) -> DatabaseManager:
+    """Новый DatabaseManager, индексирующий users.json любого размера."""
+    monkeypatch.setattr(DatabaseManager, "_instance", None)
+    monkeypatch.setattr(DatabaseManager, "_initialized", False)
+    db = DatabaseManager()
+    db.register_record_index("users.json", ("username", "user_id"))
+    return db
+
+
+def test_index_finds_records_without_load(
+    data_dir: Path, settings_override, monkeypatch
+):
+    settings_override(warm_cache_min_bytes=0)
+    _manager(monkeypatch).save("users.json", [_user(1, "alice"), _user(2, "bob")])
+
+    # Новый процесс: кеш в памяти пуст, поиск идет по индексу на диске
+    index = _manager(monkeypatch).record_index("users.json")
+
+    assert index is not None
+    assert index.find("username", "bob")["user_id"] == 2
+    assert index.find("user_id", 3) is None
+    assert index.max_value("user_id") == 2
+
+
+def test_replaced_index_is_closed(data_dir: Path, settings_override, monkeypatch):
+    settings_override(warm_cache_min_bytes=0)
+    db = _manager(monkeypatch)
+    db.save("users.json", [_user(1, "alice")])
+    old = db.record_index("users.json")
+
+    db.save("users.json", [_user(1, "alice"), _user(2, "bob")])
+    new = db.record_index("users.json")
+
+    assert new is not old
+    assert old._mm.closed
+    assert new.find("username", "bob") is not None
+
+
+def test_load_rebuilds_index_under_its_own_lock(
+    data_dir: Path, settings_override, monkeypatch
+):
+    settings_override(warm_cache_min_bytes=0)
+    db = _manager(monkeypatch)
+    db.save("users.json", [_user(1, "alice")])
+
+    # Файл изменен в обход DatabaseManager: индекс устарел
+    (data_dir / "users.json").write_text(
+        '[{"user_id": 1, "username": "alice"}, {"user_id": 7, "username": "eve"}]'
+    )
+    assert db.record_index("users.json") is None
+
+    db.load("users.json")
+    index = db.record_index("users.json")
+
+    assert index is not None and index.max_value("user_id") == 7
+    assert (data_dir / ".locks" / ".cache" / "users.json.idx.lock").exists()
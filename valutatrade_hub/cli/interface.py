@@ -17,13 +17,14 @@ from valutatrade_hub.core.exceptions import (
     StorageError,
 )
 from valutatrade_hub.core.models import User
+from valutatrade_hub.core.ratebook import get_rate_book, revalidate
+from valutatrade_hub.infra.fileio import atomic_write
 from valutatrade_hub.parser_service.api_clients import (
     BaseApiClient,
     CoinGeckoClient,
     ExchangeRateApiClient,
 )
 from valutatrade_hub.parser_service.config import get_parser_config
-from valutatrade_hub.parser_service.storage import read_rates_cache
 from valutatrade_hub.parser_service.updater import RatesUpdater, update_all_rates
 
 # Файл сессии
@@ -35,7 +36,7 @@ _current_user: User | None = None
 
 def _save_session(username: str) -> None:
     """Сохранить сессию пользователя."""
-    SESSION_FILE.write_text(json.dumps({"username": username}), encoding="utf-8")
+    atomic_write(SESSION_FILE, json.dumps({"username": username}))
 
 
 def _load_session() -> str | None:
@@ -62,11 +63,9 @@ def _restore_session_user() -> None:
     if username:
         try:
             # Восстанавливаем пользователя без повторной проверки пароля
-            users_data = usecases.load_json("users.json")
-            for u in users_data:
-                if u["username"] == username:
-                    _current_user = usecases._restore_user(u)
-                    return
+            user = usecases.find_user(username)
+            if user is not None:
+                _current_user = user
         except Exception:
             # Если не удалось восстановить, очищаем сессию
             _clear_session()
@@ -313,6 +312,10 @@ def cmd_get_rate(args: argparse.Namespace) -> None:
             print(f"Обновлено:        {result['updated_at']}")
         else:
             print("Обновлено:        Дефолтные курсы")
+        if result["refreshing"]:
+            print("Внимание: курсы устарели, обновление запущено в фоне")
+        elif result["is_stale"]:
+            print("Внимание: курсы устарели, выполните 'update-rates'")
 
         print(f"{'=' * 50}\n")
 
@@ -340,30 +343,15 @@ def cmd_show_rates(args: argparse.Namespace) -> None:
         --base <str> — показать курсы относительно указанной базы
     """
     try:
-        # Чтение данных из кеша
-        cache_data = read_rates_cache()
-
-        # Определение формата файла и извлечение данных
-        if "pairs" in cache_data:
-            # Новый формат
-            pairs = cache_data["pairs"]
-            last_refresh = cache_data.get("last_refresh")
-        else:
-            # Старый формат - конвертируем в новый
-            old_rates = cache_data.get("rates", {})
-            base_currency = cache_data.get("base_currency", "USD")
-            updated_at = cache_data.get("updated_at")
-
-            pairs = {}
-            for currency, rate in old_rates.items():
-                if currency != base_currency:
-                    pair_key = f"{currency}_{base_currency}"
-                    pairs[pair_key] = {
-                        "rate": float(rate),
-                        "updated_at": updated_at,
-                        "source": "legacy",
-                    }
-            last_refresh = updated_at
+        # Книга курсов процесса (оба формата rates.json уже приведены к парам)
+        book = get_rate_book()
+        pairs = book.pairs
+        last_refresh = book.updated_at
+
+        if book.is_missing:
+            _print_error("Файл кеша rates.json не найден.")
+            print("Выполните команду 'update-rates' для создания кеша.")
+            return
 
         if not pairs:
             print("\nКеш курсов пуст.")
@@ -381,7 +369,7 @@ def cmd_show_rates(args: argparse.Namespace) -> None:
                 if from_currency == currency_upper:
                     filtered_pairs[pair_key] = pair_data
         else:
-            filtered_pairs = pairs.copy()
+            filtered_pairs = dict(pairs)
 
         # Фильтр --top (для криптовалют)
         if hasattr(args, "top") and args.top:
@@ -402,33 +390,25 @@ def cmd_show_rates(args: argparse.Namespace) -> None:
         if hasattr(args, "base") and args.base:
             base_upper = args.base.upper()
 
-            # Находим курс базовой валюты к USD
-            base_to_usd = None
-            for pair_key, pair_data in pairs.items():
-                from_currency, to_currency = pair_key.split("_")
-                if from_currency == base_upper and to_currency == "USD":
-                    base_to_usd = pair_data["rate"]
-                    break
-
-            if base_to_usd is None:
-                available = {p.split("_")[0] for p in pairs}
+            # Цены всех валют в новой базе — одна строка матрицы кросс-курсов
+            try:
+                quotes = book.quotes(base_upper)
+            except CurrencyNotFoundError:
                 _print_error(
-                    f"Не удалось найти курс {base_upper}_USD для пересчета. "
-                    f"Доступные валюты: {', '.join(available)}"
+                    f"Не удалось найти курс {base_upper} для пересчета. "
+                    f"Доступные валюты: {', '.join(book.codes)}"
                 )
                 return
 
             # Пересчет всех курсов относительно новой базы
             recalculated_pairs = {}
             for pair_key, pair_data in filtered_pairs.items():
-                from_currency, to_currency = pair_key.split("_")
-                if from_currency != base_upper:  # Не показываем базу к самой себе
-                    # Курс от валюты к USD, затем к новой базе
-                    rate_to_usd = pair_data["rate"]
-                    rate_to_base = rate_to_usd / base_to_usd
+                from_currency, _ = pair_key.split("_")
+                # Не показываем базу к самой себе
+                if from_currency != base_upper and from_currency in quotes:
                     new_pair_key = f"{from_currency}_{base_upper}"
                     recalculated_pairs[new_pair_key] = {
-                        "rate": rate_to_base,
+                        "rate": quotes[from_currency],
                         "updated_at": pair_data["updated_at"],
                         "source": pair_data.get("source", "unknown"),
                     }
@@ -446,6 +426,17 @@ def cmd_show_rates(args: argparse.Namespace) -> None:
         print("Актуальные курсы валют (из локального кеша)")
         if last_refresh:
             print(f"Последнее обновление: {last_refresh}")
+        if book.is_stale():
+            if revalidate(book):
+                print(
+                    "Внимание: курсы устарели (старше rates_ttl_seconds), "
+                    "обновление запущено в фоне."
+                )
+            else:
+                print(
+                    "Внимание: курсы устарели (старше rates_ttl_seconds). "
+                    "Выполните 'update-rates'."
+                )
         print("=" * 80)
 
         # Заголовок таблицы
@@ -468,13 +459,6 @@ def cmd_show_rates(args: argparse.Namespace) -> None:
         print(f"Всего пар: {len(sorted_pairs)}")
         print("=" * 80 + "\n")
 
-    except FileNotFoundError:
-        _print_error("Файл кеша rates.json не найден.")
-        print("Выполните команду 'update-rates' для создания кеша.")
-
-    except StorageError as e:
-        _print_error(f"Ошибка чтения кеша: {str(e)}")
-
     except Exception as e:
         _print_error(f"Неожиданная ошибка: {str(e)}")
         print("Совет: проверьте формат файла rates.json")
@@ -151,6 +151,25 @@ class DataNotFoundError(FileNotFoundError):
         super().__init__(f"Файл данных '{filename}' не найден")
 
 
+class ConcurrentModificationError(Exception):
+    """Исключение, когда запись изменена другой операцией после чтения.
+
+    Сообщение: "Портфель пользователя {user_id} изменен другой операцией
+               (ожидалась версия {expected}, текущая {actual})"
+    Выбрасывается: save_portfolio() с expected_version (сравнение с обменом);
+                   usecases повторяются декоратором @retry_on_conflict
+    """
+
+    def __init__(self, user_id: int, expected: int, actual: int | None):
+        self.user_id = user_id
+        self.expected = expected
+        self.actual = actual
+        super().__init__(
+            f"Портфель пользователя {user_id} изменен другой операцией "
+            f"(ожидалась версия {expected}, текущая {actual})"
+        )
+
+
 class StorageError(Exception):
     """Исключение при ошибках работы с хранилищем данных.
 
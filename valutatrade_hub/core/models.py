@@ -2,6 +2,7 @@
 
 import hashlib
 import secrets
+from collections.abc import Mapping
 from datetime import datetime
 
 from valutatrade_hub.core.exceptions import (
@@ -63,6 +64,20 @@ class User:
         """Получить ID пользователя."""
         return self._user_id
 
+    @user_id.setter
+    def user_id(self, value: int) -> None:
+        """Установить ID пользователя (итоговый ID, выданный хранилищем).
+
+        Args:
+            value: Новый ID.
+
+        Raises:
+            ValueError: Если ID не положительное целое число.
+        """
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            raise ValueError(f"Некорректный ID пользователя: {value!r}")
+        self._user_id = value
+
     @property
     def username(self) -> str:
         """Получить имя пользователя."""
@@ -138,6 +153,8 @@ class Portfolio:
     Attributes:
         _user: Объект пользователя.
         _wallets: Словарь кошельков {код_валюты: Wallet}.
+        _version: Версия записи в хранилище, с которой прочитан портфель
+            (для оптимистичной блокировки при сохранении).
     """
 
     # Фиксированные курсы валют к USD (для упрощения)
@@ -150,14 +167,17 @@ class Portfolio:
         "ETH": 3500.0,
     }
 
-    def __init__(self, user: "User") -> None:
+    def __init__(self, user: "User", version: int = 0) -> None:
         """Инициализация портфеля.
 
         Args:
             user: Объект пользователя-владельца портфеля.
+            version: Версия записи в хранилище, с которой прочитан
+                портфель (0 — новый портфель или запись старого формата).
         """
         self._user = user
         self._wallets: dict[str, Wallet] = {}
+        self.version = version  # через сеттер с проверкой
 
     # --- Properties ---
 
@@ -171,6 +191,25 @@ class Portfolio:
         """Получить ID пользователя."""
         return self._user.user_id
 
+    @property
+    def version(self) -> int:
+        """Получить версию записи портфеля в хранилище."""
+        return self._version
+
+    @version.setter
+    def version(self, value: int) -> None:
+        """Установить версию записи (после успешного сохранения).
+
+        Args:
+            value: Новая версия.
+
+        Raises:
+            ValueError: Если версия не целое неотрицательное число.
+        """
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise ValueError(f"Некорректная версия портфеля: {value!r}")
+        self._version = value
+
     @property
     def wallets(self) -> dict[str, "Wallet"]:
         """Получить копию словаря кошельков."""
@@ -214,7 +253,7 @@ class Portfolio:
     def get_total_value(
         self,
         base_currency: str = "USD",
-        exchange_rates: dict[str, float] | None = None,
+        exchange_rates: Mapping[str, float] | None = None,
     ) -> float:
         """Получить общую стоимость всех валют в базовой валюте.
 
@@ -241,7 +280,7 @@ class Portfolio:
         self,
         currency_code: str,
         amount: float,
-        exchange_rates: dict[str, float] | None = None,
+        exchange_rates: Mapping[str, float] | None = None,
     ) -> None:
         """Купить валюту за USD.
 
@@ -278,7 +317,7 @@ class Portfolio:
         self,
         currency_code: str,
         amount: float,
-        exchange_rates: dict[str, float] | None = None,
+        exchange_rates: Mapping[str, float] | None = None,
     ) -> None:
         """Продать валюту за USD.
 
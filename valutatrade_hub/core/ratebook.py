@@ -0,0 +1,570 @@
+"""Книга курсов валют (RateBook).
+
+Единое представление файла rates.json для всех потребителей курсов
+(core.utils, usecases, CLI). Файл бывает в двух форматах:
+    - пары (Parser Service):
+      {"pairs": {"BTC_USD": {"rate": 95000.0, "updated_at": ..., ...}},
+       "last_refresh": ...}
+    - старый формат:
+      {"rates": {"BTC": 95000.0, ...}, "base_currency": "USD",
+       "updated_at": ...}
+
+infra.ratesformat.normalize_rates_data() приводит оба формата к парам
+(так же файл читает Parser Service), а RateBook хранит результат
+вместе с курсами к базовой валюте и матрицей кросс-курсов
+N×N (array('d'), строка i — цены всех валют в валюте i), поэтому курс
+любой пары — два поиска индекса и одно чтение.
+
+Пары могут быть котированы к любой валюте (BTC_USD, ETH_BTC, RUB_EUR):
+книга строит граф валют (ребро — пара в обе стороны) и разрешает каждую
+ячейку матрицы по кратчайшему пути, а среди путей одной длины — по самому
+свежему (наибольшее время самой старой пары пути). Прямая котировка
+всегда предпочтительнее треугольной. Найденные пути запоминаются в
+книге (RateBook.route()), поэтому после построения поиск по графу не
+выполняется. get_rate_book() держит одну книгу на процесс и
+перестраивает ее, только когда изменился файл (DatabaseManager
+возвращает новый снимок) — вместе с матрицей и путями; время жизни
+курсов ("rates_ttl_seconds") проверяется через RateBook.is_stale().
+
+Устаревшие курсы не блокируют читателей (stale-while-revalidate):
+revalidate() возвращает управление сразу и запускает одно фоновое
+обновление через RatesUpdater; повторные вызовы, пока обновление идет
+(в этом или другом процессе), новых запросов к API не делают. При
+выходе процесса начатое обновление дожидается завершения не дольше
+"rates_refresh_join_seconds" (atexit).
+"""
+
+import atexit
+import logging
+import math
+import os
+import threading
+import time
+from array import array
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any
+
+from valutatrade_hub.core.exceptions import CurrencyNotFoundError
+from valutatrade_hub.infra import database
+from valutatrade_hub.infra.fileio import remove_stale_temp_files
+from valutatrade_hub.infra.ratesformat import BASE_CURRENCY, normalize_rates_data
+from valutatrade_hub.infra.settings import get_settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Дефолтные курсы (заглушка, пока курсы не загружены)
+DEFAULT_RATES: dict[str, float] = {
+    "USD": 1.0,
+    "EUR": 1.08,
+    "GBP": 1.27,
+    "RUB": 0.011,
+    "CNY": 0.14,
+    "JPY": 0.0067,
+    "BTC": 95000.0,
+    "ETH": 3500.0,
+}
+
+
+def parse_timestamp(value: str | None) -> float | None:
+    """Время ISO 8601 ("...Z" или без зоны — UTC) в секундах epoch.
+
+    Returns:
+        Секунды epoch или None, если время не задано или не разбирается.
+    """
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+# Граф валют: {валюта: {соседняя_валюта: ребро}}, ребро — (множитель
+# пересчета суммы, время пары в секундах epoch, прямая ли это котировка)
+_Edge = tuple[float, float, bool]
+
+
+def _pair_rate(pair: Mapping[str, Any]) -> float | None:
+    """Курс пары или None, если он не задан или не число."""
+    try:
+        return float(pair["rate"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _build_rate_graph(
+    pairs: Mapping[str, Mapping[str, Any]],
+) -> dict[str, dict[str, _Edge]]:
+    """Построить граф валют по парам.
+
+    Пара A_B с курсом r дает ребра A → B (множитель r) и B → A
+    (множитель 1 / r). Если одну связь задают несколько пар (A_B и B_A),
+    выбирается более свежая, при равном времени — прямая котировка.
+    Пары с нулевым или отрицательным курсом пропускаются, как и пары
+    без числового курса (отсутствует, null, строка не из цифр) —
+    последние с предупреждением в логе.
+
+    Args:
+        pairs: Пары {"ETH_BTC": {"rate": 0.036, "updated_at": ...}}.
+
+    Returns:
+        Граф {валюта: {соседняя_валюта: (множитель, время, прямая)}}.
+    """
+    graph: dict[str, dict[str, _Edge]] = {}
+    for key, pair in pairs.items():
+        code, _, quote = key.partition("_")
+        rate = _pair_rate(pair)
+        if rate is None:
+            logger.warning(f"Skipping rate pair {key} without a numeric rate")
+            continue
+        if not quote or code == quote or not 0 < rate < math.inf:
+            continue
+        updated = parse_timestamp(pair.get("updated_at"))
+        updated = -math.inf if updated is None else updated
+        for source, target, edge in (
+            (code, quote, (rate, updated, True)),
+            (quote, code, (1.0 / rate, updated, False)),
+        ):
+            edges = graph.setdefault(source, {})
+            current = edges.get(target)
+            if current is None or edge[1:] > current[1:]:
+                edges[target] = edge
+    return graph
+
+
+def _search_paths(
+    graph: Mapping[str, Mapping[str, _Edge]], source: str
+) -> dict[str, tuple[float, str | None]]:
+    """Кратчайшие пути из валюты source (обход в ширину по слоям).
+
+    Среди путей одной длины выбирается путь с наибольшим временем самой
+    старой пары.
+
+    Returns:
+        {валюта: (цена одной единицы source в этой валюте, предыдущая
+        валюта пути)} для всех достижимых валют.
+    """
+    found: dict[str, tuple[float, float, str | None]] = {
+        source: (1.0, math.inf, None)
+    }
+    layer = [source]
+    while layer:
+        candidates: dict[str, tuple[float, float, str | None]] = {}
+        for node in layer:
+            factor, freshness, _ = found[node]
+            for target, (edge_factor, updated, _) in graph[node].items():
+                if target in found:
+                    continue
+                path_freshness = min(freshness, updated)
+                current = candidates.get(target)
+                if current is None or path_freshness > current[1]:
+                    candidates[target] = (
+                        factor * edge_factor,
+                        path_freshness,
+                        node,
+                    )
+        found.update(candidates)
+        layer = list(candidates)
+    return {code: (factor, parent) for code, (factor, _, parent) in found.items()}
+
+
+class RateBook:
+    """Неизменяемый набор курсов из rates.json.
+
+    Attributes:
+        pairs: Пары {"BTC_USD": {"rate", "updated_at", "source"}} с числовым
+            курсом; вторая валюта пары — любая (ETH_BTC, RUB_EUR).
+        rates: Курсы к базовой валюте {код: курс} (база = 1.0).
+        codes: Коды валют в порядке строк и столбцов матрицы кросс-курсов.
+        matrix: Матрица кросс-курсов N×N по строкам (array('d')):
+            matrix[i * N + j] — цена валюты codes[j] в валюте codes[i].
+        base_currency: Базовая валюта курсов.
+        updated_at: Время последнего обновления (ISO 8601) или None.
+        is_default: Курсы — заглушка DEFAULT_RATES (файла нет или он пуст).
+        is_missing: Файла курсов нет (книга построена без данных).
+
+    Example:
+        >>> book = get_rate_book()
+        >>> book.rate("BTC")
+        95000.0
+        >>> book.cross_rate("BTC", "EUR")
+        87962.96
+        >>> book.is_stale()
+        False
+    """
+
+    def __init__(self, data: Mapping[str, Any] | None) -> None:
+        """Построить книгу по содержимому rates.json.
+
+        Args:
+            data: Содержимое файла в любом формате (None — файла нет).
+        """
+        self.is_missing = data is None
+        normalized = normalize_rates_data(data or {})
+        graph = _build_rate_graph(normalized["pairs"])
+
+        self.is_default = len(graph.get(BASE_CURRENCY, ())) == 0
+        if self.is_default:
+            graph = _build_rate_graph(
+                normalize_rates_data({"rates": DEFAULT_RATES})["pairs"]
+            )
+
+        # Пути из каждой валюты, связанной с базовой (валюты вне
+        # компоненты базовой валюты не имеют курса к ней)
+        paths = {BASE_CURRENCY: _search_paths(graph, BASE_CURRENCY)}
+        for code in paths[BASE_CURRENCY]:
+            paths[code] = paths.get(code) or _search_paths(graph, code)
+        unreachable = graph.keys() - paths.keys()
+        if unreachable:
+            logger.warning(
+                f"No path to {BASE_CURRENCY} for {sorted(unreachable)}, "
+                "their pairs are ignored"
+            )
+
+        self.pairs: Mapping[str, Mapping[str, Any]] = MappingProxyType(
+            {
+                key: MappingProxyType(pair)
+                for key, pair in normalized["pairs"].items()
+                if _pair_rate(pair) is not None
+            }
+        )
+        self.rates: Mapping[str, float] = MappingProxyType(
+            {code: found[BASE_CURRENCY][0] for code, found in paths.items()}
+        )
+        self.base_currency = BASE_CURRENCY
+        self.updated_at: str | None = (
+            None if self.is_default else normalized["last_refresh"]
+        )
+        self._updated_epoch = parse_timestamp(self.updated_at)
+
+        # Матрица кросс-курсов: matrix[i * n + j] — цена валюты j в валюте i
+        self.codes: tuple[str, ...] = tuple(paths)
+        self._index = {code: i for i, code in enumerate(self.codes)}
+        self.matrix = array(
+            "d",
+            [paths[code][quote][0] for quote in self.codes for code in self.codes],
+        )
+
+        # Предыдущая валюта пути {из: {в: предыдущая}} и найденные маршруты
+        self._parents = {
+            code: {target: parent for target, (_, parent) in found.items()}
+            for code, found in paths.items()
+        }
+        self._routes: dict[tuple[str, str], tuple[str, ...]] = {}
+
+    def position(self, code: str) -> int:
+        """Индекс валюты в codes и матрице кросс-курсов.
+
+        Raises:
+            CurrencyNotFoundError: Если курса валюты нет.
+        """
+        try:
+            return self._index[code]
+        except KeyError:
+            raise CurrencyNotFoundError(code) from None
+
+    def rate(self, code: str) -> float:
+        """Курс валюты к базовой.
+
+        Raises:
+            CurrencyNotFoundError: Если курса валюты нет.
+        """
+        try:
+            return self.rates[code]
+        except KeyError:
+            raise CurrencyNotFoundError(code) from None
+
+    def cross_rate(self, from_code: str, to_code: str) -> float:
+        """Курс обмена: сколько единиц to_code стоит одна единица from_code.
+
+        Raises:
+            CurrencyNotFoundError: Если курса одной из валют нет.
+        """
+        i = self.position(from_code)
+        return self.matrix[self.position(to_code) * len(self.codes) + i]
+
+    def quotes(self, base: str) -> dict[str, float]:
+        """Цены всех валют в валюте base (одна строка матрицы).
+
+        Args:
+            base: Код валюты, относительно которой считаются курсы.
+
+        Returns:
+            Словарь {код: цена_в_base} (для самой base — 1.0).
+
+        Raises:
+            CurrencyNotFoundError: Если курса base нет.
+
+        Example:
+            >>> get_rate_book().quotes("EUR")["BTC"]
+            87962.96
+        """
+        n = len(self.codes)
+        start = self.position(base) * n
+        return dict(zip(self.codes, self.matrix[start : start + n]))
+
+    def route(self, from_code: str, to_code: str) -> tuple[str, ...]:
+        """Путь по парам, которым разрешен кросс-курс from_code → to_code.
+
+        Example:
+            >>> get_rate_book().route("ETH", "RUB")
+            ('ETH', 'USD', 'RUB')
+
+        Raises:
+            CurrencyNotFoundError: Если курса одной из валют нет.
+        """
+        key = (from_code, to_code)
+        route = self._routes.get(key)
+        if route is None:
+            self.position(from_code)
+            self.position(to_code)
+            parents = self._parents[from_code]
+            steps = [to_code]
+            while steps[-1] != from_code:
+                steps.append(parents[steps[-1]])
+            route = self._routes[key] = tuple(reversed(steps))
+        return route
+
+    def age_seconds(self, now: float | None = None) -> float | None:
+        """Возраст курсов в секундах (None, если время обновления неизвестно)."""
+        if self._updated_epoch is None:
+            return None
+        return (time.time() if now is None else now) - self._updated_epoch
+
+    def is_stale(self, ttl_seconds: float | None = None) -> bool:
+        """Истек ли срок жизни курсов.
+
+        Args:
+            ttl_seconds: Время жизни (None — настройка "rates_ttl_seconds").
+
+        Returns:
+            True, если курсы старше TTL или время их обновления неизвестно
+            (в том числе для DEFAULT_RATES).
+        """
+        if ttl_seconds is None:
+            ttl_seconds = get_settings().get("rates_ttl_seconds", 3600)
+        age = self.age_seconds()
+        return age is None or age > ttl_seconds
+
+    def __repr__(self) -> str:
+        """Представление книги для отладки."""
+        return (
+            f"RateBook(currencies={len(self.rates)}, pairs={len(self.pairs)}, "
+            f"updated_at={self.updated_at!r})"
+        )
+
+
+# Книга процесса и снимок rates.json, по которому она построена
+_book: RateBook | None = None
+_book_source: Any = None
+_book_lock = threading.Lock()
+
+
+# Снимок для невалидного файла курсов (один объект: книга не
+# перестраивается при каждом чтении того же файла)
+_INVALID_FILE: Mapping[str, Any] = MappingProxyType({})
+
+
+def get_rate_book() -> RateBook:
+    """Получить книгу курсов процесса.
+
+    Файл читается через DatabaseManager: пока он не изменился, load()
+    возвращает тот же снимок из кеша, и книга не перестраивается.
+    Невалидный или отсутствующий файл дает книгу с DEFAULT_RATES
+    (для отсутствующего — с признаком is_missing).
+
+    Returns:
+        Актуальная книга курсов.
+    """
+    global _book, _book_source
+
+    rates_file = get_settings().get("rates_file", "rates.json")
+    try:
+        data = database.get_db().load(rates_file)
+    except FileNotFoundError:
+        data = None
+    except ValueError as e:
+        if _book_source is not _INVALID_FILE:
+            logger.warning(f"Invalid rates file {rates_file}: {e}")
+        data = _INVALID_FILE
+    if data is not None and not isinstance(data, Mapping):
+        data = _INVALID_FILE
+
+    with _book_lock:
+        if _book is None or data is not _book_source:
+            _book = RateBook(data)
+            _book_source = data
+        return _book
+
+
+# =============================================================================
+# Stale-while-revalidate
+# =============================================================================
+
+# Файл блокировки фонового обновления (в директории "lock_dir"):
+# обновление выполняет только процесс, захвативший его
+REFRESH_LOCK_FILE = "rates-refresh.lock"
+
+# Фоновое обновление процесса и время его последнего запуска
+_refresh_thread: threading.Thread | None = None
+_refresh_started: float | None = None
+_refresh_lock = threading.Lock()
+_refresh_join_registered = False
+
+
+def revalidate(book: RateBook) -> bool:
+    """Запустить фоновое обновление, если курсы книги устарели.
+
+    Вызывающий продолжает работу с переданной (устаревшей) книгой;
+    новые курсы увидят следующие вызовы get_rate_book(). В процессе
+    одновременно идет не больше одного обновления, а новое запускается
+    не чаще "rates_refresh_cooldown_seconds" (API могут быть недоступны).
+    Поток обновления — daemon, но при выходе процесса его ждут до
+    "rates_refresh_join_seconds" (_join_refresh), чтобы короткая команда
+    CLI не обрывала запись файлов курсов.
+    Книга с DEFAULT_RATES (файла курсов нет или он пуст) не обновляется:
+    курсы появляются только после явного update-rates. Отключается
+    настройкой "rates_background_refresh".
+
+    Args:
+        book: Книга, которой пользуется вызывающий.
+
+    Returns:
+        True, если фоновое обновление идет (запущено сейчас или раньше).
+
+    Example:
+        >>> book = get_rate_book()
+        >>> if book.is_stale() and revalidate(book):
+        ...     print("Курсы обновляются в фоне")
+    """
+    global _refresh_thread, _refresh_started, _refresh_join_registered
+
+    settings = get_settings()
+    if (
+        not settings.get("rates_background_refresh", True)
+        or book.is_default
+        or not book.is_stale()
+    ):
+        return False
+
+    with _refresh_lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return True
+        cooldown = settings.get("rates_refresh_cooldown_seconds", 60)
+        now = time.monotonic()
+        if _refresh_started is not None and now - _refresh_started < cooldown:
+            return False
+        _refresh_started = now
+        if not _refresh_join_registered:
+            atexit.register(_join_refresh)
+            _refresh_join_registered = True
+        # daemon: зависшее обновление не держит процесс дольше _join_refresh
+        _refresh_thread = threading.Thread(
+            target=_refresh_rates, name="rates-revalidate", daemon=True
+        )
+        _refresh_thread.start()
+    return True
+
+
+def _join_refresh() -> bool:
+    """Дождаться фонового обновления (atexit, не дольше настройки).
+
+    Returns:
+        True, если обновления нет или оно завершилось вовремя.
+    """
+    with _refresh_lock:
+        thread = _refresh_thread
+    if thread is None or not thread.is_alive():
+        return True
+
+    timeout = get_settings().get("rates_refresh_join_seconds", 10)
+    thread.join(timeout)
+    if thread.is_alive():
+        logger.warning(
+            f"Background rates refresh did not finish in {timeout}s, "
+            "abandoning it on exit"
+        )
+        return False
+    return True
+
+
+@contextmanager
+def _refresh_slot() -> Iterator[bool]:
+    """Захватить право на обновление курсов среди процессов.
+
+    Yields:
+        True, если право получено (без fcntl — всегда True).
+    """
+    if fcntl is None:
+        yield True
+        return
+    settings = get_settings()
+    lock_dir = settings.get_data_path(settings.get("lock_dir", ".locks"))
+    path = lock_dir / REFRESH_LOCK_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+    finally:
+        os.close(fd)
+
+
+def _refresh_rates() -> None:
+    """Обновить курсы через RatesUpdater (тело фонового потока).
+
+    Ошибки только логируются: читатели продолжают работать с
+    устаревшими курсами.
+    """
+    try:
+        with _refresh_slot() as acquired:
+            if not acquired:
+                logger.debug("Rates refresh is already running in another process")
+                return
+            # Курсы мог уже обновить другой процесс
+            if not get_rate_book().is_stale():
+                return
+            _remove_refresh_leftovers()
+            # Parser Service импортируется только при обновлении
+            from valutatrade_hub.parser_service.updater import RatesUpdater
+
+            logger.info("Rates are stale, refreshing in background")
+            RatesUpdater().run_update()
+    except Exception as e:
+        logger.warning(f"Background rates refresh failed: {e}")
+
+
+def _remove_refresh_leftovers() -> None:
+    """Удалить временные файлы обновления, прерванного выходом процесса.
+
+    Обновление, брошенное _join_refresh(), может оставить временные файлы
+    atomic_write рядом с rates.json и сегментами истории.
+    """
+    from valutatrade_hub.parser_service.config import get_parser_config
+
+    config = get_parser_config()
+    removed = sum(
+        remove_stale_temp_files(directory)
+        for directory in (
+            Path(config.RATES_FILE_PATH).parent,
+            Path(config.HISTORY_DIR_PATH),
+        )
+    )
+    if removed:
+        logger.info(f"Removed {removed} temporary files of interrupted refreshes")
@@ -7,21 +7,19 @@
 from datetime import datetime
 
 from valutatrade_hub.core.currencies import get_currency
-from valutatrade_hub.core.exceptions import (
-    CurrencyNotFoundError,
-)
+from valutatrade_hub.core.exceptions import UserAlreadyExistsError
 from valutatrade_hub.core.models import Portfolio, User, Wallet
+from valutatrade_hub.core.ratebook import get_rate_book, revalidate
 from valutatrade_hub.core.utils import (
     get_rate,
     get_rates,
     get_rates_info,
-    load_json,
     require_login,
-    save_json,
     validate_amount,
     validate_currency_code,
 )
-from valutatrade_hub.decorators import log_action
+from valutatrade_hub.decorators import log_action, retry_on_conflict
+from valutatrade_hub.infra import database
 
 # =============================================================================
 # User Management
@@ -40,35 +38,29 @@ def register_user(username: str, password: str) -> User:
         Созданный объект User.
 
     Raises:
-        ValueError: Если пользователь уже существует.
+        UserAlreadyExistsError: Если пользователь уже существует.
     """
-    users_data = load_json("users.json")
+    db = database.get_db()
 
     # Проверка уникальности username
-    for u in users_data:
-        if u["username"] == username:
-            raise ValueError(f"Пользователь '{username}' уже существует")
-
-    # Генерация нового user_id
-    user_id = max((u["user_id"] for u in users_data), default=0) + 1
+    if db.get_user_by_username(username) is not None:
+        raise UserAlreadyExistsError(username)
 
     # Создание пользователя
-    user = User(user_id, username, password)
+    user = User(db.next_user_id(), username, password)
 
-    # Сохранение в JSON
-    users_data.append(
+    # Пользователь и его пустой портфель сохраняются одной транзакцией;
+    # user_id мог занять параллельный вызов — бэкенд выдает итоговый
+    user.user_id = db.register_user(
         {
             "user_id": user.user_id,
             "username": user.username,
             "hashed_password": user._hashed_password,
             "salt": user.salt,
             "registration_date": user.registration_date.isoformat(),
-        }
+        },
+        _new_portfolio_record(user),
     )
-    save_json("users.json", users_data)
-
-    # Создаём пустой портфель для пользователя
-    _create_portfolio(user)
 
     return user
 
@@ -87,17 +79,28 @@ def login_user(username: str, password: str) -> User:
     Raises:
         ValueError: Если пользователь не найден или пароль неверный.
     """
-    users_data = load_json("users.json")
+    user = find_user(username)
+    if user is None:
+        raise ValueError(f"Пользователь '{username}' не найден")
+
+    if not user.verify_password(password):
+        raise ValueError("Неверный пароль")
+    return user
+
+
+def find_user(username: str) -> User | None:
+    """Найти пользователя по имени (без проверки пароля).
 
-    for u in users_data:
-        if u["username"] == username:
-            # Восстанавливаем User для проверки пароля
-            user = _restore_user(u)
-            if user.verify_password(password):
-                return user
-            raise ValueError("Неверный пароль")
+    Используется для восстановления пользователя из сессии.
 
-    raise ValueError(f"Пользователь '{username}' не найден")
+    Args:
+        username: Имя пользователя.
+
+    Returns:
+        Объект User или None, если пользователь не найден.
+    """
+    data = database.get_db().get_user_by_username(username)
+    return _restore_user(data) if data is not None else None
 
 
 def get_user_info(user: User) -> dict:
@@ -140,20 +143,16 @@ def _restore_user(data: dict) -> User:
 # =============================================================================
 
 
-def _create_portfolio(user: User) -> None:
-    """Создать пустой портфель для пользователя.
+def _new_portfolio_record(user: User) -> dict:
+    """Запись пустого портфеля для нового пользователя.
 
     Args:
         user: Объект пользователя.
+
+    Returns:
+        Запись портфеля {"user_id": ..., "version": 0, "wallets": {}}.
     """
-    portfolios_data = load_json("portfolios.json")
-    portfolios_data.append(
-        {
-            "user_id": user.user_id,
-            "wallets": {},
-        }
-    )
-    save_json("portfolios.json", portfolios_data)
+    return {"user_id": user.user_id, "version": 0, "wallets": {}}
 
 
 def get_portfolio(user: User) -> Portfolio:
@@ -169,48 +168,45 @@ def get_portfolio(user: User) -> Portfolio:
         ValueError: Если портфель не найден.
     """
     require_login(user)
-    portfolios_data = load_json("portfolios.json")
+    data = database.get_db().get_portfolio(user.user_id)
+    if data is None:
+        raise ValueError("Портфель не найден")
 
-    for p in portfolios_data:
-        if p["user_id"] == user.user_id:
-            portfolio = Portfolio(user)
-            # Восстанавливаем кошельки
-            for code, wallet_data in p.get("wallets", {}).items():
-                wallet = Wallet(code, wallet_data["balance"])
-                portfolio._wallets[code] = wallet
-            return portfolio
-
-    raise ValueError("Портфель не найден")
+    # Версия для сравнения при сохранении (у записей старого формата — 0)
+    portfolio = Portfolio(user, version=data.get("version", 0))
+    # Восстанавливаем кошельки
+    for code, wallet_data in data.get("wallets", {}).items():
+        wallet = Wallet(code, wallet_data["balance"])
+        portfolio._wallets[code] = wallet
+    return portfolio
 
 
 def _save_portfolio(portfolio: Portfolio) -> None:
-    """Сохранить портфель в JSON.
+    """Сохранить портфель через бэкенд хранения.
+
+    Сохранение — сравнение с обменом: запись принимается, только если
+    портфель в хранилище все еще той версии, с которой он был прочитан.
+    Иначе операцию повторяет декоратор @retry_on_conflict.
 
     Args:
         portfolio: Объект Portfolio.
-    """
-    portfolios_data = load_json("portfolios.json")
 
-    for p in portfolios_data:
-        if p["user_id"] == portfolio.user_id:
-            p["wallets"] = {
+    Raises:
+        ConcurrentModificationError: Если портфель изменен другой
+            операцией после чтения.
+    """
+    database.get_db().save_portfolio(
+        {
+            "user_id": portfolio.user_id,
+            "version": portfolio.version + 1,
+            "wallets": {
                 code: {"balance": wallet.balance}
                 for code, wallet in portfolio._wallets.items()
-            }
-            break
-    else:
-        # Если портфель не найден, создаём новый
-        portfolios_data.append(
-            {
-                "user_id": portfolio.user_id,
-                "wallets": {
-                    code: {"balance": wallet.balance}
-                    for code, wallet in portfolio._wallets.items()
-                },
-            }
-        )
-
-    save_json("portfolios.json", portfolios_data)
+            },
+        },
+        expected_version=portfolio.version,
+    )
+    portfolio.version += 1
 
 
 def get_portfolio_info(user: User, base_currency: str = "USD") -> dict:
@@ -248,6 +244,7 @@ def get_portfolio_info(user: User, base_currency: str = "USD") -> dict:
 # =============================================================================
 
 
+@retry_on_conflict()
 def add_wallet(user: User, currency_code: str, initial_balance: float = 0.0) -> Wallet:
     """Добавить кошелёк в портфель.
 
@@ -270,6 +267,7 @@ def add_wallet(user: User, currency_code: str, initial_balance: float = 0.0) ->
     return wallet
 
 
+@retry_on_conflict()
 def deposit(user: User, currency_code: str, amount: float) -> dict:
     """Пополнить кошелёк.
 
@@ -297,6 +295,7 @@ def deposit(user: User, currency_code: str, amount: float) -> dict:
     return wallet.get_balance_info()
 
 
+@retry_on_conflict()
 def withdraw(user: User, currency_code: str, amount: float) -> dict:
     """Снять средства с кошелька.
 
@@ -351,6 +350,7 @@ def get_balance(user: User, currency_code: str) -> dict:
 
 
 @log_action("BUY", verbose=True)
+@retry_on_conflict()
 def buy_currency(user: User, currency_code: str, amount: float) -> dict:
     """Купить валюту за USD.
 
@@ -400,6 +400,7 @@ def buy_currency(user: User, currency_code: str, amount: float) -> dict:
 
 
 @log_action("SELL", verbose=True)
+@retry_on_conflict()
 def sell_currency(user: User, currency_code: str, amount: float) -> dict:
     """Продать валюту за USD.
 
@@ -488,7 +489,8 @@ def get_exchange_rate_between(from_currency: str, to_currency: str) -> dict:
         to_currency: Целевая валюта.
 
     Returns:
-        Информация о курсе обмена.
+        Информация о курсе обмена ("is_stale" — курсы старше TTL,
+        "refreshing" — устаревшие курсы обновляются в фоне).
 
     Raises:
         CurrencyNotFoundError: Если валюта не найдена в реестре.
@@ -500,27 +502,19 @@ def get_exchange_rate_between(from_currency: str, to_currency: str) -> dict:
     from_code = from_curr.code
     to_code = to_curr.code
 
-    # Получаем курсы (с проверкой TTL)
-    rates_info = get_rates_info()
-    rates = rates_info["rates"]
-    updated_at = rates_info["updated_at"]
-
-    # Проверяем наличие курсов
-    if from_code not in rates:
-        raise CurrencyNotFoundError(from_code)
-    if to_code not in rates:
-        raise CurrencyNotFoundError(to_code)
-
-    # Конвертация через USD
-    from_rate = rates[from_code]
-    to_rate = rates[to_code]
-    exchange_rate = from_rate / to_rate
+    # Кросс-курс из матрицы книги курсов (CurrencyNotFoundError, если
+    # курса валюты нет)
+    book = get_rate_book()
+    exchange_rate = book.cross_rate(from_code, to_code)
+    is_stale = book.is_stale()
 
     return {
         "from_currency": from_code,
         "to_currency": to_code,
         "rate": exchange_rate,
         "description": f"1 {from_code} = {exchange_rate:.6f} {to_code}",
-        "updated_at": updated_at,
-        "base_currency": rates_info.get("base_currency", "USD"),
+        "updated_at": book.updated_at,
+        "base_currency": book.base_currency,
+        "is_stale": is_stale,
+        "refreshing": is_stale and revalidate(book),
     }
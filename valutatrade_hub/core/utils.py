@@ -1,13 +1,22 @@
 """Вспомогательные функции, сервис курсов и валидаторы."""
 
-import json
-from datetime import datetime
+from array import array
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any
 
 from valutatrade_hub.core.exceptions import (
     CurrencyNotFoundError,
     InvalidAmountError,
 )
+from valutatrade_hub.core.ratebook import RateBook, get_rate_book, revalidate
+from valutatrade_hub.infra import database
+
+try:
+    import numpy as np
+except ImportError:  # NumPy не обязателен: convert_many работает на array
+    np = None
 
 DATA_DIR = Path(__file__).parent.parent.parent / "data"
 
@@ -17,29 +26,38 @@ DATA_DIR = Path(__file__).parent.parent.parent / "data"
 
 
 def load_json(filename: str) -> dict | list:
-    """Загрузить данные из JSON файла.
+    """Загрузить данные из файла данных.
+
+    Чтение идет через DatabaseManager: повторные чтения неизмененного
+    файла берутся из кеша, формат (JSON или двоичный кодек настройки
+    "data_codec") определяется по заголовку файла. Возвращается
+    неизменяемый снимок (dict → MappingProxyType, list → tuple); для
+    изменения используйте get_db().transaction().
 
     Args:
         filename: Имя файла в папке data/.
 
     Returns:
-        Данные из файла (dict или list).
+        Снимок данных файла.
+
+    Raises:
+        DataNotFoundError: Если файл не найден (подкласс FileNotFoundError).
+        json.JSONDecodeError: Если файл содержит невалидный JSON.
+        ValueError: Если файл двоичного формата поврежден.
     """
-    filepath = DATA_DIR / filename
-    with filepath.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    return database.get_db().load(filename)
 
 
 def save_json(filename: str, data: dict | list) -> None:
-    """Сохранить данные в JSON файл.
+    """Атомарно сохранить данные в JSON файл (через DatabaseManager).
+
+    Файл всегда пишется в JSON, независимо от настройки "data_codec".
 
     Args:
         filename: Имя файла в папке data/.
         data: Данные для сохранения.
     """
-    filepath = DATA_DIR / filename
-    with filepath.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    database.get_db().save(filename, data, codec="json")
 
 
 # =============================================================================
@@ -105,30 +123,17 @@ def require_login(current_user: object | None) -> None:
 # Exchange Rates Service
 # =============================================================================
 
-# Дефолтные курсы (заглушка)
-DEFAULT_RATES: dict[str, float] = {
-    "USD": 1.0,
-    "EUR": 1.08,
-    "GBP": 1.27,
-    "RUB": 0.011,
-    "CNY": 0.14,
-    "JPY": 0.0067,
-    "BTC": 95000.0,
-    "ETH": 3500.0,
-}
+# Курсы читаются из книги курсов процесса (core.ratebook); DEFAULT_RATES
+# и BASE_CURRENCY импортируйте из core.ratebook
 
 
-def get_rates() -> dict[str, float]:
-    """Получить курсы валют из кеша или дефолтные.
+def get_rates() -> Mapping[str, float]:
+    """Получить курсы валют из книги курсов (или дефолтные).
 
     Returns:
-        Словарь {код_валюты: курс_к_USD}.
+        Неизменяемый словарь {код_валюты: курс_к_USD}.
     """
-    try:
-        data = load_json("rates.json")
-        return data.get("rates", DEFAULT_RATES)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return DEFAULT_RATES.copy()
+    return get_rate_book().rates
 
 
 def get_rate(currency_code: str) -> float:
@@ -143,11 +148,7 @@ def get_rate(currency_code: str) -> float:
     Raises:
         CurrencyNotFoundError: Если валюта не найдена.
     """
-    code = validate_currency_code(currency_code)
-    rates = get_rates()
-    if code not in rates:
-        raise CurrencyNotFoundError(code)
-    return rates[code]
+    return get_rate_book().rate(validate_currency_code(currency_code))
 
 
 def update_rates(new_rates: dict[str, float]) -> None:
@@ -159,7 +160,7 @@ def update_rates(new_rates: dict[str, float]) -> None:
     data = {
         "rates": new_rates,
         "base_currency": "USD",
-        "updated_at": datetime.now().isoformat(),
+        "updated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
     }
     save_json("rates.json", data)
 
@@ -167,29 +168,30 @@ def update_rates(new_rates: dict[str, float]) -> None:
 def get_rates_info() -> dict:
     """Получить информацию о курсах валют.
 
+    Устаревшие курсы возвращаются сразу, а их обновление запускается в
+    фоне (ratebook.revalidate).
+
     Returns:
-        Словарь с курсами и временем обновления.
+        Словарь с курсами, временем обновления, признаком устаревания
+        ("is_stale" — курсы старше настройки "rates_ttl_seconds") и
+        признаком фонового обновления ("refreshing").
     """
-    try:
-        data = load_json("rates.json")
-        return {
-            "rates": data.get("rates", DEFAULT_RATES),
-            "base_currency": data.get("base_currency", "USD"),
-            "updated_at": data.get("updated_at"),
-        }
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {
-            "rates": DEFAULT_RATES,
-            "base_currency": "USD",
-            "updated_at": None,
-        }
+    book = get_rate_book()
+    is_stale = book.is_stale()
+    return {
+        "rates": book.rates,
+        "base_currency": book.base_currency,
+        "updated_at": book.updated_at,
+        "is_stale": is_stale,
+        "refreshing": is_stale and revalidate(book),
+    }
 
 
 def convert_currency(
     amount: float,
     from_currency: str,
     to_currency: str,
-    rates: dict[str, float] | None = None,
+    rates: Mapping[str, float] | None = None,
 ) -> float:
     """Конвертировать сумму из одной валюты в другую.
 
@@ -211,7 +213,8 @@ def convert_currency(
     to_code = validate_currency_code(to_currency)
 
     if rates is None:
-        rates = get_rates()
+        # Кросс-курс из матрицы книги курсов
+        return amount * get_rate_book().cross_rate(from_code, to_code)
 
     if from_code not in rates:
         raise CurrencyNotFoundError(from_code)
@@ -221,3 +224,133 @@ def convert_currency(
     # Конвертация через USD
     amount_usd = amount * rates[from_code]
     return amount_usd / rates[to_code]
+
+
+def _code_positions(
+    codes: str | Sequence[str], positions: dict[str, int], book: RateBook
+) -> int | list[int]:
+    """Индексы валют в матрице кросс-курсов книги.
+
+    Каждый различный код валидируется один раз; найденные индексы
+    запоминаются в positions.
+
+    Args:
+        codes: Один код (для всех сумм) или код для каждой суммы.
+        positions: Индексы уже проверенных кодов {исходный_код: индекс}.
+        book: Книга курсов.
+
+    Returns:
+        Индекс (для одного кода) или список индексов.
+
+    Raises:
+        CurrencyNotFoundError: Если валюта не найдена.
+    """
+    if isinstance(codes, str):
+        codes = (codes,)
+        single = True
+    else:
+        single = False
+    for code in set(codes).difference(positions):
+        positions[code] = book.position(validate_currency_code(code))
+    if single:
+        return positions[codes[0]]
+    return [positions[code] for code in codes]
+
+
+def _amounts_array(amounts: Sequence[float]) -> array:
+    """Суммы как array('d') (одинаковая проверка типов с NumPy и без).
+
+    Raises:
+        TypeError: Если сумма не число (в том числе строка или None).
+    """
+    if np is not None and isinstance(amounts, np.ndarray):
+        if amounts.dtype.kind not in "biuf":
+            raise TypeError(f"Суммы должны быть числами, получен {amounts.dtype}")
+        values = array("d")
+        values.frombytes(np.ascontiguousarray(amounts, dtype=np.float64).tobytes())
+        return values
+    return array("d", amounts)
+
+
+def convert_many(
+    amounts: Sequence[float],
+    from_codes: str | Sequence[str],
+    to_codes: str | Sequence[str],
+) -> array:
+    """Конвертировать массив сумм за один проход.
+
+    Коды валют проверяются один раз на каждый различный код, множитель
+    каждой суммы берется из матрицы кросс-курсов книги курсов. С NumPy
+    расчет векторизован, без него выполняется циклом по array('d');
+    результат в обоих случаях — array('d').
+
+    В отличие от convert_currency() нулевые суммы допускаются (балансы
+    пустых кошельков).
+
+    Args:
+        amounts: Суммы (последовательность чисел или массив NumPy).
+        from_codes: Исходная валюта — одна для всех сумм или по сумме.
+        to_codes: Целевая валюта — одна для всех сумм или по сумме.
+
+    Returns:
+        Суммы в целевых валютах (array('d'); numpy.frombuffer(result)
+        дает массив NumPy без копирования).
+
+    Raises:
+        CurrencyNotFoundError: Если валюта не найдена.
+        InvalidAmountError: Если есть отрицательная сумма или NaN.
+        ValueError: Если длины последовательностей кодов и сумм различны.
+        TypeError: Если сумма не число.
+
+    Example:
+        >>> convert_many([1.0, 2.0], ["BTC", "EUR"], "USD")
+        array('d', [95000.0, 2.16])
+    """
+    book = get_rate_book()
+    positions: dict[str, int] = {}
+    from_idx = _code_positions(from_codes, positions, book)
+    to_idx = _code_positions(to_codes, positions, book)
+
+    values = _amounts_array(amounts)
+    size = len(values)
+    for idx in (from_idx, to_idx):
+        if isinstance(idx, list) and len(idx) != size:
+            raise ValueError(
+                f"Количество кодов валют ({len(idx)}) не совпадает "
+                f"с количеством сумм ({size})"
+            )
+    if not size:
+        return values
+
+    n = len(book.codes)
+    if np is not None:
+        vector = np.frombuffer(values, dtype=np.float64)
+        invalid = np.flatnonzero(~(vector >= 0))
+        if invalid.size:
+            raise InvalidAmountError(
+                float(vector[invalid[0]]), "сумма должна быть неотрицательным числом"
+            )
+        matrix = np.frombuffer(book.matrix, dtype=np.float64)
+        offsets = np.asarray(to_idx) * n + np.asarray(from_idx)
+        result = array("d")
+        result.frombytes((vector * matrix[offsets]).tobytes())
+        return result
+
+    bad = next((value for value in values if not value >= 0), None)
+    if bad is not None:
+        raise InvalidAmountError(bad, "сумма должна быть неотрицательным числом")
+    matrix = book.matrix
+    if isinstance(from_idx, int) and isinstance(to_idx, int):
+        factor = matrix[to_idx * n + from_idx]
+        return array("d", [value * factor for value in values])
+    if isinstance(from_idx, int):
+        from_idx = [from_idx] * size
+    if isinstance(to_idx, int):
+        to_idx = [to_idx] * size
+    return array(
+        "d",
+        [
+            value * matrix[t * n + f]
+            for value, f, t in zip(values, from_idx, to_idx)
+        ],
+    )
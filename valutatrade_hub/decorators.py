@@ -1,15 +1,25 @@
-"""Декораторы для логирования операций.
+"""Декораторы для логирования и повтора операций.
 
-Содержит декоратор @log_action для трассировки доменных операций
-(buy, sell, register, login).
+Содержит:
+    - @log_action для трассировки доменных операций
+      (buy, sell, register, login)
+    - @retry_on_conflict для повтора операций с портфелем при
+      конфликте версий (оптимистичная блокировка)
 """
 
 import functools
+import logging
+import random
+import time
 from collections.abc import Callable
 from typing import Any
 
+from valutatrade_hub.core.exceptions import ConcurrentModificationError
 from valutatrade_hub.logging_config import get_action_logger
 
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
 
 def log_action(
     action_type: str | None = None, verbose: bool = False
@@ -140,6 +150,62 @@ def log_action(
     return decorator
 
 
+def retry_on_conflict(
+    max_attempts: int = 10, base_delay: float = 0.002, max_delay: float = 0.2
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Декоратор повтора операции при конфликте версий портфеля.
+
+    Операция читает портфель, изменяет его и сохраняет со сравнением
+    версии. Если между чтением и записью портфель сохранила другая
+    операция, сохранение бросает ConcurrentModificationError — тогда
+    операция целиком выполняется заново со свежими данными после
+    случайной паузы (экспоненциальный рост с номером попытки до
+    max_delay), чтобы конкурирующие операции разошлись во времени.
+
+    Декорируемая функция должна быть безопасна для повтора: до
+    сохранения портфеля она не меняет внешнего состояния.
+
+    Args:
+        max_attempts: Максимальное число попыток.
+        base_delay: Базовая пауза между попытками в секундах.
+        max_delay: Максимальная пауза между попытками в секундах.
+
+    Returns:
+        Декоратор функции.
+
+    Raises:
+        ConcurrentModificationError: Если все попытки завершились конфликтом.
+
+    Example:
+        @log_action("BUY")
+        @retry_on_conflict()
+        def buy_currency(user: User, currency_code: str, amount: float) -> dict:
+            portfolio = get_portfolio(user)
+            ...
+            _save_portfolio(portfolio)
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            for attempt in range(1, max_attempts + 1):
+                try:
+                    return func(*args, **kwargs)
+                except ConcurrentModificationError as e:
+                    if attempt == max_attempts:
+                        raise
+                    logger.debug(
+                        f"{func.__name__}: version conflict "
+                        f"(attempt {attempt}/{max_attempts}): {e}"
+                    )
+                    delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+                    time.sleep(random.uniform(0, delay))
+
+        return wrapper
+
+    return decorator
+
+
 def _extract_params(func_name: str, args: tuple, kwargs: dict) -> dict[str, Any]:
     """Извлечь параметры из аргументов функции.
 
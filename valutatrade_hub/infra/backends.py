@@ -0,0 +1,741 @@
+"""Бэкенды хранения пользователей и портфелей.
+
+Модуль содержит интерфейс StorageBackend и две реализации:
+    - JsonBackend — users.json целиком и по файлу на портфель
+      (portfolios/<user_id>.json); по умолчанию, подходит для небольших
+      установок
+    - SqliteBackend — база sqlite3 в режиме WAL с индексами по user_id и
+      username: операции одного пользователя читают и обновляют только
+      его строки
+
+Бэкенд выбирается ключом настроек "storage_backend" ("json" или "sqlite").
+
+Записи портфелей версионируются (поле "version", у записей старого
+формата — 0). save_portfolio(record, expected_version=N) — сравнение с
+обменом: запись сохраняется, только если в хранилище все еще версия N,
+иначе бросается ConcurrentModificationError и usecase повторяется.
+"""
+
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from valutatrade_hub.core.exceptions import (
+    ConcurrentModificationError,
+    DataNotFoundError,
+    UserAlreadyExistsError,
+)
+from valutatrade_hub.infra.settings import get_settings
+
+if TYPE_CHECKING:
+    from valutatrade_hub.infra.database import DatabaseManager
+    from valutatrade_hub.infra.warmcache import RecordIndex
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend(ABC):
+    """Интерфейс хранилища пользователей и портфелей.
+
+    Формат записей совпадает с форматом JSON файлов:
+        пользователь: {"user_id": 1, "username": "alice",
+                       "hashed_password": "...", "salt": "...",
+                       "registration_date": "2025-10-09T12:00:00"}
+        портфель: {"user_id": 1, "version": 3,
+                   "wallets": {"USD": {"balance": 100.0}}}
+
+    Возвращаемые записи предназначены только для чтения (JsonBackend
+    отдает неизменяемые снимки из кеша DatabaseManager).
+    """
+
+    name: str = "abstract"
+
+    @abstractmethod
+    def get_user_by_username(self, username: str) -> Mapping[str, Any] | None:
+        """Найти пользователя по имени (None, если не найден)."""
+
+    @abstractmethod
+    def get_user_by_id(self, user_id: int) -> Mapping[str, Any] | None:
+        """Найти пользователя по ID (None, если не найден)."""
+
+    @abstractmethod
+    def next_user_id(self) -> int:
+        """Следующий свободный user_id."""
+
+    @abstractmethod
+    def add_user(self, record: dict[str, Any]) -> None:
+        """Добавить пользователя.
+
+        Raises:
+            UserAlreadyExistsError: Если имя пользователя занято.
+        """
+
+    @abstractmethod
+    def register_user(
+        self, user_record: dict[str, Any], portfolio_record: dict[str, Any]
+    ) -> int:
+        """Атомарно добавить пользователя и его портфель.
+
+        Если user_id записи уже занят параллельной регистрацией, записи
+        получают следующий свободный user_id.
+
+        Returns:
+            Итоговый user_id.
+
+        Raises:
+            UserAlreadyExistsError: Если имя пользователя занято.
+        """
+
+    @abstractmethod
+    def get_portfolio(self, user_id: int) -> Mapping[str, Any] | None:
+        """Портфель пользователя (None, если не найден)."""
+
+    @abstractmethod
+    def save_portfolio(
+        self, record: dict[str, Any], expected_version: int | None = None
+    ) -> None:
+        """Создать или заменить портфель пользователя.
+
+        Args:
+            record: Запись портфеля с уже увеличенной версией.
+            expected_version: Версия, прочитанная перед изменением
+                (None — записать без проверки).
+
+        Raises:
+            ConcurrentModificationError: Если версия в хранилище отличается
+                от expected_version.
+        """
+
+    def close(self) -> None:
+        """Освободить ресурсы бэкенда."""
+
+    def __repr__(self) -> str:
+        """Представление объекта для отладки."""
+        return f"{self.__class__.__name__}()"
+
+
+class JsonBackend(StorageBackend):
+    """Бэкенд поверх users.json и шардов портфелей.
+
+    Файлы читаются и записываются через DatabaseManager (с его кешем).
+    Отсутствующий users.json считается пустым списком.
+
+    Каждый портфель хранится в своем файле portfolios/<user_id>.json
+    (директория — настройка "portfolios_dir"), поэтому сохранение
+    портфеля переписывает только его файл. Общий portfolios.json старого
+    формата переносится в шарды при создании бэкенда.
+
+    Поиск пользователей выполняется по индексам в памяти за O(1):
+        - username → запись пользователя
+        - user_id → запись пользователя
+        - счетчик следующего user_id
+
+    Индексы строятся один раз для загруженного списка и обновляются при
+    записи. Если DatabaseManager перечитал файл (он изменился извне),
+    загруженный список — другой объект, и индексы перестраиваются.
+
+    Пока список в процессе не загружен (первые чтения после запуска CLI),
+    поиск идет по индексу теплого старта DatabaseManager.record_index():
+    крупный users.json не разбирается, если нужен один пользователь.
+
+    Регистрация записывает users.json и шард нового портфеля одной
+    транзакцией DatabaseManager.save_many(); прерванные транзакции
+    дописываются при создании бэкенда.
+    """
+
+    name = "json"
+
+    def __init__(self, db: "DatabaseManager") -> None:
+        """Инициализация бэкенда.
+
+        Args:
+            db: Менеджер базы данных для чтения/записи файлов.
+        """
+        self._db = db
+        settings = get_settings()
+        self._users_file = settings.get("users_file", "users.json")
+        self._lock = threading.RLock()
+
+        # Индексы пользователей и список, по которому они построены
+        self._users: Sequence[Mapping[str, Any]] | None = None
+        self._by_username: dict[str, Mapping[str, Any]] = {}
+        self._by_user_id: dict[int, Mapping[str, Any]] = {}
+        self._next_user_id = 1
+
+        db.register_record_index(self._users_file, ("username", "user_id"))
+        db.recover_transactions()
+        migrate_portfolios_to_shards(db)
+
+    def _load_list(self, filename: str) -> Sequence[Mapping[str, Any]]:
+        """Загрузить список записей (пустой, если файла нет)."""
+        try:
+            return self._db.load(filename)
+        except DataNotFoundError:
+            return []
+
+    def _users_index(self) -> Sequence[Mapping[str, Any]]:
+        """Список пользователей с актуальными индексами."""
+        users = self._load_list(self._users_file)
+        if users is not self._users:
+            self._by_username = {u["username"]: u for u in users}
+            self._by_user_id = {u["user_id"]: u for u in users}
+            self._next_user_id = max(self._by_user_id, default=0) + 1
+            self._users = users
+        return users
+
+    def _warm_index(self) -> "RecordIndex | None":
+        """Индекс теплого старта, пока список не загружен в процессе."""
+        if self._users is not None:
+            return None
+        return self._db.record_index(self._users_file)
+
+    def get_user_by_username(self, username: str) -> Mapping[str, Any] | None:
+        """Найти пользователя по имени (None, если не найден)."""
+        with self._lock:
+            index = self._warm_index()
+            if index is not None:
+                return index.find("username", username)
+            self._users_index()
+            return self._by_username.get(username)
+
+    def get_user_by_id(self, user_id: int) -> Mapping[str, Any] | None:
+        """Найти пользователя по ID (None, если не найден)."""
+        with self._lock:
+            index = self._warm_index()
+            if index is not None:
+                return index.find("user_id", user_id)
+            self._users_index()
+            return self._by_user_id.get(user_id)
+
+    def next_user_id(self) -> int:
+        """Следующий свободный user_id."""
+        with self._lock:
+            index = self._warm_index()
+            if index is not None:
+                return (index.max_value("user_id") or 0) + 1
+            self._users_index()
+            return self._next_user_id
+
+    def add_user(self, record: dict[str, Any]) -> None:
+        """Добавить пользователя.
+
+        Raises:
+            UserAlreadyExistsError: Если имя пользователя занято.
+        """
+        with self._lock, self._db.file_lock(self._users_file).write_locked():
+            self._check_username(record["username"])
+            # Снимок нового списка переиспользует замороженные записи
+            self._indexed(self._db.save(self._users_file, [*self._users, record]))
+
+    def register_user(
+        self, user_record: dict[str, Any], portfolio_record: dict[str, Any]
+    ) -> int:
+        """Атомарно добавить пользователя и его портфель.
+
+        users.json и шард портфеля записываются одной транзакцией
+        DatabaseManager.save_many() под блокировкой записи users.json,
+        поэтому имя и user_id не займет одновременно другой процесс.
+
+        Returns:
+            Итоговый user_id.
+
+        Raises:
+            UserAlreadyExistsError: Если имя пользователя занято.
+        """
+        with self._lock, self._db.file_lock(self._users_file).write_locked():
+            self._check_username(user_record["username"])
+            user_id = user_record["user_id"]
+            if user_id in self._by_user_id:
+                user_id = self._next_user_id
+            user_record = {**user_record, "user_id": user_id}
+            portfolio_record = {**portfolio_record, "user_id": user_id}
+
+            snapshots = self._db.save_many(
+                {
+                    self._users_file: [*self._users, user_record],
+                    portfolio_shard_name(user_id): portfolio_record,
+                }
+            )
+            self._indexed(snapshots[self._users_file])
+            return user_id
+
+    def _check_username(self, username: str) -> None:
+        """Актуализировать индексы и проверить, что имя свободно.
+
+        Raises:
+            UserAlreadyExistsError: Если имя пользователя занято.
+        """
+        self._users_index()
+        if username in self._by_username:
+            raise UserAlreadyExistsError(username)
+
+    def _indexed(self, snapshot: Sequence[Mapping[str, Any]]) -> None:
+        """Добавить в индексы последнюю запись сохраненного списка."""
+        frozen = snapshot[-1]
+        self._by_username[frozen["username"]] = frozen
+        self._by_user_id[frozen["user_id"]] = frozen
+        self._next_user_id = max(self._next_user_id, frozen["user_id"] + 1)
+        # Индексы соответствуют снимку, который теперь лежит в кеше
+        self._users = snapshot
+
+    def get_portfolio(self, user_id: int) -> Mapping[str, Any] | None:
+        """Портфель пользователя (None, если не найден)."""
+        try:
+            return self._db.load(portfolio_shard_name(user_id))
+        except DataNotFoundError:
+            return None
+
+    def save_portfolio(
+        self, record: dict[str, Any], expected_version: int | None = None
+    ) -> None:
+        """Создать или заменить портфель пользователя.
+
+        Проверка версии и запись выполняются под блокировкой записи шарда,
+        поэтому сравнение с обменом атомарно и между процессами.
+
+        Raises:
+            ConcurrentModificationError: Если версия в хранилище отличается
+                от expected_version.
+        """
+        filename = portfolio_shard_name(record["user_id"])
+        with self._db.file_lock(filename).write_locked():
+            if expected_version is not None:
+                check_portfolio_version(
+                    record["user_id"],
+                    expected_version,
+                    self.get_portfolio(record["user_id"]),
+                )
+            self._db.save(filename, record)
+
+
+class SqliteBackend(StorageBackend):
+    """Бэкенд на sqlite3 (режим WAL).
+
+    Схема:
+        users(user_id PK, username UNIQUE, hashed_password, salt,
+              registration_date) + уникальный индекс по username
+        portfolios(user_id PK, version)
+        wallets(user_id, currency_code, balance), PK (user_id, currency_code)
+        meta(key PK, value) — служебные отметки (json_import)
+
+    Одно соединение на процесс, доступ сериализуется блокировкой.
+    Существующие users.json и портфели JSON бэкенда импортируются в базу
+    в одной транзакции с отметкой json_import в таблице meta. Пока отметки
+    нет (импорт прерван или завершился ошибкой), импорт повторяется при
+    каждом открытии базы.
+    """
+
+    name = "sqlite"
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            hashed_password TEXT NOT NULL,
+            salt TEXT NOT NULL,
+            registration_date TEXT NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users (username);
+        CREATE TABLE IF NOT EXISTS portfolios (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS wallets (
+            user_id INTEGER NOT NULL,
+            currency_code TEXT NOT NULL,
+            balance REAL NOT NULL,
+            PRIMARY KEY (user_id, currency_code)
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    _IMPORT_MARKER = "json_import"
+
+    _USER_COLUMNS = (
+        "user_id",
+        "username",
+        "hashed_password",
+        "salt",
+        "registration_date",
+    )
+
+    def __init__(self, path: Path, db: "DatabaseManager | None" = None) -> None:
+        """Открыть (или создать) базу данных.
+
+        Args:
+            path: Путь к файлу базы sqlite.
+            db: Менеджер базы данных для импорта JSON файлов, если импорт
+                еще не отмечен в таблице meta (опционально).
+        """
+        self._path = path
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self._SCHEMA)
+        self._migrate_schema()
+
+        if db is not None and not self._is_imported():
+            self._import_json(db)
+
+    def _migrate_schema(self) -> None:
+        """Добавить столбец version в базу, созданную до его появления."""
+        with self._lock:
+            columns = {
+                row["name"]
+                for row in self._conn.execute("PRAGMA table_info(portfolios)")
+            }
+            if "version" not in columns:
+                self._conn.execute(
+                    "ALTER TABLE portfolios "
+                    "ADD COLUMN version INTEGER NOT NULL DEFAULT 0"
+                )
+
+    def _is_imported(self) -> bool:
+        """Есть ли в базе отметка о завершенном импорте JSON."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM meta WHERE key = ?", (self._IMPORT_MARKER,)
+            ).fetchone()
+        return row is not None
+
+    def _import_json(self, db: "DatabaseManager") -> None:
+        """Импортировать users.json и портфели JSON бэкенда.
+
+        Данные и отметка json_import пишутся в одной транзакции: прерванный
+        импорт откатывается целиком и повторяется при следующем открытии.
+        База, заполненная до появления отметки, только получает отметку.
+        """
+        users_file = get_settings().get("users_file", "users.json")
+
+        users = db.load(users_file) if db.file_exists(users_file) else []
+        portfolios = load_json_portfolios(db)
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Повторная проверка под блокировкой записи: импорт мог
+                # завершить другой процесс
+                done = self._conn.execute(
+                    "SELECT 1 FROM meta WHERE key = ?", (self._IMPORT_MARKER,)
+                ).fetchone()
+                populated = self._conn.execute(
+                    "SELECT EXISTS (SELECT 1 FROM users) "
+                    "OR EXISTS (SELECT 1 FROM portfolios)"
+                ).fetchone()[0]
+                if done is None and not populated:
+                    for user in users:
+                        self._conn.execute(
+                            "INSERT INTO users VALUES (?, ?, ?, ?, ?)",
+                            tuple(user[c] for c in self._USER_COLUMNS),
+                        )
+                    for portfolio in portfolios:
+                        self._write_portfolio(portfolio)
+                if done is None:
+                    self._conn.execute(
+                        "INSERT INTO meta (key, value) VALUES (?, ?)",
+                        (self._IMPORT_MARKER, datetime.now().isoformat()),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _user_row(self, query: str, value: Any) -> Mapping[str, Any] | None:
+        """Выполнить запрос одного пользователя."""
+        with self._lock:
+            row = self._conn.execute(query, (value,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def get_user_by_username(self, username: str) -> Mapping[str, Any] | None:
+        """Найти пользователя по имени (None, если не найден)."""
+        return self._user_row("SELECT * FROM users WHERE username = ?", username)
+
+    def get_user_by_id(self, user_id: int) -> Mapping[str, Any] | None:
+        """Найти пользователя по ID (None, если не найден)."""
+        return self._user_row("SELECT * FROM users WHERE user_id = ?", user_id)
+
+    def next_user_id(self) -> int:
+        """Следующий свободный user_id."""
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(user_id) FROM users").fetchone()
+        return (row[0] or 0) + 1
+
+    def add_user(self, record: dict[str, Any]) -> None:
+        """Добавить пользователя.
+
+        Raises:
+            UserAlreadyExistsError: Если имя пользователя занято.
+        """
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO users VALUES (?, ?, ?, ?, ?)",
+                    tuple(record[c] for c in self._USER_COLUMNS),
+                )
+        except sqlite3.IntegrityError as e:
+            raise UserAlreadyExistsError(record["username"]) from e
+
+    def register_user(
+        self, user_record: dict[str, Any], portfolio_record: dict[str, Any]
+    ) -> int:
+        """Атомарно добавить пользователя и его портфель (одна транзакция).
+
+        Returns:
+            Итоговый user_id.
+
+        Raises:
+            UserAlreadyExistsError: Если имя пользователя занято.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                user_id = user_record["user_id"]
+                taken = self._conn.execute(
+                    "SELECT 1 FROM users WHERE user_id = ?", (user_id,)
+                ).fetchone()
+                if taken is not None:
+                    row = self._conn.execute("SELECT MAX(user_id) FROM users")
+                    user_id = row.fetchone()[0] + 1
+                user_record = {**user_record, "user_id": user_id}
+
+                self._conn.execute(
+                    "INSERT INTO users VALUES (?, ?, ?, ?, ?)",
+                    tuple(user_record[c] for c in self._USER_COLUMNS),
+                )
+                self._write_portfolio({**portfolio_record, "user_id": user_id})
+                self._conn.execute("COMMIT")
+                return user_id
+            except sqlite3.IntegrityError as e:
+                self._conn.execute("ROLLBACK")
+                raise UserAlreadyExistsError(user_record["username"]) from e
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_portfolio(self, user_id: int) -> Mapping[str, Any] | None:
+        """Портфель пользователя (None, если не найден)."""
+        with self._lock:
+            version = self._version(user_id)
+            if version is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT currency_code, balance FROM wallets WHERE user_id = ?",
+                (user_id,),
+            ).fetchall()
+        wallets = {row["currency_code"]: {"balance": row["balance"]} for row in rows}
+        return {"user_id": user_id, "version": version, "wallets": wallets}
+
+    def _version(self, user_id: int) -> int | None:
+        """Версия портфеля (None, если его нет; под _lock)."""
+        row = self._conn.execute(
+            "SELECT version FROM portfolios WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return row["version"] if row is not None else None
+
+    def _write_portfolio(self, record: dict[str, Any]) -> None:
+        """Заменить строки портфеля (внутри открытой транзакции)."""
+        user_id = record["user_id"]
+        version = record.get("version", 0)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO portfolios (user_id, version) VALUES (?, ?)",
+            (user_id, version),
+        )
+        self._conn.execute(
+            "UPDATE portfolios SET version = ? WHERE user_id = ?", (version, user_id)
+        )
+        self._conn.execute("DELETE FROM wallets WHERE user_id = ?", (user_id,))
+        self._conn.executemany(
+            "INSERT INTO wallets (user_id, currency_code, balance) VALUES (?, ?, ?)",
+            [
+                (user_id, code, wallet["balance"])
+                for code, wallet in record.get("wallets", {}).items()
+            ],
+        )
+
+    def save_portfolio(
+        self, record: dict[str, Any], expected_version: int | None = None
+    ) -> None:
+        """Создать или заменить портфель пользователя.
+
+        Версия проверяется внутри транзакции BEGIN IMMEDIATE, которая
+        блокирует запись в базу другими соединениями и процессами.
+
+        Raises:
+            ConcurrentModificationError: Если версия в хранилище отличается
+                от expected_version.
+        """
+        user_id = record["user_id"]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if expected_version is not None:
+                    actual = self._version(user_id)
+                    if actual != expected_version:
+                        raise ConcurrentModificationError(
+                            user_id, expected_version, actual
+                        )
+                self._write_portfolio(record)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        """Закрыть соединение с базой."""
+        with self._lock:
+            self._conn.close()
+
+    def __repr__(self) -> str:
+        """Представление объекта для отладки."""
+        return f"SqliteBackend(path='{self._path}')"
+
+
+# =============================================================================
+# Portfolio shards
+# =============================================================================
+
+
+def portfolio_shard_name(user_id: int) -> str:
+    """Имя файла портфеля пользователя относительно директории данных.
+
+    Args:
+        user_id: ID пользователя.
+
+    Returns:
+        Путь вида "portfolios/42.json".
+    """
+    portfolios_dir = get_settings().get("portfolios_dir", "portfolios")
+    return f"{portfolios_dir}/{user_id}.json"
+
+
+def check_portfolio_version(
+    user_id: int, expected_version: int, current: Mapping[str, Any] | None
+) -> None:
+    """Проверить, что портфель не изменился с момента чтения.
+
+    Args:
+        user_id: ID пользователя.
+        expected_version: Версия, прочитанная перед изменением.
+        current: Текущая запись портфеля (None, если портфеля нет).
+
+    Raises:
+        ConcurrentModificationError: Если версии не совпадают.
+    """
+    actual = current.get("version", 0) if current is not None else None
+    if actual != expected_version:
+        raise ConcurrentModificationError(user_id, expected_version, actual)
+
+
+def migrate_portfolios_to_shards(db: "DatabaseManager") -> int:
+    """Перенести общий portfolios.json в файлы portfolios/<user_id>.json.
+
+    После переноса исходный файл переименовывается в
+    portfolios.json.migrated. Перенос выполняется под блокировкой записи
+    исходного файла, и его наличие проверяется уже под ней, поэтому
+    одновременно запущенные процессы переносят портфели один раз.
+    Повторный вызов (в том числе после сбоя посреди переноса) безопасен:
+    шарды перезаписываются из исходного файла, пока он не переименован.
+
+    Args:
+        db: Менеджер базы данных.
+
+    Returns:
+        Количество перенесенных портфелей (0, если переносить нечего).
+
+    Example:
+        >>> from valutatrade_hub.infra.database import get_db
+        >>> migrate_portfolios_to_shards(get_db())
+        2
+    """
+    legacy_file = get_settings().get("portfolios_file", "portfolios.json")
+    if not db.file_exists(legacy_file):
+        return 0
+
+    lock = db.file_lock(legacy_file)
+    with lock.write_locked():
+        try:
+            portfolios = db.load(legacy_file, use_cache=False)
+        except DataNotFoundError:
+            # Перенес другой процесс
+            return 0
+
+        for record in portfolios:
+            db.save(portfolio_shard_name(record["user_id"]), record)
+
+        legacy_path = db.get_file_path(legacy_file)
+        legacy_path.replace(legacy_path.with_name(legacy_path.name + ".migrated"))
+        lock.bump_generation()
+        db.clear_cache(legacy_file)
+
+    logger.info(f"Migrated {len(portfolios)} portfolios from {legacy_file} to shards")
+    return len(portfolios)
+
+
+def load_json_portfolios(db: "DatabaseManager") -> list[dict[str, Any]]:
+    """Все портфели JSON бэкенда (из portfolios.json или из шардов).
+
+    Args:
+        db: Менеджер базы данных.
+
+    Returns:
+        Список записей портфелей.
+    """
+    legacy_file = get_settings().get("portfolios_file", "portfolios.json")
+    if db.file_exists(legacy_file):
+        return db.load(legacy_file)
+
+    portfolios_dir = get_settings().get("portfolios_dir", "portfolios")
+    return [
+        db.load(f"{portfolios_dir}/{path.name}", use_cache=False)
+        for path in sorted(db.get_file_path(portfolios_dir).glob("*.json"))
+    ]
+
+
+# =============================================================================
+# Factory
+# =============================================================================
+
+
+def create_backend(db: "DatabaseManager") -> StorageBackend:
+    """Создать бэкенд хранения по настройкам.
+
+    Ключи настроек:
+        - storage_backend: "json" (по умолчанию) или "sqlite"
+        - sqlite_file: имя файла базы в директории данных
+
+    Args:
+        db: Менеджер базы данных.
+
+    Returns:
+        Экземпляр бэкенда.
+
+    Raises:
+        ValueError: Если указан неизвестный бэкенд.
+    """
+    settings = get_settings()
+    kind = settings.get("storage_backend", "json")
+
+    if kind == "json":
+        return JsonBackend(db)
+    if kind == "sqlite":
+        path = settings.get_data_path(settings.get("sqlite_file", "valutatrade.db"))
+        return SqliteBackend(path, db)
+
+    raise ValueError(
+        f"Неизвестный бэкенд хранения: '{kind}'. Допустимые значения: json, sqlite"
+    )
@@ -0,0 +1,163 @@
+"""LRU кеш с ограничением по объему.
+
+Модуль содержит класс LRUCache, который использует DatabaseManager для
+кеширования загруженных файлов. Каждая запись хранит:
+    - тег актуальности (например, сигнатура и поколение файла) —
+      запись с другим тегом считается промахом и удаляется
+    - значение
+    - стоимость в байтах (оценка, для файлов — размер на диске)
+
+При превышении бюджета вытесняются давно не использованные записи.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any
+
+# Признак промаха (значение в кеше может быть и None)
+CACHE_MISS = object()
+
+
+class LRUCache:
+    """Потокобезопасный LRU кеш с бюджетом в байтах и счетчиками.
+
+    Attributes:
+        max_bytes: Бюджет кеша в байтах (None — без ограничения).
+        hits: Количество попаданий.
+        misses: Количество промахов (нет записи или тег устарел).
+        evictions: Количество вытесненных по бюджету записей.
+
+    Example:
+        >>> cache = LRUCache(max_bytes=1024)
+        >>> cache.put("users.json", tag, users, cost=512)
+        >>> cache.get("users.json", tag) is users
+        True
+        >>> cache.stats()
+        {"entries": 1, "bytes": 512, "max_bytes": 1024, "hits": 1, ...}
+    """
+
+    def __init__(self, max_bytes: int | None = None) -> None:
+        """Создать пустой кеш.
+
+        Args:
+            max_bytes: Бюджет в байтах (None — без ограничения).
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # {key: (tag, value, cost)}, от давно использованных к недавним
+        self._entries: OrderedDict[str, tuple[Any, Any, int]] = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str, tag: Any) -> Any:
+        """Получить значение, если его тег совпадает с ожидаемым.
+
+        Args:
+            key: Ключ записи.
+            tag: Ожидаемый тег актуальности.
+
+        Returns:
+            Значение или CACHE_MISS.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != tag:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return CACHE_MISS
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, tag: Any, value: Any, cost: int) -> None:
+        """Положить значение в кеш, вытеснив старые записи при необходимости.
+
+        Запись дороже всего бюджета не кешируется.
+
+        Args:
+            key: Ключ записи.
+            tag: Тег актуальности.
+            value: Значение.
+            cost: Стоимость записи в байтах.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.max_bytes is not None and cost > self.max_bytes:
+                return
+            self._entries[key] = (tag, value, cost)
+            self._bytes += cost
+            while self.max_bytes is not None and self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def pop(self, key: str) -> None:
+        """Удалить запись (если есть)."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Удалить все записи (счетчики сохраняются)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def set_max_bytes(self, max_bytes: int | None) -> None:
+        """Изменить бюджет и вытеснить лишние записи.
+
+        Args:
+            max_bytes: Новый бюджет в байтах (None — без ограничения).
+        """
+        with self._lock:
+            self.max_bytes = max_bytes
+            while max_bytes is not None and self._bytes > max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        """Удалить запись и учесть ее стоимость (под _lock)."""
+        _, _, cost = self._entries.pop(key)
+        self._bytes -= cost
+
+    @property
+    def nbytes(self) -> int:
+        """Суммарная стоимость записей в байтах."""
+        return self._bytes
+
+    def stats(self) -> dict[str, Any]:
+        """Статистика кеша.
+
+        Returns:
+            {"entries": 3, "bytes": 10240, "max_bytes": 67108864,
+             "hits": 120, "misses": 5, "evictions": 0}
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __contains__(self, key: str) -> bool:
+        """Есть ли запись с ключом (без учета тега)."""
+        return key in self._entries
+
+    def __len__(self) -> int:
+        """Количество записей."""
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        """Представление кеша для отладки."""
+        return (
+            f"LRUCache(entries={len(self)}, bytes={self._bytes}, "
+            f"max_bytes={self.max_bytes}, hits={self.hits}, "
+            f"misses={self.misses}, evictions={self.evictions})"
+        )
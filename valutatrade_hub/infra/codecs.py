@@ -0,0 +1,299 @@
+"""Кодеки сериализации файлов данных.
+
+Формат, в котором записываются внутренние файлы данных (users.json,
+портфели, журналы фиксации), выбирается ключом настроек "data_codec"
+(rates.json, который читают внешние инструменты, всегда пишется в JSON):
+    - "json"    — компактный JSON (по умолчанию): переносимый, читается
+                  любыми инструментами
+    - "pickle"  — pickle протокола 5: хранит готовый неизменяемый снимок,
+                  поэтому загрузка крупных файлов самая быстрая; только
+                  для доверенных локальных данных (загрузка pickle может
+                  выполнить произвольный код)
+    - "marshal" — marshal: быстрый и компактный, формат зависит от
+                  версии Python
+
+Файлы двоичных форматов начинаются с заголовка b"\\x00VT" и байта кодека,
+JSON никогда не начинается с нулевого байта. Поэтому при чтении формат
+определяется по содержимому: смена "data_codec" не требует миграции,
+файлы переписываются в новом формате при следующей записи. Имена файлов
+не меняются.
+
+Небезопасные форматы (pickle) читаются, только если они выбраны в
+"data_codec" или перечислены в "data_codec_trusted" (например, на время
+перехода с pickle на JSON). Иначе файл считается недоверенным и чтение
+завершается StorageError без вызова pickle.loads.
+
+Сравнение форматов: scripts/bench_codecs.py (make bench-codecs).
+"""
+
+import copyreg
+import io
+import json
+import marshal
+import pickle
+from abc import ABC, abstractmethod
+from types import MappingProxyType
+from typing import Any
+
+from valutatrade_hub.core.exceptions import StorageError
+from valutatrade_hub.infra.fileio import encode_json
+from valutatrade_hub.infra.settings import get_settings
+from valutatrade_hub.infra.snapshot import freeze, loads_frozen, thaw
+
+# Заголовок двоичных форматов (JSON не начинается с нулевого байта)
+MAGIC_PREFIX = b"\x00VT"
+
+
+class Codec(ABC):
+    """Формат сериализации файла данных.
+
+    Attributes:
+        name: Имя кодека в настройке "data_codec".
+        magic: Заголовок файла (пустой для JSON).
+        unsafe: Загрузка может выполнить произвольный код (такой кодек
+            читается, только если он доверенный, см. detect_codec).
+    """
+
+    name: str = "abstract"
+    magic: bytes = b""
+    unsafe: bool = False
+
+    @abstractmethod
+    def encode(self, data: Any) -> bytes:
+        """Сериализовать данные (допускаются снимки DatabaseManager).
+
+        Raises:
+            TypeError: Если данные не сериализуются.
+        """
+
+    @abstractmethod
+    def decode(self, payload: bytes) -> Any:
+        """Разобрать содержимое файла в обычные dict/list.
+
+        Raises:
+            ValueError: Если содержимое повреждено.
+        """
+
+    def decode_frozen(self, payload: bytes) -> Any:
+        """Разобрать содержимое файла сразу в неизменяемый снимок."""
+        return freeze(self.decode(payload))
+
+    def __repr__(self) -> str:
+        """Представление кодека для отладки."""
+        return f"{self.__class__.__name__}()"
+
+
+class JsonCodec(Codec):
+    """Компактный JSON (отступ — настройка "json_indent")."""
+
+    name = "json"
+
+    def encode(self, data: Any) -> bytes:
+        """Сериализовать данные в UTF-8 JSON."""
+        return encode_json(data).encode("utf-8")
+
+    def decode(self, payload: bytes) -> Any:
+        """Разобрать JSON.
+
+        Raises:
+            json.JSONDecodeError: Если JSON невалиден.
+        """
+        return json.loads(payload)
+
+    def decode_frozen(self, payload: bytes) -> Any:
+        """Разобрать JSON в снимок без отдельного обхода данных."""
+        return loads_frozen(payload)
+
+
+class _BinaryCodec(Codec):
+    """Двоичный формат с заголовком MAGIC_PREFIX + байт кодека."""
+
+    def encode(self, data: Any) -> bytes:
+        """Сериализовать данные с заголовком формата."""
+        return self.magic + self._dumps(data)
+
+    def decode(self, payload: bytes) -> Any:
+        """Разобрать содержимое после заголовка.
+
+        Raises:
+            ValueError: Если заголовок не совпадает или данные повреждены.
+        """
+        if not payload.startswith(self.magic):
+            raise ValueError(f"Payload is not in {self.name} format")
+        try:
+            return self._loads(payload[len(self.magic) :])
+        except (EOFError, TypeError, ValueError, pickle.UnpicklingError) as e:
+            raise ValueError(f"Corrupted {self.name} payload: {e}") from e
+
+    @abstractmethod
+    def _dumps(self, data: Any) -> bytes:
+        """Сериализовать данные (допускаются снимки)."""
+
+    @abstractmethod
+    def _loads(self, body: bytes) -> Any:
+        """Разобрать тело без заголовка."""
+
+
+def _frozen_dict(items: dict[str, Any]) -> MappingProxyType:
+    """Восстановить замороженный словарь при загрузке pickle."""
+    return MappingProxyType(items)
+
+
+def _reduce_frozen_dict(mapping: MappingProxyType) -> tuple:
+    """Сериализовать MappingProxyType через _frozen_dict."""
+    return _frozen_dict, (dict(mapping),)
+
+
+class PickleCodec(_BinaryCodec):
+    """pickle протокола 5 (только доверенные локальные файлы).
+
+    В файл записывается неизменяемый снимок (MappingProxyType и tuple),
+    поэтому decode_frozen() получает его напрямую из pickle.loads без
+    отдельного обхода данных.
+    """
+
+    name = "pickle"
+    magic = MAGIC_PREFIX + b"P"
+    unsafe = True
+
+    _dispatch_table = {
+        **copyreg.dispatch_table,
+        MappingProxyType: _reduce_frozen_dict,
+    }
+
+    def decode(self, payload: bytes) -> Any:
+        """Разобрать pickle в обычные dict/list.
+
+        Raises:
+            ValueError: Если заголовок не совпадает или данные повреждены.
+        """
+        return thaw(super().decode(payload))
+
+    def decode_frozen(self, payload: bytes) -> Any:
+        """Разобрать pickle в снимок (уже замороженный при записи)."""
+        return freeze(super().decode(payload))
+
+    def _dumps(self, data: Any) -> bytes:
+        """Сериализовать снимок данных в pickle протокола 5."""
+        buffer = io.BytesIO()
+        pickler = pickle.Pickler(buffer, protocol=5)
+        pickler.dispatch_table = self._dispatch_table
+        pickler.dump(freeze(data))
+        return buffer.getvalue()
+
+    def _loads(self, body: bytes) -> Any:
+        """Разобрать pickle."""
+        return pickle.loads(body)
+
+
+class MarshalCodec(_BinaryCodec):
+    """marshal (формат зависит от версии Python)."""
+
+    name = "marshal"
+    magic = MAGIC_PREFIX + b"M"
+
+    def _dumps(self, data: Any) -> bytes:
+        """Сериализовать marshal.
+
+        Raises:
+            TypeError: Если данные содержат неподдерживаемые типы.
+        """
+        # Снимки (MappingProxyType) marshal не сериализует
+        try:
+            return marshal.dumps(thaw(data))
+        except ValueError as e:
+            raise TypeError(f"Data is not marshallable: {e}") from e
+
+    def _loads(self, body: bytes) -> Any:
+        """Разобрать marshal."""
+        return marshal.loads(body)
+
+
+# Реестр кодеков по имени
+CODECS: dict[str, Codec] = {
+    codec.name: codec for codec in (JsonCodec(), PickleCodec(), MarshalCodec())
+}
+
+
+def get_codec(name: str | None = None) -> Codec:
+    """Получить кодек по имени.
+
+    Args:
+        name: Имя кодека (None — из настройки "data_codec").
+
+    Returns:
+        Кодек.
+
+    Raises:
+        ValueError: Если кодек неизвестен.
+    """
+    name = name or get_settings().get("data_codec", "json")
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown data codec '{name}', expected one of {', '.join(CODECS)}"
+        ) from None
+
+
+def trusted_codecs() -> frozenset[str]:
+    """Имена кодеков, файлы которых разрешено читать при unsafe=True.
+
+    Это кодек из настройки "data_codec" и кодеки из списка
+    "data_codec_trusted".
+    """
+    settings = get_settings()
+    return frozenset(
+        [settings.get("data_codec", "json"), *settings.get("data_codec_trusted", [])]
+    )
+
+
+def detect_codec(payload: bytes) -> Codec:
+    """Определить кодек по заголовку содержимого файла.
+
+    Raises:
+        ValueError: Если заголовок двоичного формата неизвестен.
+        StorageError: Если файл записан небезопасным кодеком (pickle),
+            который не выбран в "data_codec" и не указан в
+            "data_codec_trusted".
+    """
+    if not payload.startswith(MAGIC_PREFIX):
+        return CODECS["json"]
+    for codec in CODECS.values():
+        if codec.magic and payload.startswith(codec.magic):
+            if codec.unsafe and codec.name not in trusted_codecs():
+                raise StorageError(
+                    f"Refusing to load untrusted {codec.name} data file: "
+                    f"allow it with data_codec or data_codec_trusted"
+                )
+            return codec
+    raise ValueError(f"Unknown data file header {payload[:4]!r}")
+
+
+def encode(data: Any, codec: str | None = None) -> bytes:
+    """Сериализовать данные кодеком из настроек (или указанным).
+
+    Example:
+        >>> payload = encode({"pairs": {}})  # b'{"pairs":{}}' для "json"
+    """
+    return get_codec(codec).encode(data)
+
+
+def decode(payload: bytes) -> Any:
+    """Разобрать содержимое файла, определив формат по заголовку.
+
+    Raises:
+        ValueError: Если содержимое повреждено (json.JSONDecodeError для JSON).
+        StorageError: Если формат файла недоверенный (см. detect_codec).
+    """
+    return detect_codec(payload).decode(payload)
+
+
+def decode_frozen(payload: bytes) -> Any:
+    """Разобрать содержимое файла в неизменяемый снимок.
+
+    Raises:
+        ValueError: Если содержимое повреждено (json.JSONDecodeError для JSON).
+        StorageError: Если формат файла недоверенный (см. detect_codec).
+    """
+    return detect_codec(payload).decode_frozen(payload)
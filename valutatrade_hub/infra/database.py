@@ -2,26 +2,76 @@
 
 Модуль содержит класс DatabaseManager, реализующий паттерн Singleton
 для единой точки доступа к операциям с данными (JSON файлы).
+
+Записи пользователей и портфелей читаются и сохраняются через
+подключаемый бэкенд хранения (см. infra.backends): JSON файлы
+по умолчанию или sqlite для больших установок.
 """
 
+import atexit
+import itertools
 import json
+import logging
+import os
 import threading
-from collections.abc import Callable
+import time
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from valutatrade_hub.core.exceptions import DataNotFoundError
+from valutatrade_hub.infra import codecs
+from valutatrade_hub.infra.cache import CACHE_MISS, LRUCache
+from valutatrade_hub.infra.fileio import (
+    atomic_write,
+    get_durability,
+    stronger_durability,
+)
+from valutatrade_hub.infra.locks import FileLock, get_file_lock
 from valutatrade_hub.infra.settings import get_settings
+from valutatrade_hub.infra.snapshot import freeze, thaw
+from valutatrade_hub.infra.warmcache import RecordIndex, WarmStartCache
+
+if TYPE_CHECKING:
+    from valutatrade_hub.infra.backends import StorageBackend
+    from valutatrade_hub.infra.wal import WriteAheadLog
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
 
 
 class DatabaseManager:
     """Singleton для управления операциями с базой данных (JSON файлы).
 
     Ответственность:
-        - Безопасное чтение и запись JSON файлов
-        - Кеширование данных для производительности
-        - Потокобезопасные операции (с блокировками)
+        - Безопасное чтение и атомарная запись JSON файлов (временный файл
+          и os.replace, надежность — настройка "write_durability")
+        - Формат файлов — кодек из настройки "data_codec" (JSON, pickle,
+          marshal), при чтении формат определяется по заголовку файла
+        - Кеширование данных с проверкой актуальности файла
+          (mtime/size/inode): повторные чтения берутся из памяти,
+          внешние изменения файла подхватываются при следующем чтении
+        - Потокобезопасные операции: блокировка читатель–писатель на
+          каждый файл (параллельные чтения, монопольная запись), между
+          процессами — fcntl.flock на файле в директории "lock_dir"
+        - Межпроцессная проверка кеша по счетчику поколений файла:
+          запись в другом процессе сбрасывает кеш только этого файла
+        - Ограничение кеша по объему (настройка "cache_max_bytes"):
+          давно не использованные файлы вытесняются (LRU)
+        - Индексы теплого старта (infra.warmcache): новый процесс находит
+          запись крупного файла-списка по индексу на диске, не разбирая
+          весь файл, пока исходный файл не изменился
+        - Неизменяемые снимки для читателей (load) и изменяемые копии
+          для писателей (transaction, update)
+        - Атомарная запись нескольких файлов (save_many) через журнал
+          фиксации: после сбоя применяются все файлы или ни одного
         - Единая точка доступа к данным
+        - Операции с записями пользователей и портфелей через бэкенд
+          хранения (настройка "storage_backend")
+        - Журнал упреждающей записи для портфелей (настройка
+          "portfolio_wal"): изменения дописываются в журнал и пакетно
+          переносятся в бэкенд при контрольной точке
 
     Гарантия: В приложении существует ровно один экземпляр.
 
@@ -41,6 +91,14 @@ class DatabaseManager:
         ...     data.append({"user_id": 1, "username": "alice"})
         ...     return data
         >>> db.update("users.json", add_user)
+        >>> # Транзакция с изменяемой копией
+        >>> with db.transaction("users.json") as users:
+        ...     users.append({"user_id": 2, "username": "bob"})
+        >>> # Атомарная запись нескольких файлов
+        >>> db.save_many({"users.json": users, "portfolios/2.json": portfolio})
+        >>> # Операции с одной записью
+        >>> user = db.get_user_by_username("alice")
+        >>> portfolio = db.get_portfolio(user["user_id"])
     """
 
     # Единственный экземпляр класса
@@ -49,6 +107,12 @@ class DatabaseManager:
     # Флаг инициализации
     _initialized: bool = False
 
+    # Количество блокировок портфелей для журнала
+    _PORTFOLIO_STRIPES = 64
+
+    # Незафиксированный журнал старше этого возраста (сек) — остаток сбоя
+    _STALE_TXN_SECONDS = 3600
+
     def __new__(cls) -> "DatabaseManager":
         """Создать или вернуть единственный экземпляр класса.
 
@@ -70,15 +134,35 @@ class DatabaseManager:
         # Получаем настройки
         self._settings = get_settings()
 
-        # Блокировка для потокобезопасности
+        # Блокировка служебных структур (кеш, бэкенд)
         self._lock = threading.Lock()
 
-        # Кеш загруженных данных {filename: data}
-        self._cache: dict[str, Any] = {}
+        # LRU кеш загруженных данных: ключ — имя файла, тег — (сигнатура,
+        # поколение), стоимость — размер файла на диске
+        self._cache = LRUCache(self._settings.get("cache_max_bytes"))
 
         # Флаг использования кеша
         self._use_cache = True
 
+        # Бэкенд пользователей и портфелей (создается при первом обращении)
+        self._backend: "StorageBackend | None" = None
+
+        # Журнал портфелей (создается при первом обращении, если включен)
+        self._wal: "WriteAheadLog | None" = None
+        self._wal_lock = threading.Lock()
+
+        # Блокировки сравнения с обменом для журнала: портфель пользователя
+        # защищает блокировка user_id % _PORTFOLIO_STRIPES
+        self._portfolio_locks = [
+            threading.Lock() for _ in range(self._PORTFOLIO_STRIPES)
+        ]
+
+        # Номера журналов фиксации save_many() в процессе
+        self._txn_ids = itertools.count(1)
+
+        # Индексы теплого старта крупных файлов-списков
+        self._warm = WarmStartCache(self._settings.get("warm_cache_min_bytes", 0))
+
         # Помечаем как инициализированный
         self.__class__._initialized = True
 
@@ -99,19 +183,63 @@ class DatabaseManager:
         """
         return self._settings.get_data_path(filename)
 
+    def file_lock(self, filename: str) -> FileLock:
+        """Получить блокировку файла (потоки и процессы).
+
+        Блокировка реентерабельна, поэтому внутри write_locked() можно
+        вызывать load() и save() того же файла.
+
+        Args:
+            filename: Имя файла данных.
+
+        Returns:
+            Блокировка файла (одна и та же для одного имени).
+
+        Example:
+            >>> db = DatabaseManager()
+            >>> with db.file_lock("users.json").write_locked():
+            ...     users = db.load("users.json")
+            ...     db.save("users.json", users)
+        """
+        return get_file_lock(self.get_file_path(filename))
+
+    @staticmethod
+    def _signature(file_path: Path) -> tuple[int, int, int] | None:
+        """Сигнатура файла для проверки кеша: (mtime_ns, size, inode).
+
+        Returns:
+            Сигнатура или None, если файл не существует.
+        """
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
     def load(self, filename: str, use_cache: bool = True) -> Any:
-        """Загрузить данные из JSON файла.
+        """Загрузить неизменяемый снимок данных из JSON файла.
+
+        Снимок разделяется всеми читателями через кеш: словари в нем —
+        MappingProxyType, списки — tuple, поэтому изменить кеш через
+        результат нельзя и защитные копии при чтении не нужны. Для
+        изменения данных используйте transaction() или update().
+
+        Закешированные данные возвращаются, только если не изменились
+        ни сигнатура файла (mtime/size/inode), ни его поколение (счетчик,
+        который увеличивает каждая успешная запись, в том числе в другом
+        процессе).
 
         Args:
             filename: Имя файла данных.
             use_cache: Использовать кеш (по умолчанию True).
 
         Returns:
-            Данные из файла (list или dict).
+            Снимок данных файла (tuple или MappingProxyType).
 
         Raises:
             DataNotFoundError: Если файл не найден.
             json.JSONDecodeError: Если файл содержит невалидный JSON.
+            ValueError: Если файл двоичного формата поврежден.
 
         Example:
             >>> db = DatabaseManager()
@@ -119,25 +247,40 @@ class DatabaseManager:
             >>> print(len(users))
             2
         """
-        # Проверяем кеш
-        if use_cache and self._use_cache and filename in self._cache:
-            return self._cache[filename]
-
         file_path = self.get_file_path(filename)
 
-        # Проверяем существование файла
-        if not file_path.exists():
-            raise DataNotFoundError(filename)
+        lock = self.file_lock(filename)
+
+        # Читатели одного файла не блокируют друг друга
+        with lock.read_locked():
+            generation = lock.generation()
+            signature = self._signature(file_path)
+
+            # Проверяем существование файла
+            if signature is None:
+                self._cache.pop(filename)
+                raise DataNotFoundError(filename)
+
+            # Проверяем кеш
+            if use_cache and self._use_cache:
+                cached = self._cache.get(filename, (signature, generation))
+                if cached is not CACHE_MISS:
+                    return cached
 
-        # Загружаем данные с блокировкой
-        with self._lock:
             try:
-                with open(file_path, encoding="utf-8") as f:
-                    data = json.load(f)
+                with open(file_path, "rb") as f:
+                    # Сигнатура именно того файла, который читаем
+                    stat = os.fstat(f.fileno())
+                    payload = f.read()
+                data = codecs.decode_frozen(payload)
+                signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+                self._refresh_record_index(filename, data, signature, payload)
 
                 # Сохраняем в кеш
                 if self._use_cache:
-                    self._cache[filename] = data
+                    self._cache.put(
+                        filename, (signature, generation), data, stat.st_size
+                    )
 
                 return data
 
@@ -147,14 +290,37 @@ class DatabaseManager:
                     e.doc,
                     e.pos,
                 ) from e
+            except ValueError as e:
+                raise ValueError(f"Ошибка чтения файла {filename}: {e}") from e
+
+    def save(
+        self,
+        filename: str,
+        data: Any,
+        invalidate_cache: bool = True,
+        codec: str | None = None,
+    ) -> Any:
+        """Атомарно сохранить данные в JSON файл.
 
-    def save(self, filename: str, data: Any, invalidate_cache: bool = True) -> None:
-        """Сохранить данные в JSON файл.
+        Файл заменяется целиком через временный файл (infra.fileio),
+        поэтому читатели и процесс после сбоя не видят недописанный файл.
+        Формат — кодек из настройки "data_codec" (по умолчанию компактный
+        JSON) или явно указанный.
+
+        В кеш кладется неизменяемый снимок записанных данных, поэтому
+        дальнейшие изменения переданного объекта не влияют на кеш.
 
         Args:
             filename: Имя файла данных.
-            data: Данные для сохранения (должны быть JSON-сериализуемыми).
-            invalidate_cache: Очистить кеш после сохранения (по умолчанию True).
+            data: Данные для сохранения (JSON-сериализуемые, допускаются
+                снимки из load()).
+            invalidate_cache: Обновить кеш записанными данными (по умолчанию
+                True). Если False — кеш файла сбрасывается.
+            codec: Имя кодека (None — настройка "data_codec"); например,
+                "json" для файлов, которые читают внешние инструменты.
+
+        Returns:
+            Неизменяемый снимок записанных данных.
 
         Raises:
             TypeError: Если данные не могут быть сериализованы в JSON.
@@ -165,23 +331,288 @@ class DatabaseManager:
             >>> users = [{"user_id": 1, "username": "alice"}]
             >>> db.save("users.json", users)
         """
+        # Запись монопольна для файла (поколение увеличивается после записи)
+        with self.file_lock(filename).write_locked():
+            try:
+                return self._write_file(
+                    filename,
+                    codecs.encode(data, codec),
+                    freeze(data),
+                    invalidate_cache,
+                )
+            except (TypeError, OSError) as e:
+                # Состояние файла неизвестно — кеш больше не достоверен
+                self._cache.pop(filename)
+                raise OSError(f"Ошибка записи файла {filename}: {str(e)}") from e
+
+    def _write_file(
+        self,
+        filename: str,
+        payload: bytes,
+        snapshot: Any,
+        invalidate_cache: bool = True,
+    ) -> Any:
+        """Атомарно записать содержимое файла и обновить кеш.
+
+        Вызывается под блокировкой записи файла; после записи
+        увеличивает поколение файла.
+
+        Args:
+            filename: Имя файла данных.
+            payload: Сериализованное содержимое.
+            snapshot: Неизменяемый снимок тех же данных (кладется в кеш).
+            invalidate_cache: Обновить кеш (False — сбросить).
+
+        Returns:
+            Переданный снимок.
+        """
+        stat = atomic_write(self.get_file_path(filename), payload)
+        generation = self.file_lock(filename).bump_generation()
+        signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        self._refresh_record_index(filename, snapshot, signature, payload)
+
+        # Обновляем кеш с сигнатурой записанного файла
+        if invalidate_cache and self._use_cache:
+            tag = (signature, generation)
+            self._cache.put(filename, tag, snapshot, stat.st_size)
+        else:
+            self._cache.pop(filename)
+
+        return snapshot
+
+    # =========================================================================
+    # Warm start indexes
+    # =========================================================================
+
+    def register_record_index(self, filename: str, fields: Sequence[str]) -> None:
+        """Строить индекс теплого старта для файла-списка записей.
+
+        Индекс перестраивается при разборе или записи файла, если размер
+        файла не меньше "warm_cache_min_bytes".
+
+        Args:
+            filename: Имя файла данных (список словарей).
+            fields: Поля, по которым ищутся записи.
+
+        Example:
+            >>> db.register_record_index("users.json", ("username", "user_id"))
+        """
+        self._warm.register(filename, fields)
+
+    def record_index(self, filename: str) -> RecordIndex | None:
+        """Получить индекс теплого старта, соответствующий файлу.
+
+        Поиск по индексу не разбирает исходный файл, поэтому подходит для
+        первого обращения в новом процессе (запуск CLI).
+
+        Args:
+            filename: Имя файла данных.
+
+        Returns:
+            Индекс или None, если индекса нет, он устарел или выключен
+            настройкой "warm_cache" (тогда используйте load()).
+
+        Example:
+            >>> index = db.record_index("users.json")
+            >>> user = index.find("username", "alice") if index else None
+        """
+        if not self._settings.get("warm_cache", True):
+            return None
         file_path = self.get_file_path(filename)
+        index_path = self._record_index_path(filename)
+        with self.file_lock(filename).read_locked():
+            signature = self._signature(file_path)
+            if signature is None or not self._warm.accepts(filename, signature[1]):
+                return None
+            # Индекс может быть переподписан (записан) — под его блокировкой
+            with get_file_lock(index_path).write_locked():
+                return self._warm.index(index_path, signature, file_path)
+
+    def _refresh_record_index(
+        self,
+        filename: str,
+        snapshot: Any,
+        signature: tuple[int, int, int],
+        payload: bytes,
+    ) -> None:
+        """Перестроить индекс теплого старта по разобранному файлу.
+
+        Вызывается и из load() под блокировкой чтения исходного файла,
+        поэтому файл индекса пишется под собственной блокировкой записи
+        (порядок: исходный файл → индекс): одновременные читатели разных
+        процессов не перестраивают его одновременно.
+        """
+        if not self._settings.get("warm_cache", True) or not self._warm.accepts(
+            filename, signature[1]
+        ):
+            return
+        index_path = self._record_index_path(filename)
+        with get_file_lock(index_path).write_locked():
+            self._warm.refresh(filename, index_path, snapshot, signature, payload)
+
+    def _record_index_path(self, filename: str) -> Path:
+        """Путь файла индекса теплого старта (настройка "warm_cache_dir")."""
+        directory = self.get_file_path(self._settings.get("warm_cache_dir", ".cache"))
+        return directory / f"{filename}.idx"
+
+    # =========================================================================
+    # Multi-file transactions
+    # =========================================================================
+
+    def save_many(self, files: Mapping[str, Any]) -> dict[str, Any]:
+        """Атомарно сохранить несколько JSON файлов.
+
+        Новое содержимое всех файлов записывается в один журнал фиксации
+        (один fsync и одно переименование — точка фиксации), затем файлы
+        атомарно записываются на место, и журнал удаляется. Если процесс
+        упал после фиксации, recover_transactions() дописывает файлы из
+        журнала; до фиксации не меняется ни один файл. Файлы записываются
+        с уровнем надежности "write_durability", поэтому журнал удаляется,
+        только когда они сохранены с той же надежностью.
+
+        Блокировки записи файлов берутся в порядке сортировки имен, поэтому
+        одновременные save_many() с пересекающимися файлами не блокируют
+        друг друга навечно.
 
-        # Создаём директорию, если не существует
-        file_path.parent.mkdir(parents=True, exist_ok=True)
+        Args:
+            files: Словарь {имя файла: данные}.
 
-        # Сохраняем данные с блокировкой
-        with self._lock:
-            try:
-                with open(file_path, "w", encoding="utf-8") as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
+        Returns:
+            Словарь {имя файла: неизменяемый снимок записанных данных}.
+
+        Raises:
+            OSError: Если данные не сериализуются или запись не удалась.
 
-                # Обновляем кеш
-                if invalidate_cache and self._use_cache:
-                    self._cache[filename] = data
+        Example:
+            >>> db = DatabaseManager()
+            >>> snapshots = db.save_many(
+            ...     {
+            ...         "users.json": [*users, user],
+            ...         "portfolios/3.json": {"user_id": 3, "wallets": {}},
+            ...     }
+            ... )
+        """
+        names = sorted(files)
+        with ExitStack() as stack:
+            for name in names:
+                stack.enter_context(self.file_lock(name).write_locked())
 
+            try:
+                frozen = {name: freeze(files[name]) for name in names}
+                payloads = {name: codecs.encode(files[name]) for name in names}
+                journal = self._write_journal(payloads)
             except (TypeError, OSError) as e:
-                raise OSError(f"Ошибка записи файла {filename}: {str(e)}") from e
+                raise OSError(f"Ошибка фиксации файлов {names}: {str(e)}") from e
+
+            try:
+                snapshots = {
+                    name: self._write_file(name, payloads[name], frozen[name])
+                    for name in names
+                }
+            except OSError as e:
+                # Транзакция зафиксирована: файлы допишет recover_transactions()
+                for name in names:
+                    self._cache.pop(name)
+                raise OSError(f"Ошибка записи файлов {names}: {str(e)}") from e
+
+            journal.unlink()
+            return snapshots
+
+    def _txn_dir(self) -> Path:
+        """Директория журналов фиксации (настройка "txn_dir")."""
+        return self.get_file_path(self._settings.get("txn_dir", "txn"))
+
+    def _write_journal(self, payloads: dict[str, bytes]) -> Path:
+        """Записать и зафиксировать журнал save_many().
+
+        Формат журнала: строка JSON {"files": [[имя, длина], ...]}, затем
+        содержимое файлов подряд (в формате их кодека).
+
+        Args:
+            payloads: Словарь {имя файла: содержимое}.
+
+        Returns:
+            Путь к зафиксированному журналу.
+        """
+        # Имя упорядочивает журналы по времени фиксации
+        name = f"{time.time_ns():020d}-{os.getpid()}-{next(self._txn_ids)}"
+        journal_path = self._txn_dir() / f"{name}.journal"
+
+        files = [[filename, len(payload)] for filename, payload in payloads.items()]
+        header = json.dumps(
+            {"files": files},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        # Журнал — точка фиксации: fsync выполняется при любом уровне
+        atomic_write(
+            journal_path,
+            header.encode("utf-8") + b"\n" + b"".join(payloads.values()),
+            durability=stronger_durability("fsync", get_durability()),
+        )
+        return journal_path
+
+    @staticmethod
+    def _read_journal(journal_path: Path) -> dict[str, bytes]:
+        """Прочитать журнал save_many().
+
+        Returns:
+            Словарь {имя файла: содержимое}.
+        """
+        raw = journal_path.read_bytes()
+        header, _, body = raw.partition(b"\n")
+        payloads = {}
+        offset = 0
+        for name, length in json.loads(header)["files"]:
+            payloads[name] = body[offset : offset + length]
+            offset += length
+        return payloads
+
+    def recover_transactions(self) -> int:
+        """Дописать файлы из журналов фиксации, оставшихся после сбоя.
+
+        Вызывается при создании JSON бэкенда. Журнал, который в это время
+        применяет другой процесс, пропускается: он удаляется владельцем
+        под теми же блокировками файлов. Незафиксированные журналы (.tmp)
+        старше часа удаляются.
+
+        Returns:
+            Количество примененных журналов.
+        """
+        txn_dir = self._txn_dir()
+        if not txn_dir.is_dir():
+            return 0
+
+        now = time.time()
+        for tmp_path in txn_dir.glob("*.tmp"):
+            try:
+                if now - tmp_path.stat().st_mtime > self._STALE_TXN_SECONDS:
+                    tmp_path.unlink()
+            except FileNotFoundError:
+                continue
+
+        applied = 0
+        for journal_path in sorted(txn_dir.glob("*.journal")):
+            try:
+                payloads = self._read_journal(journal_path)
+            except FileNotFoundError:
+                continue
+
+            names = sorted(payloads)
+            with ExitStack() as stack:
+                for name in names:
+                    stack.enter_context(self.file_lock(name).write_locked())
+                if not journal_path.exists():
+                    continue
+                for name in names:
+                    payload = payloads[name]
+                    self._write_file(name, payload, codecs.decode_frozen(payload))
+                journal_path.unlink(missing_ok=True)
+            applied += 1
+
+        if applied:
+            logger.warning(f"Recovered {applied} interrupted multi-file transactions")
+        return applied
 
     def update(
         self, filename: str, updater: Callable[[Any], Any], use_cache: bool = True
@@ -189,7 +620,10 @@ class DatabaseManager:
         """Безопасное обновление данных (чтение → модификация → запись).
 
         Эта функция обеспечивает атомарность операции обновления
-        с использованием блокировки.
+        с использованием блокировки записи файла (реентерабельной,
+        поэтому вложенные load() и save() не блокируют сами себя).
+
+        Модификатор получает изменяемую копию данных.
 
         Args:
             filename: Имя файла данных.
@@ -197,7 +631,7 @@ class DatabaseManager:
             use_cache: Использовать кеш (по умолчанию True).
 
         Returns:
-            Обновлённые данные.
+            Неизменяемый снимок обновлённых данных.
 
         Raises:
             DataNotFoundError: Если файл не найден.
@@ -210,17 +644,51 @@ class DatabaseManager:
             ...     return users
             >>> updated_users = db.update("users.json", add_user)
         """
-        with self._lock:
-            # Загружаем данные
-            data = self.load(filename, use_cache=use_cache)
+        with self.file_lock(filename).write_locked():
+            # Загружаем изменяемую копию данных
+            data = thaw(self.load(filename, use_cache=use_cache))
 
             # Применяем модификатор
             updated_data = updater(data)
 
             # Сохраняем обновлённые данные
-            self.save(filename, updated_data, invalidate_cache=True)
+            return self.save(filename, updated_data, invalidate_cache=True)
+
+    @contextmanager
+    def transaction(self, filename: str, default: Any = None) -> Iterator[Any]:
+        """Транзакция записи: изменяемая копия данных с сохранением на выходе.
+
+        Весь блок выполняется под блокировкой записи файла. Данные
+        сохраняются только при успешном выходе из блока; при исключении
+        файл и кеш не меняются.
+
+        Args:
+            filename: Имя файла данных.
+            default: Начальные данные, если файла нет (None — файл обязателен).
+
+        Yields:
+            Изменяемая копия данных (dict или list), которую можно менять
+            на месте.
+
+        Raises:
+            DataNotFoundError: Если файла нет и default не задан.
+
+        Example:
+            >>> db = DatabaseManager()
+            >>> with db.transaction("users.json", default=[]) as users:
+            ...     users.append({"user_id": 3, "username": "charlie"})
+        """
+        with self.file_lock(filename).write_locked():
+            try:
+                data = thaw(self.load(filename))
+            except DataNotFoundError:
+                if default is None:
+                    raise
+                data = thaw(default)
 
-            return updated_data
+            yield data
+
+            self.save(filename, data)
 
     def clear_cache(self, filename: str | None = None) -> None:
         """Очистить кеш.
@@ -233,11 +701,10 @@ class DatabaseManager:
             >>> db.clear_cache("users.json")  # Очистить кеш для users.json
             >>> db.clear_cache()  # Очистить весь кеш
         """
-        with self._lock:
-            if filename is None:
-                self._cache.clear()
-            elif filename in self._cache:
-                del self._cache[filename]
+        if filename is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(filename)
 
     def set_cache_enabled(self, enabled: bool) -> None:
         """Включить/выключить использование кеша.
@@ -253,6 +720,40 @@ class DatabaseManager:
         if not enabled:
             self.clear_cache()
 
+    def set_cache_limit(self, max_bytes: int | None) -> None:
+        """Изменить бюджет кеша в байтах.
+
+        Args:
+            max_bytes: Бюджет (None — без ограничения). Лишние записи
+                вытесняются сразу.
+
+        Example:
+            >>> db = DatabaseManager()
+            >>> db.set_cache_limit(16 * 1024 * 1024)  # 16 MB
+        """
+        self._cache.set_max_bytes(max_bytes)
+
+    def cache_stats(self) -> dict[str, Any]:
+        """Получить статистику кеша.
+
+        Returns:
+            Словарь со счетчиками:
+            {
+                "entries": 3,            # файлов в кеше
+                "bytes": 10240,          # суммарный размер файлов
+                "max_bytes": 67108864,   # бюджет (None — без ограничения)
+                "hits": 120,             # попадания
+                "misses": 5,             # промахи (нет записи или файл изменился)
+                "evictions": 0           # вытеснения по бюджету
+            }
+
+        Example:
+            >>> db = DatabaseManager()
+            >>> db.cache_stats()["hits"]
+            120
+        """
+        return self._cache.stats()
+
     def file_exists(self, filename: str) -> bool:
         """Проверить существование файла.
 
@@ -270,13 +771,250 @@ class DatabaseManager:
         """
         return self.get_file_path(filename).exists()
 
+    # =========================================================================
+    # Records (users / portfolios)
+    # =========================================================================
+
+    @property
+    def backend(self) -> "StorageBackend":
+        """Бэкенд хранения пользователей и портфелей.
+
+        Создается при первом обращении по настройке "storage_backend".
+
+        Raises:
+            ValueError: Если в настройках указан неизвестный бэкенд.
+        """
+        if self._backend is None:
+            from valutatrade_hub.infra.backends import create_backend
+
+            # Создаем вне блокировки: импорт JSON в новую базу читает файлы
+            backend = create_backend(self)
+            with self._lock:
+                if self._backend is None:
+                    self._backend, backend = backend, None
+            if backend is not None:
+                backend.close()
+        return self._backend
+
+    def set_backend(self, backend: "StorageBackend | None") -> None:
+        """Заменить бэкенд хранения (None — пересоздать по настройкам).
+
+        Args:
+            backend: Экземпляр бэкенда или None.
+        """
+        # Накопленные в журнале изменения записываются в прежний бэкенд
+        self.checkpoint()
+        with self._lock:
+            previous, self._backend = self._backend, backend
+        if previous is not None and previous is not backend:
+            previous.close()
+
+    def get_user_by_username(self, username: str) -> Mapping[str, Any] | None:
+        """Найти запись пользователя по имени.
+
+        Args:
+            username: Имя пользователя.
+
+        Returns:
+            Запись пользователя или None, если не найден.
+        """
+        return self.backend.get_user_by_username(username)
+
+    def get_user_by_id(self, user_id: int) -> Mapping[str, Any] | None:
+        """Найти запись пользователя по ID.
+
+        Args:
+            user_id: ID пользователя.
+
+        Returns:
+            Запись пользователя или None, если не найден.
+        """
+        return self.backend.get_user_by_id(user_id)
+
+    def next_user_id(self) -> int:
+        """Получить следующий свободный user_id."""
+        return self.backend.next_user_id()
+
+    def add_user(self, record: dict[str, Any]) -> None:
+        """Добавить запись пользователя.
+
+        Args:
+            record: Запись пользователя (user_id, username, hashed_password,
+                salt, registration_date).
+
+        Raises:
+            UserAlreadyExistsError: Если имя пользователя занято.
+        """
+        self.backend.add_user(record)
+
+    def register_user(
+        self, user_record: dict[str, Any], portfolio_record: dict[str, Any]
+    ) -> int:
+        """Атомарно добавить пользователя вместе с его портфелем.
+
+        После сбоя не остается пользователя без портфеля: бэкенд сохраняет
+        обе записи одной транзакцией. Портфель записывается в бэкенд
+        напрямую, минуя журнал портфелей. Если user_id из
+        next_user_id() успела занять параллельная регистрация, бэкенд
+        выдает следующий свободный.
+
+        Args:
+            user_record: Запись пользователя.
+            portfolio_record: Запись нового портфеля.
+
+        Returns:
+            Итоговый user_id.
+
+        Raises:
+            UserAlreadyExistsError: Если имя пользователя занято.
+        """
+        return self.backend.register_user(user_record, portfolio_record)
+
+    def get_portfolio(self, user_id: int) -> Mapping[str, Any] | None:
+        """Найти запись портфеля пользователя.
+
+        Args:
+            user_id: ID пользователя.
+
+        Returns:
+            Запись портфеля {"user_id": ..., "version": ..., "wallets": {...}}
+            или None. Запись из журнала — неизменяемый снимок, как и
+            результат load(): изменить через нее образ журнала нельзя.
+        """
+        wal = self.portfolio_wal
+        if wal is not None:
+            record = wal.get(user_id)
+            if record is not None:
+                return freeze(record)
+        return self.backend.get_portfolio(user_id)
+
+    def save_portfolio(
+        self, record: dict[str, Any], expected_version: int | None = None
+    ) -> None:
+        """Создать или заменить запись портфеля.
+
+        При включенном журнале запись дописывается в журнал, а в бэкенд
+        попадает при контрольной точке. Проверка версии и добавление в
+        журнал выполняются под блокировкой портфеля, а ожидание fsync —
+        уже после ее снятия, поэтому блокировка не удерживается на время
+        групповой фиксации.
+
+        Args:
+            record: Запись портфеля {"user_id": ..., "version": ...,
+                "wallets": {...}} с уже увеличенной версией.
+            expected_version: Версия, прочитанная перед изменением
+                (None — записать без проверки).
+
+        Raises:
+            ConcurrentModificationError: Если портфель изменен другой
+                операцией после чтения.
+
+        Example:
+            >>> current = db.get_portfolio(1)
+            >>> version = current.get("version", 0)
+            >>> db.save_portfolio(
+            ...     {"user_id": 1, "version": version + 1, "wallets": {...}},
+            ...     expected_version=version,
+            ... )
+        """
+        wal = self.portfolio_wal
+        if wal is None:
+            self.backend.save_portfolio(record, expected_version)
+            return
+
+        from valutatrade_hub.infra.backends import check_portfolio_version
+
+        user_id = record["user_id"]
+        with self._portfolio_locks[user_id % self._PORTFOLIO_STRIPES]:
+            if expected_version is not None:
+                check_portfolio_version(
+                    user_id, expected_version, self.get_portfolio(user_id)
+                )
+            seq = wal.append(user_id, record, wait=False)
+        wal.wait_synced(seq)
+
+    # =========================================================================
+    # Portfolio WAL
+    # =========================================================================
+
+    @property
+    def portfolio_wal(self) -> "WriteAheadLog | None":
+        """Журнал портфелей или None, если он выключен.
+
+        Ключи настроек:
+            - portfolio_wal: Включить журнал (по умолчанию False)
+            - portfolio_wal_file: Имя файла журнала
+            - wal_flush_interval_ms: Максимальная задержка fsync группы
+            - wal_flush_ops: Размер группы для немедленного fsync
+            - wal_checkpoint_ops: Число записей между контрольными точками
+            - wal_sync_commit: Ждать fsync записи перед возвратом
+
+        При создании журнал воспроизводит записи, оставшиеся после сбоя,
+        а при завершении процесса выполняется контрольная точка.
+
+        Raises:
+            StorageError: Если журналом владеет другой процесс (журнал
+                рассчитан на один процесс-владелец, см. infra.wal).
+        """
+        if self._wal is None and self._settings.get("portfolio_wal", False):
+            from valutatrade_hub.infra.wal import WriteAheadLog
+
+            # Отдельная блокировка: воспроизведение журнала пишет в бэкенд
+            with self._wal_lock:
+                if self._wal is None:
+                    self._wal = WriteAheadLog(
+                        self.get_file_path(
+                            self._settings.get("portfolio_wal_file", "portfolios.wal")
+                        ),
+                        apply=self._apply_portfolios,
+                        flush_interval_ms=self._settings.get(
+                            "wal_flush_interval_ms", 10
+                        ),
+                        flush_ops=self._settings.get("wal_flush_ops", 64),
+                        checkpoint_ops=self._settings.get("wal_checkpoint_ops", 1000),
+                        sync_commit=self._settings.get("wal_sync_commit", True),
+                    )
+                    atexit.register(self.close_wal)
+        return self._wal
+
+    def _apply_portfolios(self, records: list[dict[str, Any]]) -> None:
+        """Записать образы портфелей из журнала в бэкенд."""
+        backend = self.backend
+        for record in records:
+            backend.save_portfolio(record)
+
+    def checkpoint(self) -> int:
+        """Перенести накопленные в журнале изменения в бэкенд.
+
+        Returns:
+            Количество записанных портфелей (0, если журнал выключен).
+
+        Example:
+            >>> db = DatabaseManager()
+            >>> db.checkpoint()
+            12
+        """
+        return self._wal.checkpoint() if self._wal is not None else 0
+
+    def close_wal(self) -> None:
+        """Выполнить контрольную точку и закрыть журнал портфелей."""
+        with self._wal_lock:
+            wal, self._wal = self._wal, None
+        if wal is not None:
+            wal.close()
+
     def __repr__(self) -> str:
         """Представление объекта для отладки."""
         data_path = self._settings.get_data_path()
-        cache_size = len(self._cache)
+        stats = self._cache.stats()
         return (
             f"DatabaseManager(data_path='{data_path}', "
-            f"cache_size={cache_size}, cache_enabled={self._use_cache})"
+            f"cache_size={stats['entries']}, cache_bytes={stats['bytes']}, "
+            f"cache_max_bytes={stats['max_bytes']}, cache_hits={stats['hits']}, "
+            f"cache_misses={stats['misses']}, "
+            f"cache_evictions={stats['evictions']}, "
+            f"cache_enabled={self._use_cache}, "
+            f"backend={self._settings.get('storage_backend', 'json')})"
         )
 
 
@@ -0,0 +1,220 @@
+"""Атомарная запись файлов данных.
+
+Все писатели файлов данных (DatabaseManager, журнал фиксации, журнал
+портфелей, хранилище Parser Service, файл сессии CLI) используют
+atomic_write: данные пишутся во временный файл рядом с целевым и
+подменяют его через os.replace, поэтому читатель и процесс после сбоя
+видят либо старое, либо новое содержимое, но не недописанный файл.
+Права доступа целевого файла сохраняются, новый файл получает обычные
+права с учетом umask: временный файл создается через os.open с правами
+0666, и umask применяет ядро (как у open()).
+
+Уровни надежности (настройка "write_durability"):
+    - "none"      — без fsync: максимальная скорость, при сбое питания
+                    последние записи могут потеряться
+    - "fsync"     — fsync временного файла перед переименованием
+                    (по умолчанию): содержимое на диске до подмены
+    - "fsync_dir" — дополнительно fsync директории после переименования:
+                    на диске и сама подмена файла
+
+JSON сериализуется компактно (без отступов); для файлов, которые удобно
+читать глазами, можно задать отступ настройкой "json_indent".
+"""
+
+import json
+import os
+import secrets
+import stat
+import time
+from pathlib import Path
+from typing import Any
+
+from valutatrade_hub.infra.settings import get_settings
+from valutatrade_hub.infra.snapshot import json_default
+
+# Уровни надежности записи по возрастанию
+DURABILITY_LEVELS = ("none", "fsync", "fsync_dir")
+
+# Попыток подобрать свободное имя временного файла
+_TEMP_ATTEMPTS = 100
+
+# Временный файл старше часа оставлен прерванной записью
+STALE_TEMP_SECONDS = 3600
+
+
+def get_durability() -> str:
+    """Уровень надежности записи из настроек ("write_durability")."""
+    return get_settings().get("write_durability", "fsync")
+
+
+def stronger_durability(*levels: str) -> str:
+    """Самый надежный из уровней.
+
+    Example:
+        >>> stronger_durability("none", "fsync")
+        'fsync'
+    """
+    return max(levels, key=_durability_rank)
+
+
+def _durability_rank(level: str) -> int:
+    """Номер уровня надежности.
+
+    Raises:
+        ValueError: Если уровень неизвестен.
+    """
+    try:
+        return DURABILITY_LEVELS.index(level)
+    except ValueError:
+        raise ValueError(
+            f"Unknown write durability '{level}', "
+            f"expected one of {', '.join(DURABILITY_LEVELS)}"
+        ) from None
+
+
+def encode_json(data: Any, indent: int | None = None) -> str:
+    """Сериализовать данные в текст JSON файла.
+
+    Args:
+        data: JSON-сериализуемые данные (допускаются снимки DatabaseManager).
+        indent: Отступ (None — из настройки "json_indent", по умолчанию
+            компактный JSON без пробелов).
+
+    Returns:
+        Текст JSON.
+
+    Raises:
+        TypeError: Если данные не сериализуются в JSON.
+    """
+    if indent is None:
+        indent = get_settings().get("json_indent")
+    if indent is None:
+        return json.dumps(
+            data, ensure_ascii=False, separators=(",", ":"), default=json_default
+        )
+    return json.dumps(data, ensure_ascii=False, indent=indent, default=json_default)
+
+
+def _create_temp(path: Path) -> tuple[int, Path]:
+    """Создать временный файл рядом с целевым.
+
+    Новый файл создается с правами 0666 (ядро применяет текущий umask),
+    затем получает права существующего целевого файла, если он есть.
+
+    Returns:
+        Дескриптор (открыт на запись) и путь временного файла.
+
+    Raises:
+        FileExistsError: Если не удалось подобрать свободное имя.
+        OSError: Если создание не удалось.
+    """
+    for _ in range(_TEMP_ATTEMPTS):
+        tmp_path = path.with_name(f".{path.name}.{secrets.token_hex(4)}.tmp")
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            continue
+        break
+    else:
+        raise FileExistsError(f"No free temporary file name for {path}")
+
+    try:
+        if hasattr(os, "fchmod"):  # нет в Windows
+            os.fchmod(fd, stat.S_IMODE(os.stat(path).st_mode))
+    except FileNotFoundError:
+        pass
+    except BaseException:
+        os.close(fd)
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return fd, tmp_path
+
+
+def atomic_write(
+    path: Path, payload: str | bytes, durability: str | None = None
+) -> os.stat_result:
+    """Атомарно заменить содержимое файла.
+
+    Args:
+        path: Путь к целевому файлу (директория создается при необходимости).
+        payload: Содержимое (str записывается в UTF-8).
+        durability: Уровень надежности (None — из настройки
+            "write_durability").
+
+    Returns:
+        Результат stat записанного файла (inode и mtime сохраняются при
+        переименовании, поэтому подходит для сигнатуры кеша).
+
+    Raises:
+        OSError: Если запись не удалась (временный файл удаляется).
+        ValueError: Если уровень надежности неизвестен.
+
+    Example:
+        >>> atomic_write(Path("data/rates.json"), encode_json(rates))
+        >>> atomic_write(Path("data/users.json"), text, durability="fsync_dir")
+    """
+    level = _durability_rank(durability or get_durability())
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = _create_temp(path)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            if level >= 1:
+                os.fsync(f.fileno())
+            result = os.fstat(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    if level >= 2:
+        _fsync_dir(path.parent)
+    return result
+
+
+def remove_stale_temp_files(
+    directory: Path, max_age_seconds: float = STALE_TEMP_SECONDS
+) -> int:
+    """Удалить временные файлы atomic_write, оставшиеся после сбоя.
+
+    Процесс, прерванный между созданием временного файла и os.replace
+    (например, завершенный во время записи), оставляет ".<имя>.<...>.tmp".
+    Удаляются только файлы старше max_age_seconds, чтобы не задеть
+    запись, которая идет прямо сейчас.
+
+    Args:
+        directory: Директория файлов данных (без обхода поддиректорий).
+        max_age_seconds: Минимальный возраст файла в секундах.
+
+    Returns:
+        Количество удаленных файлов.
+    """
+    if not directory.is_dir():
+        return 0
+
+    now = time.time()
+    removed = 0
+    for tmp_path in directory.glob(".*.tmp"):
+        try:
+            if now - tmp_path.stat().st_mtime > max_age_seconds:
+                tmp_path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+def _fsync_dir(directory: Path) -> None:
+    """fsync директории, чтобы переименование в ней попало на диск."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:  # Windows: директорию нельзя открыть
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
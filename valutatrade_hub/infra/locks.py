@@ -0,0 +1,382 @@
+"""Блокировки для многопоточного и многопроцессного доступа к данным.
+
+Модуль содержит реентерабельную блокировку читатель–писатель (RWLock):
+    - читать могут одновременно несколько потоков
+    - писатель получает монопольный доступ
+    - поток, держащий блокировку записи, может повторно взять
+      блокировку чтения или записи (например, update() → load() → save())
+    - поток, держащий блокировку чтения, может повторно взять чтение
+
+Ожидающий писатель блокирует новых читателей (кроме потоков, уже
+держащих чтение), поэтому поток чтений не может бесконечно
+откладывать запись.
+
+FileLock дополняет RWLock межпроцессной рекомендательной блокировкой
+fcntl.flock (разделяемой для чтения, монопольной для записи) на файле
+блокировки. Файлы блокировок лежат в одной директории "lock_dir" внутри
+директории данных (по умолчанию data/.locks) и повторяют структуру
+поддиректорий, а не соседствуют с файлами данных (см. lock_file_path).
+В том же файле хранится счетчик поколений: каждая успешная запись
+увеличивает его, поэтому другие процессы (CLI, RatesScheduler, пакетные
+задачи) по одному чтению нескольких байт узнают, что их кеш этого файла
+устарел. На платформах без fcntl (Windows) межпроцессная блокировка не
+выполняется, счетчик работает.
+"""
+
+import os
+import threading
+import weakref
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from valutatrade_hub.infra.settings import get_settings
+
+
+class RWLock:
+    """Реентерабельная блокировка читатель–писатель.
+
+    Повышение блокировки чтения до записи не поддерживается: два потока,
+    одновременно пытающиеся это сделать, ждали бы друг друга вечно.
+
+    Example:
+        >>> lock = RWLock()
+        >>> with lock.read_locked():
+        ...     data = load()
+        >>> with lock.write_locked():
+        ...     save(data)
+    """
+
+    def __init__(self) -> None:
+        """Создать свободную блокировку."""
+        self._cond = threading.Condition(threading.Lock())
+        self._readers: dict[int, int] = {}  # {ident потока: глубина чтения}
+        self._writer: int | None = None  # ident потока-писателя
+        self._write_depth = 0
+        self._writers_waiting = 0
+
+    # --- Чтение ---
+
+    def acquire_read(self) -> None:
+        """Взять блокировку чтения."""
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me or me in self._readers:
+                # Повторный вход: уже держим запись или чтение
+                self._readers[me] = self._readers.get(me, 0) + 1
+                return
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers[me] = 1
+
+    def release_read(self) -> None:
+        """Освободить блокировку чтения.
+
+        Raises:
+            RuntimeError: Если поток не держит блокировку чтения.
+        """
+        me = threading.get_ident()
+        with self._cond:
+            depth = self._readers.get(me)
+            if depth is None:
+                raise RuntimeError("release_read() without acquire_read()")
+            if depth == 1:
+                del self._readers[me]
+                if not self._readers:
+                    self._cond.notify_all()
+            else:
+                self._readers[me] = depth - 1
+
+    # --- Запись ---
+
+    def acquire_write(self) -> None:
+        """Взять блокировку записи.
+
+        Raises:
+            RuntimeError: Если поток держит только блокировку чтения
+                (повышение до записи не поддерживается).
+        """
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            if me in self._readers:
+                raise RuntimeError("Cannot upgrade a read lock to a write lock")
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self) -> None:
+        """Освободить блокировку записи.
+
+        Raises:
+            RuntimeError: Если поток не держит блокировку записи.
+        """
+        with self._cond:
+            if self._writer != threading.get_ident():
+                raise RuntimeError("release_write() without acquire_write()")
+            self._write_depth -= 1
+            if self._write_depth == 0:
+                self._writer = None
+                self._cond.notify_all()
+
+    def holds_read(self) -> bool:
+        """Держит ли текущий поток блокировку чтения."""
+        with self._cond:
+            return threading.get_ident() in self._readers
+
+    def holds_write(self) -> bool:
+        """Держит ли текущий поток блокировку записи."""
+        with self._cond:
+            return self._writer == threading.get_ident()
+
+    # --- Контекстные менеджеры ---
+
+    @contextmanager
+    def read_locked(self) -> Iterator[None]:
+        """Контекст с блокировкой чтения."""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self) -> Iterator[None]:
+        """Контекст с блокировкой записи."""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+    def __repr__(self) -> str:
+        """Представление блокировки для отладки."""
+        return (
+            f"RWLock(readers={len(self._readers)}, "
+            f"writer={self._writer is not None}, waiting={self._writers_waiting})"
+        )
+
+
+def lock_file_path(path: Path) -> Path:
+    """Путь к файлу блокировки и счетчика поколений файла данных.
+
+    Для файла в директории данных — тот же относительный путь с
+    суффиксом .lock в директории "lock_dir"; для файла вне директории
+    данных — в директории с тем же именем рядом с ним.
+
+    Args:
+        path: Путь к файлу данных.
+
+    Returns:
+        Путь к файлу блокировки.
+
+    Example:
+        >>> lock_file_path(Path("data/portfolios/42.json"))
+        PosixPath('/path/to/data/.locks/portfolios/42.json.lock')
+    """
+    settings = get_settings()
+    lock_dir = settings.get("lock_dir", ".locks")
+    data_dir = Path(os.path.abspath(settings.get_data_path()))
+    path = Path(os.path.abspath(path))
+    try:
+        relative = path.relative_to(data_dir)
+    except ValueError:
+        return path.parent / lock_dir / f"{path.name}.lock"
+    return data_dir / lock_dir / relative.with_name(f"{relative.name}.lock")
+
+
+class FileLock:
+    """Блокировка файла данных для потоков и процессов.
+
+    Внутри процесса — RWLock, между процессами — fcntl.flock на файле
+    блокировки в директории "lock_dir" (lock_file_path). Межпроцессная
+    блокировка берется только внешним (не вложенным) захватом, файл
+    блокировки открыт лишь пока она удерживается, поэтому тысячи шардов
+    не держат открытых дескрипторов.
+
+    Attributes:
+        path: Путь к файлу данных.
+        lock_path: Путь к файлу блокировки и счетчика поколений.
+
+    Example:
+        >>> lock = get_file_lock(Path("data/users.json"))
+        >>> with lock.read_locked():
+        ...     generation = lock.generation()
+        ...     data = read(path)
+        >>> with lock.write_locked():
+        ...     write(path, data)
+        ...     lock.bump_generation()  # только после успешной записи
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Создать блокировку для файла данных.
+
+        Args:
+            path: Путь к файлу данных.
+        """
+        self.path = path
+        self.lock_path = lock_file_path(path)
+        self._rw = RWLock()
+        self._mutex = threading.Lock()
+        self._fd: int | None = None
+        self._shared_holders = 0  # потоков процесса с разделяемой блокировкой
+
+    # --- Файл блокировки ---
+
+    def _open(self) -> int:
+        """Открыть файл блокировки (под _mutex)."""
+        if self._fd is None:
+            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        return self._fd
+
+    def _close(self) -> None:
+        """Закрыть файл блокировки, сняв flock (под _mutex)."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _read_generation(self, fd: int) -> int:
+        """Прочитать счетчик поколений из файла блокировки."""
+        os.lseek(fd, 0, os.SEEK_SET)
+        raw = os.read(fd, 32).strip()
+        return int(raw) if raw.isdigit() else 0
+
+    def generation(self) -> int:
+        """Текущее поколение файла (0, если файл еще не записывался).
+
+        Вызывается под read_locked() или write_locked(); вне блокировки
+        значение может устареть сразу после чтения.
+        """
+        with self._mutex:
+            if self._fd is not None:
+                return self._read_generation(self._fd)
+        try:
+            with open(self.lock_path, "rb") as f:
+                raw = f.read(32).strip()
+        except FileNotFoundError:
+            return 0
+        return int(raw) if raw.isdigit() else 0
+
+    # --- Разделяемая блокировка (чтение) ---
+
+    def _acquire_shared(self) -> None:
+        """Взять flock LOCK_SH первым читателем процесса."""
+        with self._mutex:
+            if self._shared_holders == 0:
+                fd = self._open()
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_SH)
+            self._shared_holders += 1
+
+    def _release_shared(self) -> None:
+        """Снять flock последним читателем процесса."""
+        with self._mutex:
+            self._shared_holders -= 1
+            if self._shared_holders == 0:
+                self._close()
+
+    @contextmanager
+    def read_locked(self) -> Iterator[None]:
+        """Контекст с блокировкой чтения (поток + процесс)."""
+        outer = not (self._rw.holds_write() or self._rw.holds_read())
+        with self._rw.read_locked():
+            if outer:
+                self._acquire_shared()
+            try:
+                yield
+            finally:
+                if outer:
+                    self._release_shared()
+
+    # --- Монопольная блокировка (запись) ---
+
+    @contextmanager
+    def write_locked(self) -> Iterator[None]:
+        """Контекст с блокировкой записи (поток + процесс).
+
+        Поколение не меняется: писатель вызывает bump_generation() после
+        успешной записи файла.
+        """
+        outer = not self._rw.holds_write()
+        with self._rw.write_locked():
+            if outer:
+                with self._mutex:
+                    fd = self._open()
+                    if fcntl is not None:
+                        fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if outer:
+                    with self._mutex:
+                        self._close()
+
+    def bump_generation(self) -> int:
+        """Увеличить счетчик поколений после успешной записи файла.
+
+        Неудачная запись или отказ от нее (например, конфликт версий) не
+        увеличивает поколение, поэтому кеши других процессов остаются
+        действительными.
+
+        Returns:
+            Новое поколение.
+
+        Raises:
+            RuntimeError: Если поток не держит блокировку записи.
+        """
+        if not self._rw.holds_write():
+            raise RuntimeError("bump_generation() without write_locked()")
+        with self._mutex:
+            fd = self._open()
+            generation = self._read_generation(fd) + 1
+            encoded = str(generation).encode()
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, encoded)
+            os.ftruncate(fd, len(encoded))
+        return generation
+
+    def __repr__(self) -> str:
+        """Представление блокировки для отладки."""
+        return f"FileLock(path='{self.path}', {self._rw!r})"
+
+
+# Реестр блокировок по абсолютному пути: один объект на файл в процессе,
+# пока он кем-то используется
+_file_locks: "weakref.WeakValueDictionary[str, FileLock]" = (
+    weakref.WeakValueDictionary()
+)
+_registry_lock = threading.Lock()
+
+
+def get_file_lock(path: Path) -> FileLock:
+    """Получить блокировку файла данных.
+
+    Для одного пути все модули процесса (DatabaseManager, storage
+    Parser Service) получают один и тот же объект.
+
+    Args:
+        path: Путь к файлу данных.
+
+    Returns:
+        Блокировка файла.
+    """
+    key = os.path.abspath(path)
+    with _registry_lock:
+        lock = _file_locks.get(key)
+        if lock is None:
+            lock = FileLock(Path(key))
+            _file_locks[key] = lock
+        return lock
@@ -0,0 +1,54 @@
+"""Формат файла курсов rates.json.
+
+Файл пишут Parser Service (формат пар) и core.utils.update_rates
+(старый формат), а читают книга курсов core.ratebook и
+parser_service.storage. Общая нормализация живет здесь, чтобы ни один
+из сервисов не зависел от другого:
+    - пары:
+      {"pairs": {"BTC_USD": {"rate": 95000.0, "updated_at": ..., ...}},
+       "last_refresh": ...}
+    - старый формат:
+      {"rates": {"BTC": 95000.0, ...}, "base_currency": "USD",
+       "updated_at": ...}
+"""
+
+from collections.abc import Mapping
+from typing import Any
+
+# Базовая валюта курсов (и старого формата по умолчанию)
+BASE_CURRENCY = "USD"
+
+
+def normalize_rates_data(
+    data: Mapping[str, Any], source: str = "migrated"
+) -> dict[str, Any]:
+    """Привести содержимое rates.json к формату пар.
+
+    Args:
+        data: Содержимое файла (формат пар или старый формат).
+        source: Источник для пар, полученных из старого формата.
+
+    Returns:
+        Новый словарь {"pairs": {...}, "last_refresh": ...}; пары
+        формата пар копируются, поэтому результат можно изменять.
+
+    Example:
+        >>> normalize_rates_data({"rates": {"EUR": 1.08}, "updated_at": "..."})
+        {"pairs": {"EUR_USD": {"rate": 1.08, "updated_at": "...", ...}}, ...}
+    """
+    if "pairs" in data or "rates" not in data:
+        pairs = {key: dict(pair) for key, pair in (data.get("pairs") or {}).items()}
+        return {"pairs": pairs, "last_refresh": data.get("last_refresh")}
+
+    base = data.get("base_currency", BASE_CURRENCY)
+    updated_at = data.get("updated_at")
+    pairs = {
+        f"{code}_{base}": {
+            "rate": float(rate),
+            "updated_at": updated_at,
+            "source": source,
+        }
+        for code, rate in data.get("rates", {}).items()
+        if code != base
+    }
+    return {"pairs": pairs, "last_refresh": updated_at}
@@ -29,6 +29,12 @@ class SettingsLoader:
     Ключи конфигурации:
         - data_dir: Путь к директории с данными (по умолчанию "data")
         - rates_ttl_seconds: Время жизни курсов в секундах (по умолчанию 3600)
+        - rates_background_refresh: Обновлять устаревшие курсы в фоне при
+          чтении (stale-while-revalidate, по умолчанию True)
+        - rates_refresh_cooldown_seconds: Минимальный интервал между
+          фоновыми обновлениями курсов в процессе (по умолчанию 60)
+        - rates_refresh_join_seconds: Сколько при выходе процесса ждать
+          начатого фонового обновления курсов (по умолчанию 10)
         - base_currency: Базовая валюта (по умолчанию "USD")
         - logs_dir: Путь к директории с логами (по умолчанию "logs")
         - log_level: Уровень логирования (по умолчанию "INFO")
@@ -36,9 +42,39 @@ class SettingsLoader:
         - max_log_size_mb: Максимальный размер лог-файла в MB
         - log_backup_count: Количество резервных копий логов
         - users_file: Имя файла с пользователями
-        - portfolios_file: Имя файла с портфелями
+        - portfolios_file: Имя файла с портфелями (старый формат, переносится
+          в portfolios_dir)
+        - portfolios_dir: Директория с файлами портфелей (<user_id>.json)
         - rates_file: Имя файла с курсами
         - session_file: Имя файла сессии
+        - cache_max_bytes: Бюджет кеша DatabaseManager в байтах по размеру
+          файлов на диске (по умолчанию 64 MB, null — без ограничения)
+        - storage_backend: Бэкенд пользователей и портфелей ("json" или "sqlite")
+        - sqlite_file: Имя файла базы sqlite (для storage_backend="sqlite")
+        - portfolio_wal: Журнал упреждающей записи для портфелей (по умолчанию
+          False)
+        - portfolio_wal_file: Имя файла журнала портфелей
+        - wal_flush_interval_ms: Максимальная задержка группового fsync журнала
+        - wal_flush_ops: Число записей, при котором fsync выполняется сразу
+        - wal_checkpoint_ops: Число записей между контрольными точками журнала
+        - wal_sync_commit: Ждать fsync записи журнала перед возвратом
+        - txn_dir: Директория журналов фиксации многофайловых транзакций
+        - lock_dir: Директория файлов блокировок и счетчиков поколений
+          файлов данных (по умолчанию ".locks")
+        - write_durability: Надежность записи файлов: "none" (без fsync),
+          "fsync" (fsync файла, по умолчанию) или "fsync_dir" (файла и
+          директории)
+        - json_indent: Отступ JSON в файлах данных (по умолчанию null —
+          компактный JSON)
+        - data_codec: Формат файлов данных: "json" (по умолчанию), "pickle"
+          или "marshal" (см. infra.codecs)
+        - data_codec_trusted: Небезопасные кодеки (pickle), которые
+          разрешено читать помимо "data_codec" (по умолчанию [])
+        - warm_cache: Индексы теплого старта — поиск записи крупного
+          users.json без разбора файла при запуске CLI (по умолчанию True)
+        - warm_cache_dir: Директория индексов теплого старта
+        - warm_cache_min_bytes: Минимальный размер файла для индекса
+          теплого старта (по умолчанию 256 KB)
 
     Пример использования:
         >>> settings = SettingsLoader()
@@ -82,6 +118,9 @@ class SettingsLoader:
         self._defaults: dict[str, Any] = {
             "data_dir": "data",
             "rates_ttl_seconds": 3600,
+            "rates_background_refresh": True,
+            "rates_refresh_cooldown_seconds": 60,
+            "rates_refresh_join_seconds": 10,
             "base_currency": "USD",
             "logs_dir": "logs",
             "log_level": "INFO",
@@ -90,8 +129,27 @@ class SettingsLoader:
             "log_backup_count": 5,
             "users_file": "users.json",
             "portfolios_file": "portfolios.json",
+            "portfolios_dir": "portfolios",
             "rates_file": "rates.json",
             "session_file": ".session",
+            "cache_max_bytes": 64 * 1024 * 1024,
+            "storage_backend": "json",
+            "sqlite_file": "valutatrade.db",
+            "portfolio_wal": False,
+            "portfolio_wal_file": "portfolios.wal",
+            "wal_flush_interval_ms": 10,
+            "wal_flush_ops": 64,
+            "wal_checkpoint_ops": 1000,
+            "wal_sync_commit": True,
+            "txn_dir": "txn",
+            "lock_dir": ".locks",
+            "write_durability": "fsync",
+            "json_indent": None,
+            "data_codec": "json",
+            "data_codec_trusted": [],
+            "warm_cache": True,
+            "warm_cache_dir": ".cache",
+            "warm_cache_min_bytes": 256 * 1024,
         }
 
         # Загрузка конфигурации
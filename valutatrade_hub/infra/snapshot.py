@@ -0,0 +1,107 @@
+"""Неизменяемые снимки данных JSON.
+
+DatabaseManager.load возвращает снимок, который разделяется всеми
+читателями через кеш, поэтому изменить его нельзя:
+    - dict → MappingProxyType (только чтение)
+    - list → tuple
+
+Снимок читается так же, как исходные данные (ключи, get(), items(),
+индексы, итерация), и сериализуется в JSON через json_default.
+Для изменения данных используется thaw() или
+DatabaseManager.transaction(), которые возвращают изменяемую копию.
+"""
+
+import json
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any
+
+
+# Неизменяемые скаляры JSON: копировать и замораживать не нужно
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def freeze(data: Any) -> Any:
+    """Построить неизменяемый снимок данных.
+
+    Уже замороженные словари (MappingProxyType) переиспользуются без
+    копирования, поэтому снимок списка, в который добавлена одна
+    запись, строится без обхода остальных записей.
+
+    Args:
+        data: Данные JSON (dict, list, скаляры).
+
+    Returns:
+        Снимок: MappingProxyType вместо dict, tuple вместо list.
+    """
+    kind = type(data)
+    if kind in _SCALARS or kind is MappingProxyType:
+        return data
+    # Проверка точного типа значения до вызова: большинство значений —
+    # скаляры, и рекурсивный вызов для них дороже самой проверки
+    if kind is dict or isinstance(data, dict):
+        return MappingProxyType(
+            {k: v if type(v) in _SCALARS else freeze(v) for k, v in data.items()}
+        )
+    if kind is list or kind is tuple or isinstance(data, (list, tuple)):
+        return tuple([v if type(v) in _SCALARS else freeze(v) for v in data])
+    return data
+
+
+def thaw(data: Any) -> Any:
+    """Получить изменяемую глубокую копию снимка.
+
+    Args:
+        data: Снимок или обычные данные JSON.
+
+    Returns:
+        Данные из dict и list, не связанные со снимком.
+    """
+    kind = type(data)
+    if kind in _SCALARS:
+        return data
+    if kind is MappingProxyType or kind is dict or isinstance(data, Mapping):
+        return {k: v if type(v) in _SCALARS else thaw(v) for k, v in data.items()}
+    if kind is tuple or kind is list or isinstance(data, (list, tuple)):
+        return [v if type(v) in _SCALARS else thaw(v) for v in data]
+    return data
+
+
+def loads_frozen(payload: str | bytes) -> Any:
+    """Разобрать JSON сразу в виде снимка.
+
+    Словари замораживаются при разборе (object_hook), поэтому снимок
+    не требует отдельного обхода данных; досматриваются только списки.
+
+    Args:
+        payload: Текст JSON (str или UTF-8 bytes).
+
+    Returns:
+        Снимок данных.
+
+    Raises:
+        json.JSONDecodeError: Если JSON невалиден.
+    """
+    return _freeze_lists(json.loads(payload, object_hook=_frozen_object))
+
+
+def json_default(obj: Any) -> Any:
+    """Сериализация снимков для json.dump(default=json_default)."""
+    if isinstance(obj, MappingProxyType):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _frozen_object(pairs: dict[str, Any]) -> MappingProxyType:
+    """object_hook: заморозить словарь и списки в его значениях."""
+    for key, value in pairs.items():
+        if type(value) is list:
+            pairs[key] = _freeze_lists(value)
+    return MappingProxyType(pairs)
+
+
+def _freeze_lists(value: Any) -> Any:
+    """Заменить list на tuple (словари уже заморожены object_hook)."""
+    if type(value) is list:
+        return tuple(_freeze_lists(v) for v in value)
+    return value
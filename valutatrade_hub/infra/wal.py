@@ -0,0 +1,392 @@
+"""Журнал упреждающей записи (WAL) для портфелей.
+
+Изменение портфеля дописывается в журнал одной компактной строкой JSON
+с образом портфеля после операции, а основное хранилище (бэкенд)
+обновляется пакетно при контрольной точке (checkpoint):
+
+    deposit/withdraw/buy/sell → append() → portfolios.wal
+                                   ↓ каждые wal_checkpoint_ops записей
+                              бэкенд хранения (шарды JSON / sqlite)
+
+fsync журнала выполняется группами (group commit): фоновый поток
+сбрасывает накопленные записи раз в wal_flush_interval_ms, а при
+накоплении wal_flush_ops записей сброс выполняется сразу. В режиме
+синхронной фиксации append() возвращается только после fsync своей
+записи, поэтому одновременные операции разных потоков делят один fsync.
+
+Запись журнала хранит полный образ портфеля (а не разность), поэтому
+повторное применение идемпотентно и не зависит от состояния бэкенда:
+после сбоя журнал воспроизводится при открытии, недописанная последняя
+строка отбрасывается. Образ портфеля невелик (кошельки пользователя),
+а компактность строки обеспечивает JSON без пробелов. В памяти журнал
+держит неизменяемые снимки образов (infra.snapshot), а не объекты
+вызывающего.
+
+Контрольная точка выполняется фоновым потоком журнала, поэтому append()
+не переписывает хранилище на потоке вызывающего (и под его
+блокировками).
+
+Журнал рассчитан на один процесс-владелец (например, сервер или
+демон): образы, ожидающие контрольной точки, есть только в памяти
+владельца, поэтому запись в обход него потерялась бы при следующей
+контрольной точке. При открытии журнал берет монопольную неблокирующую
+блокировку fcntl.flock на своем файле блокировки (lock_file_path, не
+на самом журнале — он заменяется при контрольной точке) и держит ее до
+close(); если журналом уже владеет другой процесс, конструктор
+завершается ошибкой StorageError. На платформах без fcntl (Windows)
+владение не проверяется.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Mapping
+from pathlib import Path
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from valutatrade_hub.core.exceptions import StorageError
+from valutatrade_hub.infra.fileio import (
+    atomic_write,
+    get_durability,
+    stronger_durability,
+)
+from valutatrade_hub.infra.locks import lock_file_path
+from valutatrade_hub.infra.snapshot import freeze, json_default, thaw
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class WriteAheadLog:
+    """Журнал упреждающей записи с групповой фиксацией.
+
+    Attributes:
+        path: Путь к файлу журнала.
+
+    Example:
+        >>> wal = WriteAheadLog(Path("data/portfolios.wal"), apply=save_all)
+        >>> wal.append(1, {"user_id": 1, "wallets": {"USD": {"balance": 90.0}}})
+        >>> wal.get(1)
+        mappingproxy({'user_id': 1, 'wallets': ...})
+        >>> wal.close()  # fsync + checkpoint
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        apply: Callable[[list[dict[str, Any]]], None],
+        flush_interval_ms: int = 10,
+        flush_ops: int = 64,
+        checkpoint_ops: int = 1000,
+        sync_commit: bool = True,
+    ) -> None:
+        """Открыть журнал и воспроизвести записи, оставшиеся после сбоя.
+
+        Args:
+            path: Путь к файлу журнала.
+            apply: Функция записи образов в основное хранилище
+                (вызывается при контрольной точке с изменяемыми копиями).
+            flush_interval_ms: Максимальная задержка fsync группы записей.
+            flush_ops: Размер группы, при котором fsync выполняется сразу.
+            checkpoint_ops: Число записей между контрольными точками.
+            sync_commit: Ждать fsync своей записи в append()
+                (False — при сбое теряется не более flush_interval_ms).
+
+        Raises:
+            StorageError: Если журналом владеет другой процесс.
+        """
+        self.path = path
+        self._apply = apply
+        self._flush_interval = flush_interval_ms / 1000
+        self._flush_ops = max(1, flush_ops)
+        self._checkpoint_ops = max(1, checkpoint_ops)
+        self._sync_commit = sync_commit
+
+        # Порядок захвата: _io_lock → _cond
+        self._io_lock = threading.Lock()
+        self._cond = threading.Condition()
+
+        # Снимки образов, еще не записанные в основное хранилище
+        self._pending: dict[Any, Mapping[str, Any]] = {}
+        self._seq = 0  # номер последней записи в журнале
+        self._synced = 0  # номер последней записи после fsync
+        self._since_checkpoint = 0
+        self._checkpoint_requested = False
+        self._closed = False
+        self._flusher: threading.Thread | None = None
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._owner_fd = self._acquire_ownership()
+        try:
+            replayed = self._replay()
+            self._file = open(path, "ab")
+        except BaseException:
+            self._release_ownership()
+            raise
+
+        if replayed or path.stat().st_size:
+            logger.info(f"Replaying {replayed} WAL records from {path.name}")
+            self.checkpoint()
+
+    # --- Владение ---
+
+    def _acquire_ownership(self) -> int | None:
+        """Взять монопольную блокировку журнала (без ожидания).
+
+        Returns:
+            Дескриптор файла блокировки (None без fcntl).
+
+        Raises:
+            StorageError: Если журналом владеет другой процесс.
+        """
+        if fcntl is None:
+            return None
+        lock_path = lock_file_path(self.path)
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise StorageError(
+                f"WAL {self.path.name} is owned by another process; "
+                "stop it or disable portfolio_wal for this one"
+            ) from None
+        return fd
+
+    def _release_ownership(self) -> None:
+        """Освободить блокировку журнала."""
+        fd, self._owner_fd = self._owner_fd, None
+        if fd is not None:
+            os.close(fd)
+
+    # --- Воспроизведение ---
+
+    def _replay(self) -> int:
+        """Загрузить записи журнала в _pending.
+
+        Returns:
+            Количество воспроизведенных записей.
+        """
+        try:
+            data = self.path.read_bytes()
+        except FileNotFoundError:
+            return 0
+
+        count = 0
+        for line in data.split(b"\n"):
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Недописанная строка при сбое — конец журнала
+                break
+            self._pending[entry["key"]] = freeze(entry["record"])
+            self._seq = self._synced = entry["seq"]
+            count += 1
+        return count
+
+    # --- Запись ---
+
+    def get(self, key: Any) -> Mapping[str, Any] | None:
+        """Последний образ по ключу, еще не записанный в хранилище.
+
+        Returns:
+            Неизменяемый снимок образа или None.
+        """
+        with self._cond:
+            return self._pending.get(key)
+
+    def append(self, key: Any, record: dict[str, Any], wait: bool = True) -> int:
+        """Дописать образ записи в журнал.
+
+        Args:
+            key: Ключ записи (user_id).
+            record: Полный образ записи после изменения (журнал хранит
+                его снимок, дальнейшие изменения record не влияют на журнал).
+            wait: Ждать fsync записи (при sync_commit). False — вызывающий
+                сам ждет через wait_synced(), например, после снятия своей
+                блокировки.
+
+        Returns:
+            Номер записи в журнале.
+
+        Raises:
+            RuntimeError: Если журнал закрыт.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"WAL {self.path.name} is closed")
+            self._seq += 1
+            seq = self._seq
+            entry = {"seq": seq, "key": key, "record": record}
+            self._file.write(_encode_entry(entry))
+            self._pending[key] = freeze(record)
+            self._since_checkpoint += 1
+
+            sync_now = seq - self._synced >= self._flush_ops
+            if self._since_checkpoint >= self._checkpoint_ops:
+                # Контрольную точку выполнит фоновый поток
+                self._checkpoint_requested = True
+            if not sync_now or self._checkpoint_requested:
+                self._start_flusher()
+                self._cond.notify_all()
+
+        if sync_now:
+            self._sync()
+        if wait:
+            self.wait_synced(seq)
+        return seq
+
+    def wait_synced(self, seq: int) -> None:
+        """Дождаться fsync записи с номером seq (только при sync_commit)."""
+        if not self._sync_commit:
+            return
+        with self._cond:
+            while self._synced < seq and not self._closed:
+                self._cond.wait()
+
+    def _start_flusher(self) -> None:
+        """Запустить фоновый поток fsync (вызывается под _cond)."""
+        if self._flusher is None:
+            self._flusher = threading.Thread(
+                target=self._run_flusher, name="wal-flusher", daemon=True
+            )
+            self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        """Цикл фонового потока: fsync групп записей и контрольные точки."""
+        while True:
+            with self._cond:
+                while (
+                    not self._closed
+                    and self._synced >= self._seq
+                    and not self._checkpoint_requested
+                ):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                checkpoint_due = self._checkpoint_requested
+            if not checkpoint_due:
+                # Даем группе накопиться
+                time.sleep(self._flush_interval)
+                self._sync()
+                continue
+            try:
+                self.checkpoint()
+            except Exception as e:
+                # Записи остаются в журнале до следующей контрольной точки
+                logger.error(f"WAL checkpoint failed: {e}", exc_info=True)
+
+    def _sync(self) -> None:
+        """fsync всех записанных строк журнала."""
+        with self._io_lock:
+            with self._cond:
+                target = self._seq
+                if target <= self._synced:
+                    return
+                self._file.flush()
+                fd = self._file.fileno()
+            # Новые записи продолжают добавляться во время fsync
+            os.fsync(fd)
+            with self._cond:
+                self._synced = max(self._synced, target)
+                self._cond.notify_all()
+
+    # --- Контрольная точка ---
+
+    def checkpoint(self) -> int:
+        """Записать накопленные образы в хранилище и сократить журнал.
+
+        Если apply() бросает исключение, журнал не изменяется и записи
+        остаются в нем до следующей попытки.
+
+        Returns:
+            Количество записанных в хранилище образов.
+        """
+        with self._io_lock:
+            with self._cond:
+                self._checkpoint_requested = False
+                records = dict(self._pending)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._synced = self._seq
+                self._cond.notify_all()
+
+            if records:
+                self._apply([thaw(record) for record in records.values()])
+
+            with self._cond:
+                # Образы, замененные во время apply(), остаются в журнале
+                for key, record in records.items():
+                    if self._pending.get(key) is record:
+                        del self._pending[key]
+                self._rewrite_locked()
+                self._since_checkpoint = len(self._pending)
+
+        if records:
+            logger.debug(f"WAL checkpoint: {len(records)} records applied")
+        return len(records)
+
+    def _rewrite_locked(self) -> None:
+        """Заменить журнал оставшимися записями (под _io_lock и _cond)."""
+        payload = b"".join(
+            _encode_entry({"seq": self._seq, "key": key, "record": record})
+            for key, record in self._pending.items()
+        )
+        # Записи журнала должны пережить сбой при любом уровне надежности
+        atomic_write(
+            self.path,
+            payload,
+            durability=stronger_durability("fsync", get_durability()),
+        )
+        self._file.close()
+        self._file = open(self.path, "ab")
+        self._synced = self._seq
+        self._cond.notify_all()
+
+    # --- Закрытие ---
+
+    def close(self) -> None:
+        """Остановить фоновый поток, выполнить контрольную точку и закрыть файл."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+        try:
+            self.checkpoint()
+        finally:
+            with self._io_lock:
+                self._file.close()
+            self._release_ownership()
+
+    def __len__(self) -> int:
+        """Количество образов, ожидающих контрольной точки."""
+        with self._cond:
+            return len(self._pending)
+
+    def __repr__(self) -> str:
+        """Представление журнала для отладки."""
+        return (
+            f"WriteAheadLog(path='{self.path}', pending={len(self)}, "
+            f"seq={self._seq}, synced={self._synced})"
+        )
+
+
+def _encode_entry(entry: dict[str, Any]) -> bytes:
+    """Строка журнала: компактный JSON и перевод строки."""
+    encoded = json.dumps(
+        entry, ensure_ascii=False, separators=(",", ":"), default=json_default
+    )
+    return encoded.encode() + b"\n"
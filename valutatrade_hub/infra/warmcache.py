@@ -0,0 +1,417 @@
+"""Кеш теплого старта: индексы записей файлов данных на диске.
+
+Каждый запуск CLI — новый процесс, поэтому кеш DatabaseManager в памяти
+пуст, и для поиска одного пользователя приходится разбирать весь
+users.json. Кеш теплого старта хранит рядом с данными (директория —
+настройка "warm_cache_dir") индекс файла-списка записей:
+    - каждая запись отдельно сериализована (marshal)
+    - по каждому индексируемому полю — номера записей, упорядоченные по
+      значению поля, для двоичного поиска
+    - максимум числовых полей (например, для следующего user_id)
+
+Файл индекса открывается через mmap, поэтому поиск записи читает с
+диска только несколько страниц таблицы и саму запись — время не зависит
+от размера исходного файла.
+
+Индекс привязан к исходному файлу:
+    - сигнатура (mtime_ns, size, inode) совпала — индекс актуален
+    - сигнатура другая, но размер тот же (touch, восстановление из
+      копии) — сравнивается хеш содержимого (BLAKE2b), и при совпадении
+      индекс переиспользуется с новой сигнатурой
+    - иначе индексом не пользуются; DatabaseManager перестраивает его
+      при следующем разборе или записи файла
+
+Индекс — только ускорение: поврежденный или недоступный файл индекса
+считается промахом, запись выполняется без fsync.
+
+Индексируются только крупные файлы-списки записей (users.json). Портфели
+хранятся по файлу на пользователя и читаются целиком, а rates.json —
+небольшой словарь пар, который книга курсов все равно разбирает целиком,
+поэтому индекс им не нужен.
+"""
+
+import hashlib
+import json
+import logging
+import marshal
+import mmap
+import struct
+import threading
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+from valutatrade_hub.infra.fileio import atomic_write
+from valutatrade_hub.infra.snapshot import freeze, thaw
+
+logger = logging.getLogger(__name__)
+
+# Заголовок файла индекса (формат 1), за ним длина заголовка JSON
+INDEX_MAGIC = b"\x00VTX1"
+_HEADER_LEN = struct.Struct("<I")
+
+# Элемент таблицы поля: номер записи
+_KEY_ENTRY = struct.Struct("<I")
+
+# Элемент таблицы записей: (смещение в области записей, длина)
+_RECORD_ENTRY = struct.Struct("<QI")
+
+
+def content_digest(payload: bytes) -> str:
+    """Хеш содержимого исходного файла (BLAKE2b, 128 бит)."""
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def _sort_key(value: Any) -> tuple[str, Any]:
+    """Ключ упорядочивания значений поля (разные типы не сравниваются)."""
+    return type(value).__name__, value
+
+
+class RecordIndex:
+    """Открытый (mmap) индекс файла-списка записей.
+
+    Attributes:
+        signature: Сигнатура исходного файла (mtime_ns, size, inode).
+        digest: Хеш содержимого исходного файла.
+        count: Количество записей.
+
+    Example:
+        >>> index = RecordIndex.open(Path("data/.cache/users.json.idx"))
+        >>> index.find("username", "alice")
+        mappingproxy({'user_id': 1, 'username': 'alice', ...})
+        >>> index.max_value("user_id")
+        2
+    """
+
+    def __init__(self, mm: mmap.mmap, header: dict[str, Any]) -> None:
+        """Создать индекс по отображенному файлу (используйте open()).
+
+        Args:
+            mm: Отображение файла индекса.
+            header: Заголовок, base — смещение начала секций.
+        """
+        self._mm = mm
+        self._header = header
+        base = header["base"]
+        self._fields: dict[str, dict[str, Any]] = {
+            field: {**spec, "offset": base + spec["offset"]}
+            for field, spec in header["fields"].items()
+        }
+        self._table = base + header["table"]
+        self._blob = base + header["blob"]
+        self.signature: tuple[int, int, int] = tuple(header["signature"])
+        self.digest: str = header["digest"]
+        self.count: int = header["count"]
+
+    @classmethod
+    def open(cls, path: Path) -> "RecordIndex | None":
+        """Открыть файл индекса.
+
+        Returns:
+            Индекс или None, если файла нет или он поврежден.
+        """
+        try:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            if mm[: len(INDEX_MAGIC)] != INDEX_MAGIC:
+                raise ValueError("bad magic")
+            start = len(INDEX_MAGIC) + _HEADER_LEN.size
+            (length,) = _HEADER_LEN.unpack_from(mm, len(INDEX_MAGIC))
+            header = json.loads(mm[start : start + length])
+            return cls(mm, {**header, "base": start + length})
+        except (ValueError, KeyError, struct.error) as e:
+            logger.debug(f"Ignoring corrupted record index {path}: {e}")
+            mm.close()
+            return None
+
+    def fields(self) -> tuple[str, ...]:
+        """Индексируемые поля."""
+        return tuple(self._fields)
+
+    def find(self, field: str, value: Any) -> Mapping[str, Any] | None:
+        """Найти запись по значению поля.
+
+        Args:
+            field: Индексируемое поле.
+            value: Значение поля.
+
+        Returns:
+            Неизменяемый снимок записи или None, если записи нет.
+
+        Raises:
+            KeyError: Если поле не индексировано.
+        """
+        base = self._fields[field]["offset"]
+        key = _sort_key(value)
+
+        # Двоичный поиск: значение поля берется из записи по ее номеру
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            (number,) = _KEY_ENTRY.unpack_from(self._mm, base + mid * _KEY_ENTRY.size)
+            record = self._record(number)
+            current = _sort_key(record.get(field))
+            if current == key:
+                return freeze(record)
+            if current < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def max_value(self, field: str) -> Any:
+        """Максимум числового поля по всем записям (None — нет записей).
+
+        Raises:
+            KeyError: Если поле не индексировано.
+        """
+        return self._fields[field]["max"]
+
+    def _record(self, number: int) -> dict[str, Any]:
+        """Прочитать запись по номеру."""
+        offset, length = _RECORD_ENTRY.unpack_from(
+            self._mm, self._table + number * _RECORD_ENTRY.size
+        )
+        start = self._blob + offset
+        return marshal.loads(self._mm[start : start + length])
+
+    def rewrite_signature(
+        self, path: Path, signature: tuple[int, int, int]
+    ) -> None:
+        """Записать индекс с той же таблицей и новой сигнатурой источника.
+
+        Raises:
+            OSError: Если запись не удалась.
+        """
+        header = {**self._header, "signature": list(signature)}
+        body = self._mm[header.pop("base") :]
+        encoded = json.dumps(header).encode()
+        atomic_write(
+            path,
+            INDEX_MAGIC + _HEADER_LEN.pack(len(encoded)) + encoded + body,
+            durability="none",
+        )
+
+    def close(self) -> None:
+        """Закрыть отображение файла индекса."""
+        self._mm.close()
+
+    def __repr__(self) -> str:
+        """Представление индекса для отладки."""
+        return f"RecordIndex(count={self.count}, fields={list(self._fields)})"
+
+
+def write_record_index(
+    path: Path,
+    records: Sequence[Mapping[str, Any]],
+    fields: Sequence[str],
+    signature: tuple[int, int, int],
+    digest: str,
+) -> None:
+    """Построить и атомарно записать индекс файла-списка записей.
+
+    Args:
+        path: Путь к файлу индекса.
+        records: Записи исходного файла (снимок или обычные dict).
+        fields: Индексируемые поля.
+        signature: Сигнатура исходного файла.
+        digest: Хеш содержимого исходного файла.
+
+    Raises:
+        ValueError: Если запись содержит значения, которые marshal не
+            сериализует.
+        OSError: Если запись файла не удалась.
+    """
+    blobs = [marshal.dumps(thaw(record)) for record in records]
+
+    table = bytearray()
+    offset = 0
+    for blob in blobs:
+        table += _RECORD_ENTRY.pack(offset, len(blob))
+        offset += len(blob)
+
+    sections: dict[str, bytes] = {}
+    maxima: dict[str, Any] = {}
+    for field in fields:
+        values = [record.get(field) for record in records]
+        order = sorted(range(len(values)), key=lambda n: _sort_key(values[n]))
+        sections[field] = struct.pack(f"<{len(order)}I", *order)
+        maxima[field] = max((v for v in values if isinstance(v, int)), default=None)
+
+    # Смещения секций — от конца заголовка
+    header: dict[str, Any] = {
+        "signature": list(signature),
+        "digest": digest,
+        "count": len(records),
+        "fields": {},
+    }
+    position = 0
+    for field in fields:
+        header["fields"][field] = {"offset": position, "max": maxima[field]}
+        position += len(sections[field])
+    header["table"] = position
+    header["blob"] = position + len(table)
+    encoded = json.dumps(header).encode()
+
+    payload = b"".join(
+        [
+            INDEX_MAGIC,
+            _HEADER_LEN.pack(len(encoded)),
+            encoded,
+            *(sections[field] for field in fields),
+            bytes(table),
+            *blobs,
+        ]
+    )
+    atomic_write(path, payload, durability="none")
+
+
+class WarmStartCache:
+    """Индексы теплого старта файлов данных (используется DatabaseManager).
+
+    Файлы, для которых строится индекс, и их поля регистрирует владелец
+    данных (например, JsonBackend для users.json). Открытые индексы
+    переиспользуются, пока не изменилась сигнатура исходного файла;
+    замененный индекс закрывается (освобождается mmap), поэтому индекс
+    из index() используется сразу и не сохраняется вызывающим.
+
+    Example:
+        >>> warm = WarmStartCache(min_bytes=256 * 1024)
+        >>> warm.register("users.json", ("username", "user_id"))
+        >>> index = warm.index(index_path, signature, source_path)
+    """
+
+    def __init__(self, min_bytes: int = 0) -> None:
+        """Создать кеш.
+
+        Args:
+            min_bytes: Минимальный размер исходного файла для индекса.
+        """
+        self.min_bytes = min_bytes
+        self._fields: dict[str, tuple[str, ...]] = {}
+        self._open: dict[Path, RecordIndex] = {}
+        self._lock = threading.Lock()
+
+    def register(self, filename: str, fields: Sequence[str]) -> None:
+        """Строить индекс файла-списка записей по полям.
+
+        Args:
+            filename: Имя файла данных.
+            fields: Индексируемые поля.
+        """
+        self._fields[filename] = tuple(fields)
+
+    def accepts(self, filename: str, size: int) -> bool:
+        """Строится ли индекс для файла такого размера."""
+        return filename in self._fields and size >= self.min_bytes
+
+    def index(
+        self, path: Path, signature: tuple[int, int, int], source: Path
+    ) -> RecordIndex | None:
+        """Получить актуальный индекс исходного файла.
+
+        Args:
+            path: Путь к файлу индекса.
+            signature: Текущая сигнатура исходного файла.
+            source: Путь к исходному файлу (читается, только если нужно
+                сравнить хеш содержимого).
+
+        Returns:
+            Индекс или None (промах).
+        """
+        with self._lock:
+            current = self._open.get(path)
+            index = current
+            if index is None or index.signature != signature:
+                # Индекс мог перестроить другой процесс
+                index = RecordIndex.open(path)
+                if index is None:
+                    return None
+            if index.signature != signature:
+                resigned = self._resign(path, index, signature, source)
+                if index is not current:
+                    index.close()
+                index = resigned
+                if index is None:
+                    return None
+            if index is not current:
+                self._open[path] = index
+                if current is not None:
+                    current.close()
+            return index
+
+    def refresh(
+        self,
+        filename: str,
+        path: Path,
+        records: Any,
+        signature: tuple[int, int, int],
+        payload: bytes,
+    ) -> None:
+        """Перестроить индекс, если он не соответствует исходному файлу.
+
+        Ошибки построения и записи только логируются: индекс — ускорение.
+
+        Args:
+            filename: Имя файла данных.
+            path: Путь к файлу индекса.
+            records: Снимок исходного файла (список записей).
+            signature: Сигнатура исходного файла.
+            payload: Содержимое исходного файла.
+        """
+        if not self.accepts(filename, signature[1]):
+            return
+        with self._lock:
+            current = self._open.get(path)
+            if current is not None and current.signature == signature:
+                return
+            # Открытый индекс устарел: освобождаем его mmap
+            if current is not None:
+                self._open.pop(path).close()
+        # Индекс мог уже построить другой процесс
+        built = RecordIndex.open(path)
+        if built is not None:
+            built.close()
+            if built.signature == signature:
+                return
+        if not isinstance(records, Sequence) or isinstance(records, str):
+            return
+        try:
+            write_record_index(
+                path,
+                records,
+                self._fields[filename],
+                signature,
+                content_digest(payload),
+            )
+        except (ValueError, TypeError, AttributeError, OSError) as e:
+            logger.debug(f"Record index for {filename} not built: {e}")
+
+    def _resign(
+        self,
+        path: Path,
+        index: RecordIndex,
+        signature: tuple[int, int, int],
+        source: Path,
+    ) -> RecordIndex | None:
+        """Привязать индекс к новой сигнатуре, если содержимое не изменилось.
+
+        Returns:
+            Индекс с новой сигнатурой или None, если содержимое другое.
+        """
+        if index.signature[1] != signature[1]:
+            return None
+        try:
+            if content_digest(source.read_bytes()) != index.digest:
+                return None
+            index.rewrite_signature(path, signature)
+        except OSError:
+            return None
+        return RecordIndex.open(path)
+
+    def __repr__(self) -> str:
+        """Представление кеша для отладки."""
+        return f"WarmStartCache(files={list(self._fields)})"
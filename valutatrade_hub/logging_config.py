@@ -36,6 +36,7 @@ def setup_logging(
     action_log_file: str = "actions.log",
     max_bytes: int = 10 * 1024 * 1024,  # 10 MB
     backup_count: int = 5,
+    logs_dir: Path | None = None,
 ) -> None:
     """Настроить систему логирования.
 
@@ -47,6 +48,7 @@ def setup_logging(
         action_log_file: Имя файла для доменных операций.
         max_bytes: Максимальный размер файла лога перед ротацией.
         backup_count: Количество резервных копий логов.
+        logs_dir: Директория логов (по умолчанию LOGS_DIR).
     """
     # Создаём корневой логгер
     root_logger = logging.getLogger()
@@ -61,10 +63,11 @@ def setup_logging(
     # Обработчик для основного лог-файла с ротацией
     if log_to_file:
         main_file_handler = logging.handlers.RotatingFileHandler(
-            LOGS_DIR / main_log_file,
+            (logs_dir or LOGS_DIR) / main_log_file,
             maxBytes=max_bytes,
             backupCount=backup_count,
             encoding="utf-8",
+            delay=True,  # файл создается при первой записи
         )
         main_file_handler.setLevel(level)
         main_file_handler.setFormatter(main_formatter)
@@ -84,6 +87,7 @@ def setup_action_logger(
     log_file: str = "actions.log",
     max_bytes: int = 10 * 1024 * 1024,  # 10 MB
     backup_count: int = 5,
+    logs_dir: Path | None = None,
 ) -> logging.Logger:
     """Настроить специальный логгер для доменных операций.
 
@@ -93,6 +97,7 @@ def setup_action_logger(
         log_file: Имя файла логов.
         max_bytes: Максимальный размер файла перед ротацией.
         backup_count: Количество резервных копий.
+        logs_dir: Директория логов (по умолчанию LOGS_DIR).
 
     Returns:
         Настроенный логгер для доменных операций.
@@ -110,10 +115,11 @@ def setup_action_logger(
 
     # Обработчик с ротацией
     action_file_handler = logging.handlers.RotatingFileHandler(
-        LOGS_DIR / log_file,
+        (logs_dir or LOGS_DIR) / log_file,
         maxBytes=max_bytes,
         backupCount=backup_count,
         encoding="utf-8",
+        delay=True,  # файл создается при первой записи
     )
     action_file_handler.setLevel(level)
     action_file_handler.setFormatter(action_formatter)
@@ -31,7 +31,23 @@ class ParserConfig:
         CRYPTO_CURRENCIES: Список криптовалют для отслеживания.
         CRYPTO_ID_MAP: Сопоставление кодов валют и ID для CoinGecko API.
         RATES_FILE_PATH: Путь к файлу rates.json (кеш для Core Service).
-        HISTORY_FILE_PATH: Путь к файлу exchange_rates.json (история).
+        HISTORY_FILE_PATH: Путь к файлу exchange_rates.json
+            (исходный формат истории, источник одноразовой миграции).
+        HISTORY_LOG_PATH: Путь к единому журналу exchange_rates.jsonl
+            (предыдущий формат истории, источник одноразовой миграции;
+            его манифест <имя>.manifest.json удаляется после миграции).
+        HISTORY_DIR_PATH: Директория сегментов истории и их манифеста.
+        HISTORY_SEGMENT_PERIOD: Период сегмента истории ("day" или "month").
+        HISTORY_COMPRESSION: Алгоритм сжатия старых сегментов
+            ("gzip" или "lzma").
+        HISTORY_COMPRESS_AFTER_DAYS: Возраст сегмента (дни), после которого
+            он сжимается планировщиком.
+        HISTORY_ROLLUP_INTERVALS: Интервалы OHLC свечей, в которые
+            сворачиваются закрытые сегменты истории.
+        HISTORY_RAW_RETENTION_DAYS: Горизонт хранения сырых тиков (дни);
+            старшие свернутые сегменты удаляются.
+        HISTORY_CANDLE_RETENTION_DAYS: Горизонт хранения свечей по интервалам
+            (дни, None — бессрочно).
         REQUEST_TIMEOUT: Таймаут ожидания ответа от API (секунды).
         MAX_RETRIES: Максимальное количество попыток при ошибке запроса.
         RETRY_DELAY: Задержка между повторными попытками (секунды).
@@ -98,6 +114,33 @@ class ParserConfig:
             Path(__file__).parent.parent.parent / "data" / "exchange_rates.json"
         )
     )
+    HISTORY_LOG_PATH: str = field(
+        default_factory=lambda: str(
+            Path(__file__).parent.parent.parent / "data" / "exchange_rates.jsonl"
+        )
+    )
+    HISTORY_DIR_PATH: str = field(
+        default_factory=lambda: str(
+            Path(__file__).parent.parent.parent / "data" / "history"
+        )
+    )
+
+    # =============================================================================
+    # Параметры хранения истории
+    # =============================================================================
+
+    HISTORY_SEGMENT_PERIOD: str = "day"  # "day" или "month"
+    HISTORY_COMPRESSION: str = "gzip"  # "gzip" или "lzma"
+    HISTORY_COMPRESS_AFTER_DAYS: int = 7  # дни
+    HISTORY_ROLLUP_INTERVALS: tuple = ("1m", "1h", "1d")
+    HISTORY_RAW_RETENTION_DAYS: int = 30  # дни
+    HISTORY_CANDLE_RETENTION_DAYS: dict = field(
+        default_factory=lambda: {
+            "1m": 90,
+            "1h": 730,
+            "1d": None,
+        }
+    )
 
     # =============================================================================
     # Параметры сетевых запросов
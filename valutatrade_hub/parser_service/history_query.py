@@ -0,0 +1,223 @@
+"""Индексированные запросы к истории курсов.
+
+Модуль строит по записям истории (формат storage.add_history_record)
+отсортированные по времени массивы для каждой валютной пары и отвечает
+на запросы за O(log n) через bisect:
+- range(pair, start, end) — все записи пары за интервал
+- as_of(pair, ts) — последний известный курс на момент времени
+"""
+
+import logging
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable
+from typing import Any
+
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.storage import (
+    last_history_records_before,
+    load_history_series,
+    parse_pair,
+)
+from valutatrade_hub.parser_service.timeseries import (
+    PairSeries,
+    Timestamp,
+    build_series,
+    from_epoch,
+    to_epoch,
+)
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class RateHistoryIndex:
+    """Индекс истории курсов с поиском по времени за O(log n).
+
+    Для каждой пары хранит PairSeries — колоночный ряд, отсортированный
+    по времени (array('q') epoch-секунд и array('d') курсов). Запросы
+    выполняются бинарным поиском по массиву времени, словари записей
+    восстанавливаются только для найденных строк.
+
+    Attributes:
+        record_count: Общее количество проиндексированных записей.
+
+    Example:
+        >>> index = RateHistoryIndex.load(pairs=["BTC_USD"])
+        >>> index.as_of("BTC_USD", "2025-10-10T14:05:00Z")
+        {"id": "BTC_USD_2025-10-10T14:00:01Z", "rate": 59337.21, ...}
+        >>> index.range("BTC_USD", "2025-10-10T00:00:00Z", "2025-10-11T00:00:00Z")
+        [...]
+    """
+
+    def __init__(self, records: Iterable[dict[str, Any]] = ()) -> None:
+        """Построить индекс по записям истории.
+
+        Args:
+            records: Записи истории в формате storage.add_history_record
+                (порядок произвольный).
+        """
+        self._series = build_series(records)
+        self.record_count = sum(len(series) for series in self._series.values())
+
+        logger.debug(
+            f"Indexed {self.record_count} history records for {len(self._series)} pairs"
+        )
+
+    @classmethod
+    def from_series(cls, series: dict[str, PairSeries]) -> "RateHistoryIndex":
+        """Построить индекс по готовым рядам (без копирования буферов).
+
+        Args:
+            series: Словарь {"BTC_USD": PairSeries, ...}, например
+                результат storage.load_history_series.
+
+        Returns:
+            Построенный индекс.
+        """
+        index = cls()
+        for item in series.values():
+            item.sort()
+        index._series = dict(series)
+        index.record_count = sum(len(item) for item in series.values())
+        return index
+
+    @classmethod
+    def load(
+        cls,
+        start: Timestamp | None = None,
+        end: Timestamp | None = None,
+        pairs: list[str] | None = None,
+        config: ParserConfig | None = None,
+    ) -> "RateHistoryIndex":
+        """Загрузить индекс из хранилища истории.
+
+        Читаются только сегменты, пересекающиеся с [start, end] и
+        содержащие запрошенные пары. Если задан start, в индекс также
+        попадает последняя запись каждой пары до start, чтобы as_of()
+        в начале диапазона возвращал действовавший на тот момент курс.
+        range() с тем же start эту запись не возвращает.
+
+        Args:
+            start: Нижняя граница времени (опционально)
+            end: Верхняя граница времени (опционально)
+            pairs: Список пар "FROM_TO" (все пары если None)
+            config: Экземпляр ParserConfig (опционально)
+
+        Returns:
+            Построенный индекс.
+
+        Raises:
+            StorageError: Если чтение истории не удалось.
+        """
+        start_iso = from_epoch(to_epoch(start)) if start is not None else None
+        end_iso = from_epoch(to_epoch(end)) if end is not None else None
+        series = load_history_series(config, start_iso, end_iso, pairs)
+
+        if start_iso is not None:
+            seeds = last_history_records_before(start_iso, pairs, config)
+            for pair, record in seeds.items():
+                if pair not in series:
+                    series[pair] = PairSeries(record["from"], record["to"])
+                series[pair].append(record)
+
+        return cls.from_series(series)
+
+    def pairs(self) -> list[str]:
+        """Список проиндексированных пар в алфавитном порядке."""
+        return sorted(self._series)
+
+    def series(self, pair: str) -> PairSeries | None:
+        """Колоночный ряд пары или None, если пары нет в индексе.
+
+        Raises:
+            ValueError: Если формат пары невалиден.
+        """
+        parse_pair(pair)  # Вызовет ValueError если невалидно
+        return self._series.get(pair)
+
+    def _bounds(
+        self, pair: str, start: Timestamp | None, end: Timestamp | None
+    ) -> tuple[PairSeries | None, int, int]:
+        """Ряд пары и границы строк [lo, hi) для интервала [start, end]."""
+        series = self.series(pair)
+        if series is None:
+            return None, 0, 0
+        times = series.timestamps
+        lo = bisect_left(times, to_epoch(start)) if start is not None else 0
+        hi = bisect_right(times, to_epoch(end)) if end is not None else len(times)
+        return series, lo, hi
+
+    def range(
+        self, pair: str, start: Timestamp | None = None, end: Timestamp | None = None
+    ) -> list[dict[str, Any]]:
+        """Записи пары за интервал [start, end] включительно.
+
+        Args:
+            pair: Валютная пара "FROM_TO"
+            start: Начало интервала (без ограничения если None)
+            end: Конец интервала (без ограничения если None)
+
+        Returns:
+            Записи в хронологическом порядке.
+
+        Raises:
+            ValueError: Если формат пары невалиден.
+        """
+        series, lo, hi = self._bounds(pair, start, end)
+        if series is None:
+            return []
+        return [series.record_at(row) for row in range(lo, hi)]
+
+    def range_rates(
+        self, pair: str, start: Timestamp | None = None, end: Timestamp | None = None
+    ) -> tuple[array, array]:
+        """Срезы колонок времени и курсов пары за интервал [start, end].
+
+        В отличие от range() не создает словари записей.
+
+        Returns:
+            Кортеж (array('q') epoch-секунд, array('d') курсов).
+
+        Raises:
+            ValueError: Если формат пары невалиден.
+        """
+        series, lo, hi = self._bounds(pair, start, end)
+        if series is None:
+            return array("q"), array("d")
+        return series.timestamps[lo:hi], series.rates[lo:hi]
+
+    def as_of(self, pair: str, ts: Timestamp) -> dict[str, Any] | None:
+        """Последняя известная запись пары на момент ts.
+
+        Args:
+            pair: Валютная пара "FROM_TO"
+            ts: Момент времени
+
+        Returns:
+            Запись с наибольшим updated_at <= ts или None, если
+            на этот момент курса еще не было.
+
+        Raises:
+            ValueError: Если формат пары невалиден.
+        """
+        series = self.series(pair)
+        if series is None:
+            return None
+        row = bisect_right(series.timestamps, to_epoch(ts)) - 1
+        return series.record_at(row) if row >= 0 else None
+
+    def latest(self, pair: str) -> dict[str, Any] | None:
+        """Самая свежая запись пары или None."""
+        series = self.series(pair)
+        return series.record_at(-1) if series else None
+
+    def __len__(self) -> int:
+        """Общее количество записей в индексе."""
+        return self.record_count
+
+    def __repr__(self) -> str:
+        """Представление индекса для отладки."""
+        return (
+            f"RateHistoryIndex(pairs={len(self._series)}, records={self.record_count})"
+        )
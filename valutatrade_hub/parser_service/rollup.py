@@ -0,0 +1,247 @@
+"""Свертка истории курсов в OHLC свечи и политика хранения.
+
+Сырые тики из закрытых сегментов истории сворачиваются в свечи
+1m/1h/1d по каждой паре, после чего сырые сегменты старше
+HISTORY_RAW_RETENTION_DAYS удаляются. Свечи каждого интервала хранятся
+HISTORY_CANDLE_RETENTION_DAYS[interval] дней (None — бессрочно).
+Без этого история под RatesScheduler растет без ограничений.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any
+
+from valutatrade_hub.parser_service.config import ParserConfig, get_parser_config
+from valutatrade_hub.parser_service.storage import (
+    compress_history_segments,
+    delete_candle_segments,
+    delete_history_segments,
+    load_history_series,
+    prune_rollup_state,
+    read_history_manifest,
+    read_rollup_state,
+    segment_key,
+    write_candle_segment,
+)
+from valutatrade_hub.parser_service.timeseries import (
+    TIMESTAMP_FORMAT,
+    PairSeries,
+    from_epoch,
+)
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Длительность интервалов свечей в секундах
+CANDLE_INTERVALS: dict[str, int] = {
+    "1m": 60,
+    "1h": 3600,
+    "1d": 86400,
+}
+
+
+def build_candles(series: PairSeries, interval: str) -> list[dict[str, Any]]:
+    """Построить OHLC свечи по отсортированному ряду пары.
+
+    Args:
+        series: Ряд пары, отсортированный по времени.
+        interval: Интервал свечей ("1m", "1h", "1d").
+
+    Returns:
+        Список свечей:
+        [
+            {
+                "pair": "BTC_USD",
+                "start": "2025-10-10T14:00:00Z",
+                "open": 59337.21,
+                "high": 59400.0,
+                "low": 59100.5,
+                "close": 59250.0,
+                "count": 12
+            },
+            ...
+        ]
+
+    Raises:
+        ValueError: Если интервал неизвестен.
+    """
+    if interval not in CANDLE_INTERVALS:
+        raise ValueError(
+            f"Unknown candle interval: {interval}. "
+            f"Expected one of {', '.join(CANDLE_INTERVALS)}"
+        )
+    step = CANDLE_INTERVALS[interval]
+
+    candles: list[dict[str, Any]] = []
+    bucket = None
+    candle: dict[str, Any] = {}
+
+    for ts, rate in zip(series.timestamps, series.rates):
+        start = ts - ts % step
+        if start != bucket:
+            bucket = start
+            candle = {
+                "pair": series.pair,
+                "start": from_epoch(start),
+                "open": rate,
+                "high": rate,
+                "low": rate,
+                "close": rate,
+                "count": 0,
+            }
+            candles.append(candle)
+        candle["high"] = max(candle["high"], rate)
+        candle["low"] = min(candle["low"], rate)
+        candle["close"] = rate
+        candle["count"] += 1
+
+    return candles
+
+
+def rollup_history(
+    config: ParserConfig | None = None, now: datetime | None = None
+) -> int:
+    """Свернуть закрытые сегменты истории в свечи всех интервалов.
+
+    Обрабатываются сегменты, для которых свертка еще не выполнена во все
+    интервалы HISTORY_ROLLUP_INTERVALS, а также сегменты, число записей
+    которых изменилось после свертки (поздние или догруженные тики) —
+    они сворачиваются заново во все интервалы. Сегмент текущего периода
+    не сворачивается, так как в него еще идет запись.
+
+    Args:
+        config: Экземпляр ParserConfig (опционально)
+        now: Текущее время UTC (по умолчанию datetime.utcnow())
+
+    Returns:
+        Количество свернутых сегментов.
+
+    Raises:
+        StorageError: Если чтение или запись не удались.
+    """
+    cfg = config or get_parser_config()
+    now = now or datetime.utcnow()
+    current_key = segment_key(
+        now.strftime(TIMESTAMP_FORMAT), cfg.HISTORY_SEGMENT_PERIOD
+    )
+
+    manifest = read_history_manifest(cfg)
+    done = read_rollup_state(cfg)["segments"]
+    rolled_up = 0
+
+    for key, entry in manifest["segments"].items():
+        if key >= current_key or entry["start"] is None:
+            continue
+        state = done.get(key, {})
+        if state.get("record_count") != entry["record_count"]:
+            # Сегмент изменился после свертки: все свечи устарели
+            pending = list(cfg.HISTORY_ROLLUP_INTERVALS)
+        else:
+            pending = [
+                interval
+                for interval in cfg.HISTORY_ROLLUP_INTERVALS
+                if interval not in state.get("intervals", [])
+            ]
+        if not pending:
+            continue
+
+        # Диапазоны сегментов не пересекаются, поэтому читается один сегмент
+        series = load_history_series(cfg, entry["start"], entry["end"])
+        for interval in pending:
+            candles = []
+            for pair in sorted(series):
+                candles.extend(build_candles(series[pair], interval))
+            write_candle_segment(
+                interval, key, candles, entry["end"], cfg, entry["record_count"]
+            )
+        rolled_up += 1
+
+    if rolled_up:
+        logger.info(f"✓ Rolled up {rolled_up} history segments into candles")
+    return rolled_up
+
+
+def expire_history(
+    config: ParserConfig | None = None, now: datetime | None = None
+) -> dict[str, int]:
+    """Удалить сырую историю и свечи старше горизонтов хранения.
+
+    Сырой сегмент удаляется, только если он старше
+    HISTORY_RAW_RETENTION_DAYS и уже свернут во все интервалы
+    HISTORY_ROLLUP_INTERVALS при текущем числе записей, поэтому удаление
+    не теряет данные свечей. Записи rollups.json сегментов, от которых
+    не осталось ни сырых данных, ни свечей, удаляются.
+
+    Args:
+        config: Экземпляр ParserConfig (опционально)
+        now: Текущее время UTC (по умолчанию datetime.utcnow())
+
+    Returns:
+        Статистика: {"raw_segments": 3, "candles_1m": 2, ...,
+        "rollup_state": 1}
+
+    Raises:
+        StorageError: Если удаление не удалось.
+    """
+    cfg = config or get_parser_config()
+    now = now or datetime.utcnow()
+    stats: dict[str, int] = {"raw_segments": 0}
+
+    done = read_rollup_state(cfg)["segments"]
+    manifest = read_history_manifest(cfg)
+
+    raw_cutoff = _cutoff(now, cfg.HISTORY_RAW_RETENTION_DAYS)
+    expired = [
+        key
+        for key, entry in manifest["segments"].items()
+        if entry["end"] is not None
+        and entry["end"] < raw_cutoff
+        and done.get(key, {}).get("record_count") == entry["record_count"]
+        and set(cfg.HISTORY_ROLLUP_INTERVALS)
+        <= set(done.get(key, {}).get("intervals", []))
+    ]
+    stats["raw_segments"] = delete_history_segments(expired, cfg)
+
+    for interval in cfg.HISTORY_ROLLUP_INTERVALS:
+        days = cfg.HISTORY_CANDLE_RETENTION_DAYS.get(interval)
+        if days is None:
+            continue
+        candle_cutoff = _cutoff(now, days)
+        keys = [
+            key
+            for key, entry in done.items()
+            if entry["end"] is not None and entry["end"] < candle_cutoff
+        ]
+        stats[f"candles_{interval}"] = delete_candle_segments(interval, keys, cfg)
+
+    stats["rollup_state"] = prune_rollup_state(cfg)
+
+    if any(stats.values()):
+        logger.info(f"✓ Expired history: {stats}")
+    return stats
+
+
+def run_history_maintenance(config: ParserConfig | None = None) -> dict[str, Any]:
+    """Полный цикл обслуживания истории: свертка → удаление → сжатие.
+
+    Вызывается планировщиком после каждого обновления курсов.
+
+    Args:
+        config: Экземпляр ParserConfig (опционально)
+
+    Returns:
+        Статистика: {"rolled_up": 1, "expired": {...}, "compressed": 2}
+
+    Raises:
+        StorageError: Если одна из операций не удалась.
+    """
+    cfg = config or get_parser_config()
+    rolled_up = rollup_history(cfg)
+    expired = expire_history(cfg)
+    compressed = compress_history_segments(config=cfg)
+    return {"rolled_up": rolled_up, "expired": expired, "compressed": compressed}
+
+
+def _cutoff(now: datetime, days: int) -> str:
+    """ISO 8601 UTC граница "старше N дней"."""
+    return (now - timedelta(days=days)).strftime(TIMESTAMP_FORMAT)
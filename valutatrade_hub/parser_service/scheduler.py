@@ -9,6 +9,7 @@ import threading
 from datetime import datetime
 
 from valutatrade_hub.parser_service.config import ParserConfig, get_parser_config
+from valutatrade_hub.parser_service.rollup import run_history_maintenance
 from valutatrade_hub.parser_service.updater import update_all_rates
 
 # Настройка логирования
@@ -63,11 +64,27 @@ class RatesScheduler:
             except Exception as e:
                 logger.error(f"[Scheduler] Update failed: {str(e)}", exc_info=True)
 
+            self._run_maintenance()
+
             # Ждать до следующего обновления (с возможностью прерывания)
             self._stop_event.wait(self.interval)
 
         logger.info("Scheduler stopped")
 
+    def _run_maintenance(self) -> None:
+        """Обслуживание истории курсов после обновления.
+
+        Сворачивает закрытые сегменты в OHLC свечи, удаляет сырую историю
+        и свечи старше горизонтов хранения и сжимает старые сегменты.
+        Ошибки логируются и не останавливают планировщик.
+        """
+        try:
+            run_history_maintenance(self.config)
+        except Exception as e:
+            logger.error(
+                f"[Scheduler] History maintenance failed: {str(e)}", exc_info=True
+            )
+
     def start(self) -> None:
         """Запустить планировщик в фоновом потоке.
 
@@ -1,22 +1,29 @@
 """Модуль для работы с хранилищем курсов валют.
 
-Операции чтения/записи файла exchange_rates.json:
+Операции чтения/записи истории курсов (history/) и кеша rates.json:
 - Сохранение исторических данных
 - Получение последних курсов
 - Управление историей изменений.
 """
 
+import gzip
 import json
 import logging
+import lzma
 import os
 import re
-import tempfile
-from datetime import datetime
+from collections.abc import Iterator
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any
 
 from valutatrade_hub.core.exceptions import StorageError
+from valutatrade_hub.infra import codecs
+from valutatrade_hub.infra.fileio import atomic_write, encode_json
+from valutatrade_hub.infra.locks import FileLock, get_file_lock
+from valutatrade_hub.infra.ratesformat import normalize_rates_data
 from valutatrade_hub.parser_service.config import ParserConfig, get_parser_config
+from valutatrade_hub.parser_service.timeseries import PairSeries, build_series
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -101,15 +108,692 @@ def parse_pair(pair: str) -> tuple[str, str]:
 
 
 # =============================================================================
-# exchange_rates.json - История курсов
+# history/ - История курсов (сегменты по времени + манифест)
 # =============================================================================
+#
+# История разбита на сегменты JSON Lines по дням (или месяцам):
+# history/2025-10-10.jsonl, history/2025-10-11.jsonl, ...
+# Добавление записи — короткая дозапись в конец сегмента.
+# Манифест history/manifest.json хранит для каждого сегмента диапазон
+# времени, набор пар, число записей и размер, поэтому запросы по диапазону
+# и политика хранения открывают только нужные сегменты.
+# Закрытые старые сегменты можно сжать (gzip/lzma), чтение прозрачно.
+# Манифест читается и изменяется под межпроцессной блокировкой записи
+# (infra.locks): планировщик и CLI/пакетный updater — разные процессы,
+# и без нее один перезаписал бы изменения манифеста другого.
 
+HISTORY_MANIFEST_NAME = "manifest.json"
 
-def read_exchange_rates_history(config: ParserConfig | None = None) -> dict[str, Any]:
-    """Чтение файла истории exchange_rates.json.
+SEGMENT_COMPRESSORS: dict[str, tuple[str, Any]] = {
+    "gzip": (".gz", gzip),
+    "lzma": (".xz", lzma),
+}
+
+
+def _history_dir(cfg: ParserConfig) -> Path:
+    """Директория сегментов истории."""
+    return Path(cfg.HISTORY_DIR_PATH)
+
+
+def segment_key(timestamp: str, period: str) -> str:
+    """Ключ сегмента для timestamp.
+
+    Args:
+        timestamp: ISO 8601 UTC timestamp ("2025-10-10T12:00:01Z")
+        period: "day" или "month"
+
+    Returns:
+        "2025-10-10" для period="day", "2025-10" для period="month".
+
+    Raises:
+        ValueError: Если period неизвестен.
+    """
+    if period == "day":
+        return timestamp[:10]
+    if period == "month":
+        return timestamp[:7]
+    raise ValueError(f"Unknown history segment period: {period}")
+
+
+def _empty_manifest() -> dict[str, Any]:
+    """Манифест пустой истории."""
+    return {
+        "format": "segments",
+        "version": 2,
+        "last_updated": None,
+        "record_count": 0,
+        "segments": {},
+    }
+
+
+def _manifest_lock(cfg: ParserConfig) -> FileLock:
+    """Блокировка манифеста истории (потоки и процессы)."""
+    return get_file_lock(_history_dir(cfg) / HISTORY_MANIFEST_NAME)
+
+
+def _write_manifest(cfg: ParserConfig, manifest: dict[str, Any]) -> None:
+    """Записать манифест (под _manifest_lock(cfg).write_locked()).
+
+    Raises:
+        OSError: Если запись не удалась.
+    """
+    _write_json_atomic(_history_dir(cfg) / HISTORY_MANIFEST_NAME, manifest)
+    _manifest_lock(cfg).bump_generation()
+
+
+def _write_json_atomic(filepath: Path, data: Any) -> None:
+    """Атомарная запись JSON файла (temp file → rename, infra.fileio).
+
+    Args:
+        filepath: Путь к файлу.
+        data: JSON-сериализуемые данные.
+
+    Raises:
+        TypeError: Если данные не сериализуются в JSON.
+        OSError: Если запись не удалась.
+    """
+    atomic_write(filepath, encode_json(data))
+
+
+def _write_bytes_atomic(filepath: Path, payload: bytes) -> None:
+    """Атомарная запись бинарного файла (temp file → rename, infra.fileio).
+
+    Raises:
+        OSError: Если запись не удалась.
+    """
+    atomic_write(filepath, payload)
+
+
+def _encode_records(records: list[dict[str, Any]]) -> bytes:
+    """Сериализация записей в JSON Lines."""
+    return "".join(
+        json.dumps(record, ensure_ascii=False) + "\n" for record in records
+    ).encode("utf-8")
+
+
+def _parse_history_lines(
+    data: bytes, source: Path
+) -> tuple[list[dict[str, Any]], int]:
+    """Разбор содержимого сегмента JSON Lines.
+
+    Недописанная последняя строка (обрыв записи при падении процесса)
+    пропускается с предупреждением.
+
+    Args:
+        data: Содержимое сегмента.
+        source: Путь к сегменту (для сообщений об ошибках).
+
+    Returns:
+        Кортеж (записи, размер валидной части в байтах).
+
+    Raises:
+        StorageError: Если в середине сегмента встретилась битая строка.
+    """
+    records: list[dict[str, Any]] = []
+    valid_size = 0
+    lines = data.split(b"\n")
+
+    # После последнего "\n" остается либо пустая строка, либо обрывок
+    tail = lines.pop()
+    if tail.strip():
+        logger.warning(
+            f"Ignoring truncated last line in history segment {source} "
+            f"({len(tail)} bytes)"
+        )
+
+    for lineno, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise StorageError(
+                    f"Invalid JSON in history segment {source} at line {lineno}: "
+                    f"{str(e)}"
+                ) from e
+        valid_size += len(line) + 1
+
+    return records, valid_size
+
+
+def _read_segment(filepath: Path) -> list[dict[str, Any]]:
+    """Прочитать все записи сегмента (сжатого или нет).
+
+    Raises:
+        StorageError: Если сегмент содержит невалидный JSON.
+        OSError: Если чтение не удалось.
+    """
+    for suffix, module in SEGMENT_COMPRESSORS.values():
+        if filepath.name.endswith(suffix):
+            with module.open(filepath, "rb") as f:
+                data = f.read()
+            break
+    else:
+        data = filepath.read_bytes()
+
+    records, _ = _parse_history_lines(data, filepath)
+    return records
+
+
+def _trim_torn_tail(filepath: Path) -> None:
+    """Отрезать недописанную последнюю строку несжатого сегмента.
+
+    Каждая дозапись заканчивается переводом строки, поэтому файл,
+    который заканчивается не на "\\n", оборван аварийным завершением.
+    """
+    if not filepath.exists():
+        return
+
+    with open(filepath, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+
+        # Ищем последний перевод строки с конца файла блоками
+        pos = size
+        while pos > 0:
+            step = min(4096, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step)
+            idx = chunk.rfind(b"\n")
+            if idx != -1:
+                f.truncate(pos + idx + 1)
+                break
+        else:
+            f.truncate(0)
+
+    logger.warning(f"Trimmed truncated last line in history segment {filepath}")
+
+
+def _segment_entry(filename: str, records: list[dict[str, Any]]) -> dict[str, Any]:
+    """Описание сегмента для манифеста по его записям."""
+    timestamps = [r["updated_at"] for r in records if r.get("updated_at")]
+    return {
+        "file": filename,
+        "start": min(timestamps, default=None),
+        "end": max(timestamps, default=None),
+        "pairs": sorted({f"{r['from']}_{r['to']}" for r in records}),
+        "record_count": len(records),
+        "size": 0,
+        "compressed": None,
+    }
+
+
+def _scan_segment_file(filepath: Path) -> dict[str, Any]:
+    """Построить описание сегмента сканированием файла."""
+    compressed = None
+    for name, (suffix, _) in SEGMENT_COMPRESSORS.items():
+        if filepath.name.endswith(suffix):
+            compressed = name
+    if compressed is None:
+        _trim_torn_tail(filepath)
+
+    entry = _segment_entry(filepath.name, _read_segment(filepath))
+    entry["size"] = filepath.stat().st_size
+    entry["compressed"] = compressed
+    return entry
+
+
+def _segment_key_from_filename(filename: str) -> str | None:
+    """Ключ сегмента по имени файла ("2025-10-10.jsonl.gz" → "2025-10-10")."""
+    if ".jsonl" not in filename or filename.endswith(".tmp"):
+        return None
+    return filename.split(".jsonl", 1)[0]
+
+
+def _finalize_manifest(manifest: dict[str, Any]) -> dict[str, Any]:
+    """Пересчитать агрегаты манифеста по сегментам."""
+    segments = manifest["segments"]
+    manifest["segments"] = dict(sorted(segments.items()))
+    manifest["record_count"] = sum(s["record_count"] for s in segments.values())
+    manifest["last_updated"] = max(
+        (s["end"] for s in segments.values() if s["end"]), default=None
+    )
+    return manifest
+
+
+def _rebuild_history_manifest(cfg: ParserConfig) -> dict[str, Any]:
+    """Пересчитать манифест полным сканированием директории сегментов."""
+    history_dir = _history_dir(cfg)
+    manifest = _empty_manifest()
+
+    if history_dir.exists():
+        for filepath in sorted(history_dir.iterdir()):
+            key = _segment_key_from_filename(filepath.name)
+            if key is not None:
+                manifest["segments"][key] = _scan_segment_file(filepath)
+
+    _finalize_manifest(manifest)
+    _write_manifest(cfg, manifest)
+    logger.info(
+        f"Rebuilt history manifest: {len(manifest['segments'])} segments, "
+        f"{manifest['record_count']} records"
+    )
+    return manifest
+
+
+def read_history_manifest(config: ParserConfig | None = None) -> dict[str, Any]:
+    """Чтение манифеста истории.
+
+    Позволяет узнать last_updated, число записей и состав сегментов без
+    чтения самих сегментов. Сегменты, размер которых не совпадает с
+    манифестом (например, процесс упал между дозаписью и обновлением
+    манифеста), пересканируются; при отсутствии манифеста он строится
+    заново. Так как манифест при этом может быть переписан, чтение
+    выполняется под блокировкой записи манифеста.
+
+    Args:
+        config: Экземпляр ParserConfig (опционально)
+
+    Returns:
+        Словарь со структурой:
+        {
+            "format": "segments",
+            "version": 2,
+            "last_updated": "2025-10-10T12:00:01Z",
+            "record_count": 1234,
+            "segments": {
+                "2025-10-10": {
+                    "file": "2025-10-10.jsonl",
+                    "start": "2025-10-10T00:00:01Z",
+                    "end": "2025-10-10T23:00:01Z",
+                    "pairs": ["BTC_USD", "EUR_USD"],
+                    "record_count": 192,
+                    "size": 34567,
+                    "compressed": null
+                },
+                ...
+            }
+        }
+
+    Raises:
+        StorageError: Если чтение не удалось.
+    """
+    cfg = config or get_parser_config()
+    _ensure_history_store(cfg)
+    manifest_path = _history_dir(cfg) / HISTORY_MANIFEST_NAME
+
+    try:
+        with _manifest_lock(cfg).write_locked():
+            if not manifest_path.exists():
+                return _rebuild_history_manifest(cfg)
+
+            try:
+                with open(manifest_path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except json.JSONDecodeError:
+                logger.warning("Invalid JSON in history manifest, rebuilding")
+                return _rebuild_history_manifest(cfg)
+
+            if not isinstance(manifest, dict) or manifest.get("version") != 2:
+                logger.warning("Unsupported history manifest, rebuilding")
+                return _rebuild_history_manifest(cfg)
+
+            # Сверка несжатых сегментов с диском
+            changed = False
+            for key, entry in list(manifest["segments"].items()):
+                filepath = _history_dir(cfg) / entry["file"]
+                if not filepath.exists():
+                    del manifest["segments"][key]
+                    changed = True
+                elif filepath.stat().st_size != entry["size"]:
+                    logger.warning(
+                        f"History segment {key} is out of sync, rescanning"
+                    )
+                    manifest["segments"][key] = _scan_segment_file(filepath)
+                    changed = True
+
+            if changed:
+                _finalize_manifest(manifest)
+                _write_manifest(cfg, manifest)
+            return manifest
+
+    except OSError as e:
+        raise StorageError(f"Error reading history manifest: {str(e)}") from e
+
+
+def migrate_exchange_rates_history(config: ParserConfig | None = None) -> int:
+    """Одноразовая миграция истории предыдущих форматов в сегменты.
+
+    Поддерживаемые источники:
+        - exchange_rates.json ({"history": [...]}, исходный формат)
+        - exchange_rates.jsonl (единый append-only журнал; его манифест
+          exchange_rates.manifest.json рядом с ним после миграции удаляется)
+
+    Записи раскладываются по сегментам, строится манифест, а исходные
+    файлы переименовываются с суффиксом .migrated (данные не удаляются).
+    Если манифест сегментов уже существует, миграция не выполняется.
+    Проверка и миграция выполняются под блокировкой манифеста, поэтому
+    одновременно запущенные процессы не мигрируют историю дважды.
+
+    Args:
+        config: Экземпляр ParserConfig (опционально)
+
+    Returns:
+        Количество перенесенных записей (0 если мигрировать нечего).
+
+    Raises:
+        StorageError: Если исходный файл невалиден или запись не удалась.
+    """
+    cfg = config or get_parser_config()
+    legacy_path = Path(cfg.HISTORY_FILE_PATH)
+    log_path = Path(cfg.HISTORY_LOG_PATH)
+
+    if not legacy_path.exists() and not log_path.exists():
+        return 0
+
+    records: list[dict[str, Any]] = []
+    try:
+        with _manifest_lock(cfg).write_locked():
+            if (_history_dir(cfg) / HISTORY_MANIFEST_NAME).exists():
+                return 0
+
+            if legacy_path.exists():
+                with open(legacy_path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if not isinstance(data, dict):
+                    raise StorageError(
+                        "Invalid history file format: "
+                        f"expected dict, got {type(data)}"
+                    )
+                records.extend(data.get("history", []))
+
+            if log_path.exists():
+                records.extend(
+                    _parse_history_lines(log_path.read_bytes(), log_path)[0]
+                )
+
+            _write_segments(records, cfg)
+
+            for source in (legacy_path, log_path):
+                if source.exists():
+                    os.replace(source, source.with_name(source.name + ".migrated"))
+            log_path.with_name(f"{log_path.stem}.manifest.json").unlink(
+                missing_ok=True
+            )
+
+    except json.JSONDecodeError as e:
+        raise StorageError(f"Invalid JSON in history file: {str(e)}") from e
+    except OSError as e:
+        raise StorageError(f"Error migrating history file: {str(e)}") from e
+
+    logger.info(f"✓ Migrated {len(records)} history records to {_history_dir(cfg)}")
+    return len(records)
+
+
+def _ensure_history_store(cfg: ParserConfig) -> None:
+    """Выполнить миграцию старых форматов, если она еще не сделана."""
+    if not (_history_dir(cfg) / HISTORY_MANIFEST_NAME).exists() and (
+        Path(cfg.HISTORY_FILE_PATH).exists() or Path(cfg.HISTORY_LOG_PATH).exists()
+    ):
+        migrate_exchange_rates_history(cfg)
+
+
+def _group_by_segment(
+    records: list[dict[str, Any]], period: str
+) -> dict[str, list[dict[str, Any]]]:
+    """Разложить записи по ключам сегментов с сохранением порядка."""
+    groups: dict[str, list[dict[str, Any]]] = {}
+    for record in records:
+        key = segment_key(record["updated_at"], period)
+        groups.setdefault(key, []).append(record)
+    return groups
+
+
+def _write_segments(records: list[dict[str, Any]], cfg: ParserConfig) -> None:
+    """Полная атомарная перезапись всех сегментов и манифеста.
+
+    Каждый сегмент записывается через temp file → rename, затем
+    удаляются сегменты, которых нет в новых данных. Вызывается под
+    блокировкой записи манифеста.
+
+    Raises:
+        OSError: Если запись не удалась.
+    """
+    history_dir = _history_dir(cfg)
+    history_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _empty_manifest()
+
+    for key, group in _group_by_segment(records, cfg.HISTORY_SEGMENT_PERIOD).items():
+        filename = f"{key}.jsonl"
+        filepath = history_dir / filename
+        _write_bytes_atomic(filepath, _encode_records(group))
+        entry = _segment_entry(filename, group)
+        entry["size"] = filepath.stat().st_size
+        manifest["segments"][key] = entry
+
+    live_files = {entry["file"] for entry in manifest["segments"].values()}
+    for filepath in history_dir.iterdir():
+        key = _segment_key_from_filename(filepath.name)
+        if key is not None and filepath.name not in live_files:
+            filepath.unlink()
+
+    _finalize_manifest(manifest)
+    _write_manifest(cfg, manifest)
+
+
+def _decompress_segment(key: str, manifest: dict[str, Any], cfg: ParserConfig) -> None:
+    """Вернуть сжатый сегмент в несжатый вид (для дозаписи задним числом)."""
+    entry = manifest["segments"][key]
+    compressed_path = _history_dir(cfg) / entry["file"]
+    filename = f"{key}.jsonl"
+    filepath = _history_dir(cfg) / filename
+
+    _write_bytes_atomic(filepath, _encode_records(_read_segment(compressed_path)))
+    compressed_path.unlink()
+
+    entry["file"] = filename
+    entry["compressed"] = None
+    entry["size"] = filepath.stat().st_size
+    logger.info(f"Decompressed history segment {key} for backfill")
+
+
+def _append_history_log(records: list[dict[str, Any]], cfg: ParserConfig) -> None:
+    """Дописать записи в конец соответствующих сегментов и обновить манифест.
+
+    Записи одного сегмента уходят одним системным вызовом write() в режиме
+    O_APPEND, поэтому стоимость не зависит от объема накопленной истории.
+    Дозапись и обновление манифеста выполняются под блокировкой манифеста.
+
+    Raises:
+        StorageError: Если запись не удалась.
+    """
+    if not records:
+        return
+
+    history_dir = _history_dir(cfg)
+
+    try:
+        with _manifest_lock(cfg).write_locked():
+            manifest = read_history_manifest(cfg)
+            history_dir.mkdir(parents=True, exist_ok=True)
+
+            for key, group in _group_by_segment(
+                records, cfg.HISTORY_SEGMENT_PERIOD
+            ).items():
+                entry = manifest["segments"].get(key)
+                if entry is not None and entry["compressed"]:
+                    _decompress_segment(key, manifest, cfg)
+
+                filename = f"{key}.jsonl"
+                filepath = history_dir / filename
+                _trim_torn_tail(filepath)
+
+                fd = os.open(filepath, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, _encode_records(group))
+                    size = os.fstat(fd).st_size
+                finally:
+                    os.close(fd)
+
+                added = _segment_entry(filename, group)
+                if entry is None:
+                    entry = added
+                else:
+                    entry["start"] = min(
+                        s for s in (entry["start"], added["start"]) if s is not None
+                    )
+                    entry["end"] = max(
+                        s for s in (entry["end"], added["end"]) if s is not None
+                    )
+                    entry["pairs"] = sorted(set(entry["pairs"]) | set(added["pairs"]))
+                    entry["record_count"] += added["record_count"]
+                entry["size"] = size
+                manifest["segments"][key] = entry
+
+            _finalize_manifest(manifest)
+            _write_manifest(cfg, manifest)
+
+    except OSError as e:
+        raise StorageError(f"Error appending to history log: {str(e)}") from e
+
+
+def _select_segments(
+    manifest: dict[str, Any],
+    start: str | None,
+    end: str | None,
+    pairs: set[str] | None,
+) -> list[str]:
+    """Ключи сегментов, пересекающихся с диапазоном и набором пар."""
+    selected = []
+    for key, entry in manifest["segments"].items():
+        if entry["start"] is None:
+            continue
+        if start is not None and entry["end"] < start:
+            continue
+        if end is not None and entry["start"] > end:
+            continue
+        if pairs is not None and not pairs.intersection(entry["pairs"]):
+            continue
+        selected.append(key)
+    return selected
+
+
+def iter_history_records(
+    start: str | None = None,
+    end: str | None = None,
+    pairs: list[str] | None = None,
+    config: ParserConfig | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Итерация по записям истории с фильтром по времени и парам.
+
+    Читаются только сегменты, которые по манифесту пересекаются с
+    диапазоном [start, end] и содержат хотя бы одну из пар.
+
+    Args:
+        start: Нижняя граница updated_at включительно (ISO 8601 UTC)
+        end: Верхняя граница updated_at включительно (ISO 8601 UTC)
+        pairs: Список пар "FROM_TO" (все пары если None)
+        config: Экземпляр ParserConfig (опционально)
+
+    Yields:
+        Записи истории в хронологическом порядке сегментов.
+
+    Raises:
+        StorageError: Если чтение не удалось.
+    """
+    cfg = config or get_parser_config()
+    manifest = read_history_manifest(cfg)
+    pair_set = set(pairs) if pairs is not None else None
+
+    for key in _select_segments(manifest, start, end, pair_set):
+        filepath = _history_dir(cfg) / manifest["segments"][key]["file"]
+        try:
+            records = _read_segment(filepath)
+        except OSError as e:
+            raise StorageError(f"Error reading history segment {key}: {str(e)}") from e
+
+        for record in records:
+            timestamp = record.get("updated_at", "")
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp > end:
+                continue
+            pair = f"{record['from']}_{record['to']}"
+            if pair_set is not None and pair not in pair_set:
+                continue
+            yield record
+
+
+def last_history_records_before(
+    before: str, pairs: list[str] | None = None, config: ParserConfig | None = None
+) -> dict[str, dict[str, Any]]:
+    """Последняя запись каждой пары строго раньше момента before.
+
+    Сегменты читаются от ближайшего к before назад, пока для каждой пары,
+    встречающейся в более ранних сегментах, не найдена запись. Обычно
+    достаточно одного сегмента.
+
+    Args:
+        before: Граница updated_at, не включительно (ISO 8601 UTC)
+        pairs: Список пар "FROM_TO" (все пары если None)
+        config: Экземпляр ParserConfig (опционально)
+
+    Returns:
+        Словарь {"BTC_USD": запись, ...}; пары без записей до before
+        отсутствуют.
+
+    Raises:
+        StorageError: Если чтение не удалось.
+    """
+    cfg = config or get_parser_config()
+    manifest = read_history_manifest(cfg)
+    pair_set = set(pairs) if pairs is not None else None
+
+    earlier = [
+        key
+        for key in _select_segments(manifest, None, before, pair_set)
+        if manifest["segments"][key]["start"] < before
+    ]
+    pending = set().union(*(manifest["segments"][key]["pairs"] for key in earlier))
+    if pair_set is not None:
+        pending &= pair_set
+
+    found: dict[str, dict[str, Any]] = {}
+    for key in sorted(earlier, reverse=True):
+        if not pending:
+            break
+        if pending.isdisjoint(manifest["segments"][key]["pairs"]):
+            continue
+        filepath = _history_dir(cfg) / manifest["segments"][key]["file"]
+        try:
+            records = _read_segment(filepath)
+        except OSError as e:
+            raise StorageError(f"Error reading history segment {key}: {str(e)}") from e
+
+        latest: dict[str, dict[str, Any]] = {}
+        for record in records:
+            timestamp = record.get("updated_at", "")
+            pair = f"{record['from']}_{record['to']}"
+            if timestamp >= before or pair not in pending:
+                continue
+            if pair not in latest or timestamp >= latest[pair]["updated_at"]:
+                latest[pair] = record
+        found.update(latest)
+        pending -= latest.keys()
+
+    return found
+
+
+def read_exchange_rates_history(
+    config: ParserConfig | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    pairs: list[str] | None = None,
+) -> dict[str, Any]:
+    """Чтение истории курсов из сегментов.
+
+    При первом вызове история старых форматов мигрируется в сегменты.
+    Фильтры start/end/pairs позволяют не читать лишние сегменты.
 
     Args:
         config: Экземпляр ParserConfig (опционально)
+        start: Нижняя граница updated_at включительно (опционально)
+        end: Верхняя граница updated_at включительно (опционально)
+        pairs: Список пар "FROM_TO" (опционально)
 
     Returns:
         Словарь со структурой:
@@ -133,100 +817,448 @@ def read_exchange_rates_history(config: ParserConfig | None = None) -> dict[str,
         }
 
     Raises:
-        StorageError: Если чтение файла не удалось или JSON невалиден.
+        StorageError: Если чтение истории не удалось или JSON невалиден.
     """
     cfg = config or get_parser_config()
-    filepath = Path(cfg.HISTORY_FILE_PATH)
+    manifest = read_history_manifest(cfg)
+    records = list(iter_history_records(start, end, pairs, cfg))
 
-    try:
-        if not filepath.exists():
-            logger.warning(
-                f"History file not found: {filepath}. Creating default structure."
-            )
-            return {"history": [], "last_updated": None}
+    logger.debug(f"✓ Loaded {len(records)} history records from {_history_dir(cfg)}")
+    return {"history": records, "last_updated": manifest["last_updated"]}
 
-        with open(filepath, encoding="utf-8") as f:
-            data = json.load(f)
 
-        # Валидация структуры
-        if not isinstance(data, dict):
-            raise StorageError(
-                f"Invalid history file format: expected dict, got {type(data)}"
-            )
+def load_history_series(
+    config: ParserConfig | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    pairs: list[str] | None = None,
+) -> dict[str, PairSeries]:
+    """Загрузка истории курсов в колоночном виде по парам.
 
-        if "history" not in data:
-            logger.warning("Missing 'history' key in file, initializing empty history")
-            data["history"] = []
+    Альтернатива read_exchange_rates_history для больших объемов: вместо
+    списка словарей каждая пара хранится в PairSeries (array('q') времени
+    и array('d') курсов). Записи восстанавливаются без потерь через
+    PairSeries.to_records().
 
-        logger.debug(
-            f"✓ Loaded {len(data.get('history', []))} history records from {filepath}"
-        )
-        return data
+    Args:
+        config: Экземпляр ParserConfig (опционально)
+        start: Нижняя граница updated_at включительно (опционально)
+        end: Верхняя граница updated_at включительно (опционально)
+        pairs: Список пар "FROM_TO" (опционально)
 
-    except json.JSONDecodeError as e:
-        raise StorageError(f"Invalid JSON in history file: {str(e)}") from e
-    except OSError as e:
-        raise StorageError(f"Error reading history file: {str(e)}") from e
+    Returns:
+        Словарь {"BTC_USD": PairSeries, ...}, ряды отсортированы по времени.
+
+    Raises:
+        StorageError: Если чтение истории не удалось.
+    """
+    cfg = config or get_parser_config()
+    series = build_series(iter_history_records(start, end, pairs, cfg))
+
+    logger.debug(
+        f"✓ Loaded {sum(len(s) for s in series.values())} history records "
+        f"into {len(series)} series"
+    )
+    return series
 
 
 def write_exchange_rates_history(
     data: dict[str, Any], config: ParserConfig | None = None
 ) -> None:
-    """Запись файла истории exchange_rates.json с атомарной записью.
+    """Полная перезапись истории курсов.
 
-    Использует паттерн temp file → rename для атомарности.
+    Каждый сегмент записывается через temp file → rename. Для добавления
+    новых записей используйте add_history_records — они не переписывают
+    сегменты целиком.
 
     Args:
-        data: Данные истории для записи
+        data: Данные истории для записи ({"history": [...], ...})
         config: Экземпляр ParserConfig (опционально)
 
     Raises:
         StorageError: Если запись не удалась.
     """
     cfg = config or get_parser_config()
-    filepath = Path(cfg.HISTORY_FILE_PATH)
+    records = data.get("history", [])
 
     try:
-        # Убедиться что директория существует
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-
-        # Сначала записать во временный файл
-        with tempfile.NamedTemporaryFile(
-            mode="w",
-            encoding="utf-8",
-            dir=filepath.parent,
-            delete=False,
-            suffix=".tmp",
-        ) as tmp_file:
-            json.dump(data, tmp_file, indent=2, ensure_ascii=False)
-            tmp_path = tmp_file.name
-
-        # Атомарное переименование
-        os.replace(tmp_path, filepath)
+        _ensure_history_store(cfg)
+        with _manifest_lock(cfg).write_locked():
+            _write_segments(records, cfg)
+    except (OSError, TypeError, ValueError) as e:
+        raise StorageError(f"Error writing history: {str(e)}") from e
 
-        logger.debug(
-            f"✓ Saved {len(data.get('history', []))} history records to {filepath}"
+    logger.debug(f"✓ Saved {len(records)} history records to {_history_dir(cfg)}")
+
+
+def compress_history_segments(
+    older_than_days: int | None = None, config: ParserConfig | None = None
+) -> int:
+    """Сжать закрытые сегменты истории старше заданного возраста.
+
+    Алгоритм сжатия задается HISTORY_COMPRESSION ("gzip" или "lzma").
+    Сжатый сегмент записывается атомарно, после чего несжатый удаляется.
+    Сегмент текущего периода никогда не сжимается.
+
+    Args:
+        older_than_days: Минимальный возраст конца сегмента в днях
+            (по умолчанию HISTORY_COMPRESS_AFTER_DAYS)
+        config: Экземпляр ParserConfig (опционально)
+
+    Returns:
+        Количество сжатых сегментов.
+
+    Raises:
+        StorageError: Если сжатие не удалось.
+    """
+    cfg = config or get_parser_config()
+    days = older_than_days
+    if days is None:
+        days = cfg.HISTORY_COMPRESS_AFTER_DAYS
+    suffix, module = SEGMENT_COMPRESSORS[cfg.HISTORY_COMPRESSION]
+
+    now = datetime.utcnow()
+    cutoff = (now - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    current_key = segment_key(
+        now.strftime("%Y-%m-%dT%H:%M:%SZ"), cfg.HISTORY_SEGMENT_PERIOD
+    )
+
+    history_dir = _history_dir(cfg)
+    compressed = 0
+
+    try:
+        with _manifest_lock(cfg).write_locked():
+            manifest = read_history_manifest(cfg)
+            for key, entry in manifest["segments"].items():
+                if entry["compressed"] or key >= current_key:
+                    continue
+                if entry["end"] is None or entry["end"] >= cutoff:
+                    continue
+
+                source = history_dir / entry["file"]
+                filename = f"{key}.jsonl{suffix}"
+                target = history_dir / filename
+                _write_bytes_atomic(target, module.compress(source.read_bytes()))
+                source.unlink()
+
+                entry["file"] = filename
+                entry["compressed"] = cfg.HISTORY_COMPRESSION
+                entry["size"] = target.stat().st_size
+                compressed += 1
+
+            if compressed:
+                _write_manifest(cfg, manifest)
+
+    except OSError as e:
+        raise StorageError(f"Error compressing history segments: {str(e)}") from e
+
+    if compressed:
+        logger.info(f"✓ Compressed {compressed} history segments")
+    return compressed
+
+
+# =============================================================================
+# history/candles/ - OHLC свечи и удаление сырой истории
+# =============================================================================
+#
+# Свечи хранятся сегментами так же, как сырая история:
+# history/candles/<interval>/<segment_key>.jsonl — свечи, построенные по
+# одному закрытому сегменту. history/candles/rollups.json отмечает, какие
+# сегменты уже свернуты, в какие интервалы и при каком числе записей,
+# чтобы сырые сегменты можно было удалять без потери данных, а сегменты,
+# в которые позже дописаны тики, сворачивались заново.
+
+CANDLES_DIR_NAME = "candles"
+ROLLUP_STATE_NAME = "rollups.json"
+
+
+def _candles_dir(cfg: ParserConfig, interval: str | None = None) -> Path:
+    """Директория свечей (или свечей одного интервала)."""
+    candles_dir = _history_dir(cfg) / CANDLES_DIR_NAME
+    return candles_dir / interval if interval else candles_dir
+
+
+def _rollup_state_lock(cfg: ParserConfig) -> FileLock:
+    """Блокировка rollups.json (потоки и процессы)."""
+    return get_file_lock(_candles_dir(cfg) / ROLLUP_STATE_NAME)
+
+
+def _write_rollup_state(cfg: ParserConfig, state: dict[str, Any]) -> None:
+    """Записать rollups.json (под _rollup_state_lock(cfg).write_locked()).
+
+    Raises:
+        OSError: Если запись не удалась.
+    """
+    _write_json_atomic(_candles_dir(cfg) / ROLLUP_STATE_NAME, state)
+    _rollup_state_lock(cfg).bump_generation()
+
+
+def read_rollup_state(config: ParserConfig | None = None) -> dict[str, Any]:
+    """Чтение состояния свертки истории в свечи.
+
+    Args:
+        config: Экземпляр ParserConfig (опционально)
+
+    Returns:
+        Словарь со структурой:
+        {
+            "segments": {
+                "2025-10-10": {
+                    "end": "2025-10-10T23:00:01Z",
+                    "record_count": 192,
+                    "intervals": ["1m", "1h", "1d"]
+                },
+                ...
+            }
+        }
+
+    Raises:
+        StorageError: Если файл состояния невалиден или чтение не удалось.
+    """
+    cfg = config or get_parser_config()
+    filepath = _candles_dir(cfg) / ROLLUP_STATE_NAME
+
+    try:
+        if not filepath.exists():
+            return {"segments": {}}
+        with open(filepath, encoding="utf-8") as f:
+            return json.load(f)
+    except json.JSONDecodeError as e:
+        raise StorageError(f"Invalid JSON in rollup state: {str(e)}") from e
+    except OSError as e:
+        raise StorageError(f"Error reading rollup state: {str(e)}") from e
+
+
+def write_candle_segment(
+    interval: str,
+    key: str,
+    candles: list[dict[str, Any]],
+    end: str | None,
+    config: ParserConfig | None = None,
+    record_count: int | None = None,
+) -> None:
+    """Атомарная запись свечей одного сегмента и отметка о свертке.
+
+    Повторная свертка того же сегмента перезаписывает файл целиком,
+    поэтому операция идемпотентна. Если число записей сегмента
+    изменилось с прошлой свертки (дозапись или догрузка тиков),
+    отметки о свертке в другие интервалы сбрасываются: их свечи
+    устарели.
+
+    Args:
+        interval: Интервал свечей ("1m", "1h", "1d")
+        key: Ключ исходного сегмента истории ("2025-10-10")
+        candles: Свечи в формате rollup.build_candles
+        end: Последний updated_at исходного сегмента
+        config: Экземпляр ParserConfig (опционально)
+        record_count: Число записей исходного сегмента (сигнатура,
+            по которой определяется, что сегмент изменился)
+
+    Raises:
+        StorageError: Если запись не удалась.
+    """
+    cfg = config or get_parser_config()
+
+    try:
+        _write_bytes_atomic(
+            _candles_dir(cfg, interval) / f"{key}.jsonl", _encode_records(candles)
         )
 
+        with _rollup_state_lock(cfg).write_locked():
+            state = read_rollup_state(cfg)
+            entry = state["segments"].setdefault(key, {"end": end, "intervals": []})
+            if entry.get("record_count") != record_count:
+                entry["intervals"] = []
+            entry["end"] = end
+            entry["record_count"] = record_count
+            if interval not in entry["intervals"]:
+                entry["intervals"].append(interval)
+            state["segments"] = dict(sorted(state["segments"].items()))
+            _write_rollup_state(cfg, state)
+
     except OSError as e:
-        # Очистить временный файл если он существует
-        if "tmp_path" in locals() and Path(tmp_path).exists():
-            Path(tmp_path).unlink()
-        raise StorageError(f"Error writing history file: {str(e)}") from e
+        raise StorageError(f"Error writing candles {interval}/{key}: {str(e)}") from e
 
+    logger.debug(f"✓ Saved {len(candles)} {interval} candles for segment {key}")
 
-def add_history_record(
+
+def iter_candles(
+    interval: str,
+    start: str | None = None,
+    end: str | None = None,
+    pairs: list[str] | None = None,
+    config: ParserConfig | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Итерация по свечам интервала с фильтром по времени и парам.
+
+    Args:
+        interval: Интервал свечей ("1m", "1h", "1d")
+        start: Нижняя граница начала свечи включительно (опционально)
+        end: Верхняя граница начала свечи включительно (опционально)
+        pairs: Список пар "FROM_TO" (опционально)
+        config: Экземпляр ParserConfig (опционально)
+
+    Yields:
+        Свечи в хронологическом порядке сегментов.
+
+    Raises:
+        StorageError: Если чтение не удалось.
+    """
+    cfg = config or get_parser_config()
+    interval_dir = _candles_dir(cfg, interval)
+    if not interval_dir.exists():
+        return
+
+    pair_set = set(pairs) if pairs is not None else None
+    start_key = segment_key(start, cfg.HISTORY_SEGMENT_PERIOD) if start else None
+    end_key = segment_key(end, cfg.HISTORY_SEGMENT_PERIOD) if end else None
+
+    for filepath in sorted(interval_dir.glob("*.jsonl")):
+        key = filepath.name[: -len(".jsonl")]
+        if (start_key and key < start_key) or (end_key and key > end_key):
+            continue
+        try:
+            candles = _read_segment(filepath)
+        except OSError as e:
+            raise StorageError(
+                f"Error reading candles {interval}/{key}: {str(e)}"
+            ) from e
+
+        for candle in candles:
+            if start is not None and candle["start"] < start:
+                continue
+            if end is not None and candle["start"] > end:
+                continue
+            if pair_set is not None and candle["pair"] not in pair_set:
+                continue
+            yield candle
+
+
+def delete_candle_segments(
+    interval: str, keys: list[str], config: ParserConfig | None = None
+) -> int:
+    """Удалить файлы свечей интервала для указанных сегментов.
+
+    Args:
+        interval: Интервал свечей ("1m", "1h", "1d")
+        keys: Ключи сегментов
+        config: Экземпляр ParserConfig (опционально)
+
+    Returns:
+        Количество удаленных файлов.
+
+    Raises:
+        StorageError: Если удаление не удалось.
+    """
+    cfg = config or get_parser_config()
+    deleted = 0
+
+    try:
+        for key in keys:
+            filepath = _candles_dir(cfg, interval) / f"{key}.jsonl"
+            if filepath.exists():
+                filepath.unlink()
+                deleted += 1
+    except OSError as e:
+        raise StorageError(f"Error deleting {interval} candles: {str(e)}") from e
+
+    return deleted
+
+
+def prune_rollup_state(config: ParserConfig | None = None) -> int:
+    """Убрать из rollups.json сегменты, от которых ничего не осталось.
+
+    Запись удаляется, если сырого сегмента уже нет в манифесте и нет ни
+    одного файла свечей этого сегмента (все удалены по сроку хранения).
+    Блокировки берутся в порядке rollups.json → манифест.
+
+    Args:
+        config: Экземпляр ParserConfig (опционально)
+
+    Returns:
+        Количество удаленных записей состояния.
+
+    Raises:
+        StorageError: Если чтение или запись не удались.
+    """
+    cfg = config or get_parser_config()
+
+    with _rollup_state_lock(cfg).write_locked():
+        state = read_rollup_state(cfg)
+        segments = read_history_manifest(cfg)["segments"]
+
+        stale = [
+            key
+            for key, entry in state["segments"].items()
+            if key not in segments
+            and not any(
+                (_candles_dir(cfg, interval) / f"{key}.jsonl").exists()
+                for interval in entry.get("intervals", [])
+            )
+        ]
+        if not stale:
+            return 0
+
+        try:
+            for key in stale:
+                del state["segments"][key]
+            _write_rollup_state(cfg, state)
+        except OSError as e:
+            raise StorageError(f"Error writing rollup state: {str(e)}") from e
+
+    logger.debug(f"✓ Pruned {len(stale)} rollup state entries")
+    return len(stale)
+
+
+def delete_history_segments(keys: list[str], config: ParserConfig | None = None) -> int:
+    """Удалить сегменты сырой истории и убрать их из манифеста.
+
+    Args:
+        keys: Ключи сегментов ("2025-10-10")
+        config: Экземпляр ParserConfig (опционально)
+
+    Returns:
+        Количество удаленных сегментов.
+
+    Raises:
+        StorageError: Если удаление не удалось.
+    """
+    cfg = config or get_parser_config()
+    deleted = 0
+
+    try:
+        with _manifest_lock(cfg).write_locked():
+            manifest = read_history_manifest(cfg)
+            for key in keys:
+                entry = manifest["segments"].pop(key, None)
+                if entry is None:
+                    continue
+                (_history_dir(cfg) / entry["file"]).unlink(missing_ok=True)
+                deleted += 1
+
+            if deleted:
+                _finalize_manifest(manifest)
+                _write_manifest(cfg, manifest)
+
+    except OSError as e:
+        raise StorageError(f"Error deleting history segments: {str(e)}") from e
+
+    if deleted:
+        logger.info(f"✓ Deleted {deleted} raw history segments")
+    return deleted
+
+
+def build_history_record(
     pair: str,
     rate: float,
     source: str,
     timestamp: str | None = None,
     raw_id: str | None = None,
     request_ms: int | None = None,
-    status_code: int = 200,
+    status_code: int | None = 200,
     etag: str | None = None,
-    config: ParserConfig | None = None,
 ) -> dict[str, Any]:
-    """Добавление новой записи в историю exchange_rates.json.
+    """Сборка и валидация записи истории без записи на диск.
 
     Args:
         pair: Валютная пара в формате "FROM_TO" (например, "BTC_USD")
@@ -237,13 +1269,12 @@ def add_history_record(
         request_ms: Длительность запроса в миллисекундах (опционально)
         status_code: HTTP статус код (по умолчанию: 200)
         etag: Значение заголовка ETag (опционально)
-        config: Экземпляр ParserConfig (опционально)
 
     Returns:
-        Созданный словарь записи
+        Словарь записи в формате истории
 
     Raises:
-        StorageError: Если валидация не удалась или запись не удалась.
+        ValueError: Если пара или коды валют невалидны.
     """
     # Парсинг и валидация пары
     from_currency, to_currency = parse_pair(pair)
@@ -275,18 +1306,95 @@ def add_history_record(
     if etag is not None:
         record["etag"] = etag
 
-    # Чтение текущей истории
-    history_data = read_exchange_rates_history(config)
+    return record
 
-    # Добавление новой записи
-    history_data["history"].append(record)
-    history_data["last_updated"] = timestamp
 
-    # Запись обратно
-    write_exchange_rates_history(history_data, config)
+def add_history_record(
+    pair: str,
+    rate: float,
+    source: str,
+    timestamp: str | None = None,
+    raw_id: str | None = None,
+    request_ms: int | None = None,
+    status_code: int = 200,
+    etag: str | None = None,
+    config: ParserConfig | None = None,
+) -> dict[str, Any]:
+    """Добавление новой записи в историю курсов.
 
-    logger.info(f"✓ Added history record: {record_id}")
-    return record
+    Запись дописывается в конец сегмента своего дня, стоимость операции
+    не зависит от размера накопленной истории. Для сохранения всех пар
+    одного обновления используйте add_history_records.
+
+    Args:
+        pair: Валютная пара в формате "FROM_TO" (например, "BTC_USD")
+        rate: Значение курса обмена
+        source: Название источника данных (например, "CoinGecko")
+        timestamp: ISO 8601 UTC timestamp (текущее время если None)
+        raw_id: Оригинальный ID из внешнего API (опционально)
+        request_ms: Длительность запроса в миллисекундах (опционально)
+        status_code: HTTP статус код (по умолчанию: 200)
+        etag: Значение заголовка ETag (опционально)
+        config: Экземпляр ParserConfig (опционально)
+
+    Returns:
+        Созданный словарь записи
+
+    Raises:
+        StorageError: Если валидация не удалась или запись не удалась.
+    """
+    return add_history_records(
+        [
+            {
+                "pair": pair,
+                "rate": rate,
+                "source": source,
+                "timestamp": timestamp,
+                "raw_id": raw_id,
+                "request_ms": request_ms,
+                "status_code": status_code,
+                "etag": etag,
+            }
+        ],
+        config,
+    )[0]
+
+
+def add_history_records(
+    records: list[dict[str, Any]], config: ParserConfig | None = None
+) -> list[dict[str, Any]]:
+    """Пакетное добавление записей в историю курсов.
+
+    Все записи валидируются до записи и дописываются в сегменты одной
+    операцией на сегмент с одним обновлением манифеста.
+
+    Args:
+        records: Список словарей с аргументами build_history_record:
+            [{"pair": "BTC_USD", "rate": 59337.21, "source": "CoinGecko",
+              "timestamp": "2025-10-10T12:00:01Z", "raw_id": "bitcoin"}, ...]
+        config: Экземпляр ParserConfig (опционально)
+
+    Returns:
+        Список созданных записей в порядке входных данных
+
+    Raises:
+        ValueError: Если хотя бы одна запись невалидна (ничего не записано).
+        StorageError: Если запись не удалась.
+    """
+    cfg = config or get_parser_config()
+
+    built = [build_history_record(**item) for item in records]
+    if not built:
+        return []
+
+    # Дозапись в сегменты
+    _append_history_log(built, cfg)
+
+    if len(built) == 1:
+        logger.info(f"✓ Added history record: {built[0]['id']}")
+    else:
+        logger.info(f"✓ Added {len(built)} history records")
+    return built
 
 
 # =============================================================================
@@ -297,6 +1405,9 @@ def add_history_record(
 def read_rates_cache(config: ParserConfig | None = None) -> dict[str, Any]:
     """Чтение файла кеша rates.json.
 
+    Чтение выполняется под разделяемой блокировкой файла (потоки и
+    процессы), поэтому не пересекается с записью.
+
     Args:
         config: Экземпляр ParserConfig (опционально)
 
@@ -321,38 +1432,16 @@ def read_rates_cache(config: ParserConfig | None = None) -> dict[str, Any]:
     filepath = Path(cfg.RATES_FILE_PATH)
 
     try:
-        if not filepath.exists():
-            logger.warning(
-                f"Cache file not found: {filepath}. Creating default structure."
-            )
-            return {"pairs": {}, "last_refresh": None}
-
-        with open(filepath, encoding="utf-8") as f:
-            data = json.load(f)
-
-        # Поддержка миграции старого формата
-        if "rates" in data and "pairs" not in data:
-            logger.info("Migrating old rates.json format to new format")
-            # Старый формат: {"rates": {"USD": 1.0, "EUR": 1.08},
-            #                 "base_currency": "USD", ...}
-            # Новый формат: {"pairs": {"EUR_USD": {"rate": 1.08, ...}}, ...}
-            old_rates = data.get("rates", {})
-            base_currency = data.get("base_currency", "USD")
-            updated_at = data.get(
-                "updated_at", datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-            )
-
-            pairs = {}
-            for currency, rate in old_rates.items():
-                if currency != base_currency:
-                    pair_key = f"{currency}_{base_currency}"
-                    pairs[pair_key] = {
-                        "rate": float(rate),
-                        "updated_at": updated_at,
-                        "source": "migrated",
-                    }
+        with get_file_lock(filepath).read_locked():
+            if not filepath.exists():
+                logger.warning(
+                    f"Cache file not found: {filepath}. Creating default structure."
+                )
+                return {"pairs": {}, "last_refresh": None}
 
-            data = {"pairs": pairs, "last_refresh": updated_at}
+            # Пишется всегда JSON; файл, записанный раньше кодеком
+            # "data_codec", определяется по заголовку и тоже читается
+            data = codecs.decode(filepath.read_bytes())
 
         # Валидация структуры
         if not isinstance(data, dict):
@@ -360,9 +1449,13 @@ def read_rates_cache(config: ParserConfig | None = None) -> dict[str, Any]:
                 f"Invalid cache file format: expected dict, got {type(data)}"
             )
 
-        if "pairs" not in data:
+        # Поддержка миграции старого формата
+        # (та же нормализация, что и в книге курсов core.ratebook)
+        if "rates" in data and "pairs" not in data:
+            logger.info("Migrating old rates.json format to new format")
+        elif "pairs" not in data:
             logger.warning("Missing 'pairs' key in file, initializing empty pairs")
-            data["pairs"] = {}
+        data = normalize_rates_data(data)
 
         logger.debug(
             f"✓ Loaded {len(data.get('pairs', {}))} cached pairs from {filepath}"
@@ -371,6 +1464,8 @@ def read_rates_cache(config: ParserConfig | None = None) -> dict[str, Any]:
 
     except json.JSONDecodeError as e:
         raise StorageError(f"Invalid JSON in cache file: {str(e)}") from e
+    except ValueError as e:
+        raise StorageError(f"Invalid cache file: {str(e)}") from e
     except OSError as e:
         raise StorageError(f"Error reading cache file: {str(e)}") from e
 
@@ -380,7 +1475,10 @@ def write_rates_cache(
 ) -> None:
     """Запись файла кеша rates.json с атомарной записью.
 
-    Использует паттерн temp file → rename для атомарности.
+    Использует паттерн temp file → rename для атомарности. Файл всегда
+    записывается в JSON (настройка "data_codec" на него не влияет).
+    Запись выполняется под монопольной блокировкой файла и увеличивает
+    его поколение, чтобы кеши других процессов были сброшены.
 
     Args:
         data: Данные кеша для записи
@@ -393,29 +1491,16 @@ def write_rates_cache(
     filepath = Path(cfg.RATES_FILE_PATH)
 
     try:
-        # Убедиться что директория существует
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-
-        # Сначала записать во временный файл
-        with tempfile.NamedTemporaryFile(
-            mode="w",
-            encoding="utf-8",
-            dir=filepath.parent,
-            delete=False,
-            suffix=".tmp",
-        ) as tmp_file:
-            json.dump(data, tmp_file, indent=2, ensure_ascii=False)
-            tmp_path = tmp_file.name
-
-        # Атомарное переименование
-        os.replace(tmp_path, filepath)
+        lock = get_file_lock(filepath)
+        with lock.write_locked():
+            # Временный файл → атомарное переименование; rates.json читают
+            # внешние инструменты, поэтому он всегда в JSON
+            atomic_write(filepath, encode_json(data))
+            lock.bump_generation()
 
         logger.debug(f"✓ Saved {len(data.get('pairs', {}))} cached pairs to {filepath}")
 
     except OSError as e:
-        # Очистить временный файл если он существует
-        if "tmp_path" in locals() and Path(tmp_path).exists():
-            Path(tmp_path).unlink()
         raise StorageError(f"Error writing cache file: {str(e)}") from e
 
 
@@ -442,34 +1527,39 @@ def update_rates_cache(
     if timestamp is None:
         timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    # Чтение текущего кеша
-    cache_data = read_rates_cache(config)
-
-    # Обновление пар
-    updated_count = 0
-    for pair, rate in rates.items():
-        # Валидация формата пары
-        parse_pair(pair)  # Вызовет ValueError если невалидно
-
-        # Проверка нужно ли обновление
-        if pair in cache_data["pairs"]:
-            cached_timestamp = cache_data["pairs"][pair].get("updated_at", "")
-            if cached_timestamp >= timestamp:
-                logger.debug(f"Skipping {pair}: cached data is fresher")
-                continue
-
-        # Обновление пары
-        cache_data["pairs"][pair] = {
-            "rate": float(rate),
-            "updated_at": timestamp,
-            "source": source,
-        }
-        updated_count += 1
-
-    # Обновление last_refresh
-    cache_data["last_refresh"] = timestamp
+    cfg = config or get_parser_config()
 
-    # Запись обратно
-    write_rates_cache(cache_data, config)
+    # Чтение и запись под одной монопольной блокировкой: обновления из
+    # разных процессов не теряют пары друг друга
+    with get_file_lock(Path(cfg.RATES_FILE_PATH)).write_locked():
+        # Чтение текущего кеша
+        cache_data = read_rates_cache(cfg)
+
+        # Обновление пар
+        updated_count = 0
+        for pair, rate in rates.items():
+            # Валидация формата пары
+            parse_pair(pair)  # Вызовет ValueError если невалидно
+
+            # Проверка нужно ли обновление
+            if pair in cache_data["pairs"]:
+                cached_timestamp = cache_data["pairs"][pair].get("updated_at", "")
+                if cached_timestamp >= timestamp:
+                    logger.debug(f"Skipping {pair}: cached data is fresher")
+                    continue
+
+            # Обновление пары
+            cache_data["pairs"][pair] = {
+                "rate": float(rate),
+                "updated_at": timestamp,
+                "source": source,
+            }
+            updated_count += 1
+
+        # Обновление last_refresh
+        cache_data["last_refresh"] = timestamp
+
+        # Запись обратно
+        write_rates_cache(cache_data, cfg)
 
     logger.info(f"✓ Updated {updated_count} pairs in cache (source: {source})")
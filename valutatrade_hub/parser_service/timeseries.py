@@ -0,0 +1,350 @@
+"""Колоночное представление истории курсов в памяти.
+
+Вместо списка словарей с строковыми id история одной валютной пары
+хранится в плотных буферах array:
+- timestamps: array('q') — epoch-секунды UTC
+- rates: array('d') — значения курса
+
+Метаданные записей (source, raw_id, request_ms, status_code) хранятся в
+компактных колонках, которые создаются только при первом непустом
+значении; строки интернируются в таблицу серии. Поля, которые не
+укладываются в каноническую схему записи (etag, нестандартный id,
+лишние ключи), хранятся в разреженном словаре по номеру строки, поэтому
+преобразование запись → серия → запись выполняется без потерь.
+"""
+
+from array import array
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timezone
+from typing import Any
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+Timestamp = datetime | str | int | float
+
+# Ключи, которые раскладываются по колонкам
+_CORE_KEYS = frozenset(
+    {
+        "id",
+        "from",
+        "to",
+        "rate",
+        "updated_at",
+        "source",
+        "raw_id",
+        "request_ms",
+        "status_code",
+    }
+)
+
+# Значение-заглушка "нет значения" в числовых колонках метаданных
+_MISSING = -1
+
+
+def to_epoch(ts: Timestamp) -> int:
+    """Привести момент времени к Unix epoch (секунды, UTC).
+
+    Args:
+        ts: ISO 8601 UTC строка ("2025-10-10T12:00:01Z"), datetime
+            (naive считается UTC, как datetime.utcnow() в updater)
+            или число секунд epoch.
+
+    Returns:
+        Целое число секунд epoch.
+
+    Raises:
+        ValueError: Если строка не в формате ISO 8601.
+        TypeError: Если тип не поддерживается.
+    """
+    if isinstance(ts, bool):
+        raise TypeError(f"Unsupported timestamp type: {type(ts)}")
+    if isinstance(ts, (int, float)):
+        return int(ts)
+    if isinstance(ts, str):
+        if ts.endswith("Z"):
+            ts = ts[:-1] + "+00:00"
+        ts = datetime.fromisoformat(ts)
+    if isinstance(ts, datetime):
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        return int(ts.timestamp())
+    raise TypeError(f"Unsupported timestamp type: {type(ts)}")
+
+
+def from_epoch(epoch: int) -> str:
+    """Преобразовать epoch в ISO 8601 UTC строку формата истории."""
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+class PairSeries:
+    """Временной ряд курсов одной валютной пары в колоночном виде.
+
+    Attributes:
+        from_currency: Код исходной валюты.
+        to_currency: Код целевой валюты.
+        timestamps: array('q') с epoch-секундами записей.
+        rates: array('d') со значениями курса.
+
+    Example:
+        >>> series = PairSeries("BTC", "USD")
+        >>> series.append(record)
+        >>> series.to_records() == [record]
+        True
+    """
+
+    def __init__(self, from_currency: str, to_currency: str) -> None:
+        """Создать пустой ряд для пары.
+
+        Args:
+            from_currency: Код исходной валюты (например, "BTC").
+            to_currency: Код целевой валюты (например, "USD").
+        """
+        self.from_currency = from_currency
+        self.to_currency = to_currency
+        self.timestamps = array("q")
+        self.rates = array("d")
+
+        # Интернированные строки; индекс 0 означает "нет значения"
+        self._strings: list[str | None] = [None]
+        self._string_index: dict[str, int] = {}
+
+        # Колонки метаданных создаются при первом непустом значении
+        self._sources: array | None = None
+        self._raw_ids: array | None = None
+        self._request_ms: array | None = None
+        self._status_codes: array | None = None
+
+        # Разреженные поля вне канонической схемы {номер строки: {...}}
+        self._extras: dict[int, dict[str, Any]] = {}
+
+    @property
+    def pair(self) -> str:
+        """Валютная пара в формате "FROM_TO"."""
+        return f"{self.from_currency}_{self.to_currency}"
+
+    # --- Колонки метаданных ---
+
+    def _intern(self, value: str | None) -> int:
+        """Индекс строки в таблице серии (0 для None)."""
+        if value is None:
+            return 0
+        idx = self._string_index.get(value)
+        if idx is None:
+            idx = len(self._strings)
+            self._strings.append(value)
+            self._string_index[value] = idx
+        return idx
+
+    def _store(
+        self, column: array | None, typecode: str, value: int, fill: int
+    ) -> array | None:
+        """Дописать значение в колонку, создав ее при первом непустом значении.
+
+        Args:
+            column: Текущая колонка или None.
+            typecode: Тип элементов array для новой колонки.
+            value: Записываемое значение.
+            fill: Значение "нет данных" для предыдущих строк.
+
+        Returns:
+            Колонка после дозаписи (или None, если значений еще не было).
+        """
+        if column is None:
+            if value == fill:
+                return None
+            column = array(typecode, [fill]) * (len(self.timestamps) - 1)
+        column.append(value)
+        return column
+
+    # --- Добавление записей ---
+
+    def append(self, record: dict[str, Any]) -> None:
+        """Добавить запись истории в конец ряда.
+
+        Args:
+            record: Запись в формате storage.add_history_record
+                (обязательны ключи id, from, to, rate, updated_at).
+
+        Raises:
+            ValueError: Если запись относится к другой паре.
+        """
+        if record["from"] != self.from_currency or record["to"] != self.to_currency:
+            raise ValueError(
+                f"Record {record.get('id')} does not belong to pair {self.pair}"
+            )
+
+        epoch = to_epoch(record["updated_at"])
+        rate = float(record["rate"])
+
+        # Все, что не восстанавливается из колонок, — в разреженные поля
+        extras = {k: v for k, v in record.items() if k not in _CORE_KEYS}
+        if record["updated_at"] != from_epoch(epoch):
+            extras["updated_at"] = record["updated_at"]
+        if record["id"] != f"{self.pair}_{record['updated_at']}":
+            extras["id"] = record["id"]
+        if type(record["rate"]) is not float:
+            extras["rate"] = record["rate"]
+
+        values = {}
+        for key in ("source", "raw_id", "request_ms", "status_code"):
+            value = record.get(key)
+            if key in record and (value is None or not _fits_column(key, value)):
+                # Явный None и нестандартные значения — без потерь в extras
+                extras[key] = value
+                value = None
+            values[key] = value
+
+        # Запись в колонки — только после разбора всей записи
+        self.timestamps.append(epoch)
+        self.rates.append(rate)
+        row = len(self.timestamps) - 1
+
+        self._sources = self._store(
+            self._sources, "H", self._intern(values["source"]), 0
+        )
+        self._raw_ids = self._store(
+            self._raw_ids, "H", self._intern(values["raw_id"]), 0
+        )
+        request_ms = values["request_ms"]
+        self._request_ms = self._store(
+            self._request_ms,
+            "i",
+            _MISSING if request_ms is None else request_ms,
+            _MISSING,
+        )
+        status_code = values["status_code"]
+        self._status_codes = self._store(
+            self._status_codes,
+            "h",
+            _MISSING if status_code is None else status_code,
+            _MISSING,
+        )
+
+        if extras:
+            self._extras[row] = extras
+
+    def extend(self, records: Iterable[dict[str, Any]]) -> None:
+        """Добавить несколько записей истории."""
+        for record in records:
+            self.append(record)
+
+    # --- Чтение записей ---
+
+    def record_at(self, row: int) -> dict[str, Any]:
+        """Восстановить словарь записи по номеру строки.
+
+        Args:
+            row: Номер строки (поддерживаются отрицательные индексы).
+
+        Returns:
+            Запись в формате storage.add_history_record.
+        """
+        if row < 0:
+            row += len(self.timestamps)
+        extras = self._extras.get(row, {})
+
+        updated_at = extras.get("updated_at", from_epoch(self.timestamps[row]))
+        record: dict[str, Any] = {
+            "id": f"{self.pair}_{updated_at}",
+            "from": self.from_currency,
+            "to": self.to_currency,
+            "rate": self.rates[row],
+            "updated_at": updated_at,
+        }
+
+        if self._sources is not None and self._sources[row]:
+            record["source"] = self._strings[self._sources[row]]
+        if self._raw_ids is not None and self._raw_ids[row]:
+            record["raw_id"] = self._strings[self._raw_ids[row]]
+        if self._request_ms is not None and self._request_ms[row] != _MISSING:
+            record["request_ms"] = self._request_ms[row]
+        if self._status_codes is not None and self._status_codes[row] != _MISSING:
+            record["status_code"] = self._status_codes[row]
+
+        record.update(extras)
+        return record
+
+    def iter_records(self) -> Iterator[dict[str, Any]]:
+        """Итерация по записям ряда в порядке строк."""
+        for row in range(len(self.timestamps)):
+            yield self.record_at(row)
+
+    def to_records(self) -> list[dict[str, Any]]:
+        """Все записи ряда в виде списка словарей."""
+        return list(self.iter_records())
+
+    # --- Сортировка и размер ---
+
+    def is_sorted(self) -> bool:
+        """Отсортирован ли ряд по времени."""
+        ts = self.timestamps
+        return all(ts[i] <= ts[i + 1] for i in range(len(ts) - 1))
+
+    def sort(self) -> None:
+        """Стабильно отсортировать ряд по времени (все колонки вместе)."""
+        if self.is_sorted():
+            return
+
+        order = sorted(range(len(self.timestamps)), key=self.timestamps.__getitem__)
+        self.timestamps = array("q", (self.timestamps[i] for i in order))
+        self.rates = array("d", (self.rates[i] for i in order))
+        for name in ("_sources", "_raw_ids", "_request_ms", "_status_codes"):
+            column = getattr(self, name)
+            if column is not None:
+                setattr(self, name, array(column.typecode, (column[i] for i in order)))
+
+        position = {old: new for new, old in enumerate(order) if old in self._extras}
+        self._extras = {position[row]: value for row, value in self._extras.items()}
+
+    @property
+    def nbytes(self) -> int:
+        """Объем буферов колонок в байтах (без таблицы строк и extras)."""
+        columns = [
+            self.timestamps,
+            self.rates,
+            self._sources,
+            self._raw_ids,
+            self._request_ms,
+            self._status_codes,
+        ]
+        return sum(c.itemsize * len(c) for c in columns if c is not None)
+
+    def __len__(self) -> int:
+        """Количество записей в ряду."""
+        return len(self.timestamps)
+
+    def __repr__(self) -> str:
+        """Представление ряда для отладки."""
+        return f"PairSeries(pair={self.pair}, records={len(self)}, bytes={self.nbytes})"
+
+
+def _fits_column(key: str, value: Any) -> bool:
+    """Помещается ли значение метаданных в свою колонку без потерь."""
+    if key in ("source", "raw_id"):
+        return isinstance(value, str)
+    if isinstance(value, bool) or not isinstance(value, int):
+        return False
+    if key == "request_ms":
+        return 0 <= value <= 2**31 - 1
+    return 0 <= value <= 2**15 - 1
+
+
+def build_series(records: Iterable[dict[str, Any]]) -> dict[str, PairSeries]:
+    """Разложить записи истории по рядам пар.
+
+    Args:
+        records: Записи истории в формате storage.add_history_record.
+
+    Returns:
+        Словарь {"BTC_USD": PairSeries, ...}, ряды отсортированы по времени.
+    """
+    series: dict[str, PairSeries] = {}
+    for record in records:
+        pair = f"{record['from']}_{record['to']}"
+        if pair not in series:
+            series[pair] = PairSeries(record["from"], record["to"])
+        series[pair].append(record)
+
+    for item in series.values():
+        item.sort()
+    return series
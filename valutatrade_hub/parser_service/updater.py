@@ -19,7 +19,8 @@ from valutatrade_hub.parser_service.api_clients import (
 )
 from valutatrade_hub.parser_service.config import ParserConfig, get_parser_config
 from valutatrade_hub.parser_service.storage import (
-    add_history_record,
+    add_history_records,
+    parse_pair,
     update_rates_cache,
 )
 
@@ -66,7 +67,10 @@ class RatesUpdater:
         1. Вызывает fetch_rates() у каждого клиента
         2. Объединяет полученные словари с курсами
         3. Добавляет метаданные (source, last_refresh)
-        4. Передает в storage для сохранения
+        4. Передает в storage для сохранения (история всех пар
+           записывается одним пакетом за цикл; ошибка записи истории
+           логируется и учитывается в "errors", но кеш курсов все равно
+           обновляется)
         5. Ведет подробное логирование каждого шага
 
         Returns:
@@ -82,7 +86,7 @@ class RatesUpdater:
 
         Raises:
             ApiRequestError: Если все API запросы завершились неудачей.
-            StorageError: Если данные не могут быть сохранены.
+            StorageError: Если не удалось обновить кеш курсов.
         """
         logger.info("=" * 60)
         logger.info("Starting currency rates update...")
@@ -101,6 +105,7 @@ class RatesUpdater:
         }
 
         all_rates = {}
+        history_records = []
         errors = []
 
         # Опрос каждого клиента
@@ -118,32 +123,26 @@ class RatesUpdater:
                 # Определение источника для метаданных
                 if isinstance(client, CoinGeckoClient):
                     source = "CoinGecko"
-                    stats["crypto_count"] = len(rates)
                 elif isinstance(client, ExchangeRateApiClient):
                     source = "ExchangeRate-API"
-                    stats["fiat_count"] = len(rates)
                 else:
                     source = client_name
 
+                # Подготовка записей истории (сохраняются одним пакетом);
+                # невалидный ответ не попадает ни в статистику, ни в кеш
+                request_ms = int((time.time() - client_start) * 1000)
+                history_records.extend(
+                    _history_items(rates, source, timestamp, request_ms, self.config)
+                )
+
+                if isinstance(client, CoinGeckoClient):
+                    stats["crypto_count"] = len(rates)
+                elif isinstance(client, ExchangeRateApiClient):
+                    stats["fiat_count"] = len(rates)
+
                 # Объединение с общим словарем
                 all_rates.update(rates)
 
-                # Сохранение каждой пары в историю
-                for pair, rate in rates.items():
-                    from_currency, _ = pair.split("_")
-                    raw_id = self.config.CRYPTO_ID_MAP.get(from_currency)
-
-                    add_history_record(
-                        pair=pair,
-                        rate=rate,
-                        source=source,
-                        timestamp=timestamp,
-                        raw_id=raw_id,
-                        request_ms=int((time.time() - client_start) * 1000),
-                        status_code=200,
-                        config=self.config,
-                    )
-
                 elapsed = time.time() - client_start
                 logger.info(
                     f"✓ Successfully fetched {len(rates)} rates from {client_name} "
@@ -174,6 +173,14 @@ class RatesUpdater:
             logger.error(f"✗ {error_msg}")
             raise ApiRequestError(error_msg)
 
+        # Сохранение истории всех пар одной записью; ошибка истории не
+        # мешает обновить кеш текущих курсов
+        try:
+            add_history_records(history_records, config=self.config)
+        except StorageError as e:
+            logger.error(f"✗ Failed to save rates history: {str(e)}")
+            stats["errors"] += 1
+
         # Обновление кеша
         logger.info(f"\nUpdating rates cache with {len(all_rates)} pairs...")
         try:
@@ -231,6 +238,46 @@ class RatesUpdater:
         return stats
 
 
+def _history_items(
+    rates: dict[str, float],
+    source: str,
+    timestamp: str,
+    request_ms: int,
+    config: ParserConfig,
+) -> list[dict]:
+    """Подготовить аргументы add_history_records для пар одного запроса.
+
+    Args:
+        rates: Курсы в формате {"BTC_USD": 59337.21, ...}
+        source: Название источника данных
+        timestamp: ISO 8601 UTC timestamp цикла обновления
+        request_ms: Длительность запроса в миллисекундах
+        config: Конфигурация Parser Service
+
+    Returns:
+        Список словарей для add_history_records.
+
+    Raises:
+        ValueError: Если формат пары невалиден.
+    """
+    items = []
+    for pair, rate in rates.items():
+        # Невалидная пара отбрасывает ответ клиента целиком, до записи
+        from_currency, _ = parse_pair(pair)
+        items.append(
+            {
+                "pair": pair,
+                "rate": rate,
+                "source": source,
+                "timestamp": timestamp,
+                "raw_id": config.CRYPTO_ID_MAP.get(from_currency),
+                "request_ms": request_ms,
+                "status_code": 200,
+            }
+        )
+    return items
+
+
 # =============================================================================
 # Convenience functions для обратной совместимости
 # =============================================================================
@@ -276,21 +323,13 @@ def update_crypto_rates(config: ParserConfig | None = None) -> dict[str, float]:
     start_time = time.time()
 
     crypto_rates = coingecko.fetch_rates()
+    request_ms = int((time.time() - start_time) * 1000)
 
-    # Сохранение в историю
-    for pair, rate in crypto_rates.items():
-        from_currency, _ = pair.split("_")
-        raw_id = cfg.CRYPTO_ID_MAP.get(from_currency)
-        add_history_record(
-            pair=pair,
-            rate=rate,
-            source="CoinGecko",
-            timestamp=timestamp,
-            raw_id=raw_id,
-            request_ms=int((time.time() - start_time) * 1000),
-            status_code=200,
-            config=cfg,
-        )
+    # Сохранение в историю одним пакетом
+    add_history_records(
+        _history_items(crypto_rates, "CoinGecko", timestamp, request_ms, cfg),
+        config=cfg,
+    )
 
     # Обновление кеша
     update_rates_cache(
@@ -322,18 +361,13 @@ def update_fiat_rates(config: ParserConfig | None = None) -> dict[str, float]:
     start_time = time.time()
 
     fiat_rates = exchangerate.fetch_rates()
+    request_ms = int((time.time() - start_time) * 1000)
 
-    # Сохранение в историю
-    for pair, rate in fiat_rates.items():
-        add_history_record(
-            pair=pair,
-            rate=rate,
-            source="ExchangeRate-API",
-            timestamp=timestamp,
-            request_ms=int((time.time() - start_time) * 1000),
-            status_code=200,
-            config=cfg,
-        )
+    # Сохранение в историю одним пакетом
+    add_history_records(
+        _history_items(fiat_rates, "ExchangeRate-API", timestamp, request_ms, cfg),
+        config=cfg,
+    )
 
     # Обновление кеша
     update_rates_cache(